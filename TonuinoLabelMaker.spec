@@ -10,7 +10,7 @@ a = Analysis(
         ('src/resources/espuino_logo.png', 'resources'),
         ('src/resources/tonuino_logo.png', 'resources'),
     ],
-    hiddenimports=['PyQt6.QtPrintSupport', 'src.ui'],
+    hiddenimports=['PyQt6.QtPrintSupport', 'src.ui', 'numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,5 +1,21 @@
-from .footer_widget import FooterWidget
-from .edit_options_widget import EditOptionsWidget
-from .preview_widget import PreviewWidget
-from .header_widget import HeaderWidget
-from .get_resources import template_data
\ No newline at end of file
+import importlib
+
+# Public attributes are resolved on first access, so Qt-free modules such as the
+# label renderer or the batch exporter can be imported without loading PyQt6
+_LAZY_ATTRIBUTES = {
+    "FooterWidget": ".footer_widget",
+    "EditOptionsWidget": ".edit_options_widget",
+    "PreviewWidget": ".preview_widget",
+    "HeaderWidget": ".header_widget",
+    "MemoryWidget": ".memory_widget",
+    "template_data": ".get_resources",
+    "get_templates": ".get_resources",
+    "get_catalog": ".template_catalog",
+}
+
+
+def __getattr__(name:str):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,248 @@
+"""Render label sheets to PDF without the GUI
+
+Usage (from the src directory):
+    python -m app.batch_export manifest.json -o labels.pdf
+
+The manifest is either a JSON list of label entries (or an object with a "labels" list and
+optional defaults) or a CSV file with a header row. Each entry supports the keys
+image, text, logo, crop, blur, template and cell, where cell is the 1-based "row,col"
+position on the sheet. Entries without cell fill the next free label.
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from . import compositor
+from .label_renderer import render_label_from_source, DEFAULT_PARAMS, DEFAULT_DPI
+from .pdf_generator import PDFCreator, RASTER, NATIVE
+from .source_image import SourceImage
+from .template_catalog import get_catalog
+
+
+def parse_cell(cell:str) -> tuple:
+    """Parse a 1-based "row,col" string into a 0-based (row, col) tuple
+
+    Args:
+        cell (str): Cell position, e.g. "2,1"
+
+    Returns:
+        tuple: 0-based (row, col) or None if cell is empty
+    """
+    if cell in [None, ""]:
+        return None
+    if isinstance(cell, (list, tuple)):
+        row, col = cell
+    else:
+        row, col = str(cell).replace(";", ",").split(",")
+    return int(row) - 1, int(col) - 1
+
+
+def read_manifest(manifest_path:str, default_template:str) -> list:
+    """Read label entries from a JSON or CSV manifest
+
+    Args:
+        manifest_path (str): Path to manifest file
+        default_template (str): Template used for entries without template
+
+    Returns:
+        list: List of normalized label entry dicts
+    """
+    defaults = dict(DEFAULT_PARAMS, template=default_template)
+
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, newline="", encoding="utf-8-sig") as file:
+            rows = list(csv.DictReader(file))
+    else:
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            defaults.update({k: v for k, v in data.items() if k != "labels"})
+            rows = data.get("labels", [])
+        else:
+            rows = data
+
+    base_path = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    for index, row in enumerate(rows):
+        # Drop empty CSV columns so that defaults apply
+        row = {k: v for k, v in row.items() if v not in [None, ""]}
+        entry = dict(defaults, **row)
+
+        if "image" not in entry:
+            raise ValueError(f"Manifest entry {index + 1} has no image")
+        if entry["template"] not in get_catalog():
+            raise ValueError(f"Manifest entry {index + 1} uses unknown template '{entry['template']}'")
+
+        entry["image"] = os.path.join(base_path, entry["image"])
+        entry["blur"] = int(entry["blur"])
+        entry["cell"] = parse_cell(entry.get("cell"))
+        entries.append(entry)
+
+    return entries
+
+
+def assign_sheets(entries:list) -> list:
+    """Distribute label entries onto sheets of their template
+
+    Args:
+        entries (list): Label entries as returned by read_manifest
+
+    Returns:
+        list: List of (template_name, {(row, col): entry_index}) tuples, one per sheet
+    """
+    sheets = []
+    for index, entry in enumerate(entries):
+        config = get_catalog()[entry["template"]]
+        rows, cols = config["sticker_pattern"]
+        candidates = [s for s in sheets if s[0] == entry["template"]]
+
+        if entry["cell"] is not None:
+            row, col = entry["cell"]
+            if not (0 <= row < rows and 0 <= col < cols):
+                raise ValueError(f"Manifest entry {index + 1} has cell {row + 1},{col + 1} outside of template")
+            cells = [(row, col)]
+        else:
+            cells = [(row, col) for row in range(rows) for col in range(cols)]
+
+        # Place label in the first sheet with a free cell, otherwise start a new sheet
+        for sheet in candidates + [None]:
+            if sheet is None:
+                sheet = (entry["template"], {})
+                sheets.append(sheet)
+            free = [cell for cell in cells if cell not in sheet[1]]
+            if free:
+                sheet[1][free[0]] = index
+                break
+
+    return sheets
+
+
+def render_entry(entry:dict, dpi:int=DEFAULT_DPI) -> Image.Image:
+    """Render a single label entry, executed in a worker process
+
+    Args:
+        entry (dict): Label entry as returned by read_manifest
+        dpi (int, optional): Resolution of the label, the export resolution to place it
+            without resampling. Defaults to DEFAULT_DPI.
+
+    Returns:
+        Image.Image: Rendered label image
+    """
+    config = get_catalog()[entry["template"]]
+    return render_label_from_source(
+        SourceImage.from_file(entry["image"]),
+        config["sticker_width"],
+        config["sticker_height"],
+        crop=entry["crop"],
+        blur=entry["blur"],
+        logo=entry["logo"],
+        text=entry["text"],
+        dpi=dpi,
+    )
+
+
+def render_sheets(executor:ProcessPoolExecutor, entries:list, sheets:list, dpi:int):
+    """Render the labels of the sheets on a process pool, one sheet after the other
+
+    The labels of the next sheet are rendered while a sheet is written, so at most the labels
+    of two sheets are held in memory.
+
+    Args:
+        executor (ProcessPoolExecutor): Process pool rendering the labels
+        entries (list): Label entries as returned by read_manifest
+        sheets (list): (template name, {cell: entry index}) as returned by assign_sheets
+        dpi (int): Export resolution
+
+    Yields:
+        tuple: (template, label_data) of each sheet as expected by PDFCreator.export_pdf
+    """
+    render = functools.partial(render_entry, dpi=dpi)
+
+    def submit(cells:dict) -> dict:
+        return {cell: executor.submit(render, entries[index]) for cell, index in cells.items()}
+
+    pending = submit(sheets[0][1]) if sheets else {}
+    for number, (template_name, cells) in enumerate(sheets):
+        futures = pending
+        pending = submit(sheets[number + 1][1]) if number + 1 < len(sheets) else {}
+
+        label_data = {}
+        for cell, index in cells.items():
+            entry = entries[index]
+            label_data[cell] = {
+                'path': entry["image"],
+                'params': {k: entry[k] for k in DEFAULT_PARAMS},
+                'final_print': futures[cell].result(),
+            }
+        del futures
+        yield get_catalog()[template_name], label_data
+
+
+def export(entries:list, output_path:str, dpi:int=300, workers:int=None, mode:str=NATIVE) -> int:
+    """Render all label entries in parallel and write the sheets to a PDF
+
+    Args:
+        entries (list): Label entries as returned by read_manifest
+        output_path (str): Output PDF path
+        dpi (int, optional): Export resolution. Defaults to 300.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        mode (str, optional): PDF export mode, RASTER or NATIVE. Defaults to NATIVE.
+
+    Returns:
+        int: Number of exported sheets
+    """
+    sheets = assign_sheets(entries)
+
+    # Labels are written as their sheet is rendered and released after their page, nothing is
+    # kept for a re-export
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        PDFCreator(dpi=dpi, mode=mode, reuse=False).export_pdf(render_sheets(executor, entries, sheets, dpi),
+                                                                output_path)
+
+    return len(sheets)
+
+
+def main(argv:list=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch_export", description="Render label sheets to PDF")
+    parser.add_argument("manifest", help="JSON or CSV manifest with label entries")
+    parser.add_argument("-o", "--output", help="Output PDF path. Defaults to the manifest name with .pdf")
+    parser.add_argument("-t", "--template", default=next(iter(get_catalog())),
+                        help="Template for entries without template")
+    parser.add_argument("--dpi", type=int, default=300, help="Export resolution")
+    parser.add_argument("--mode", choices=[NATIVE, RASTER], default=NATIVE,
+                        help="Embed each label as own image (native) or each page as one image (raster)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--backend", choices=compositor.available_backends(), default=compositor.get_backend(),
+                        help="Compositing backend")
+    args = parser.parse_args(argv)
+
+    # Worker processes select their backend from the environment
+    os.environ[compositor.BACKEND_ENV] = args.backend
+    compositor.set_backend(args.backend)
+
+    if args.template not in get_catalog():
+        parser.error(f"unknown template '{args.template}', choose from: {', '.join(get_catalog())}")
+
+    output_path = args.output or os.path.splitext(args.manifest)[0] + ".pdf"
+
+    try:
+        entries = read_manifest(args.manifest, args.template)
+        if not entries:
+            parser.error("manifest contains no labels")
+        sheet_count = export(entries, output_path, dpi=args.dpi, workers=args.workers, mode=args.mode)
+    except (OSError, ValueError) as e:
+        print(f"Batch export failed with error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Exported {len(entries)} labels on {sheet_count} sheet(s) to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,386 @@
+"""Benchmark the label rendering and PDF export without the GUI
+
+Usage (from the src directory):
+    python -m app.benchmark --save baseline.json
+    python -m app.benchmark --baseline baseline.json
+
+Every case runs in a fresh worker process, so the measured peak memory of a case is not
+affected by the cases before it. Times are the fastest of all repetitions, peak memory is the
+growth of the peak resident set size of the worker while running the case. With --baseline,
+cases slower or larger than the baseline by more than the threshold are reported as
+regressions and the exit code is 1.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from . import compositor
+from .get_resources import get_templates
+from .label_renderer import render_label_from_source, clear_caches, CROP_MODES
+from .pdf_generator import PDFCreator, RASTER, NATIVE
+from .source_image import SourceImage
+
+# Version of the results file format
+RESULTS_VERSION = 1
+
+# Parameters covered by the benchmark cases
+BLUR_RADII = [0, 20, 100]
+SOURCE_MEGAPIXELS = [0.3, 2, 12, 48]
+EXPORT_DPIS = [150, 300, 600]
+EXPORT_MODES = [NATIVE, RASTER]
+
+# Source images of the export cases
+EXPORT_SOURCE_MEGAPIXELS = 2
+
+# Relative change beyond which a case counts as regression
+DEFAULT_THRESHOLD = 0.1
+
+# Absolute changes below these are measurement noise and never count as regression
+MIN_TIME_CHANGE = 0.002
+MIN_MEMORY_CHANGE = 4 * 1024 ** 2
+
+# A benchmark case, prepare is called with the work directory and params in the worker
+# process and returns the function to measure. params holds at least the megapixels of the
+# source image.
+BenchmarkCase = namedtuple("BenchmarkCase", ["name", "prepare", "params"])
+
+
+def source_file(work_dir:str, megapixels:float) -> str:
+    """Create a synthetic 4:3 JPEG photo of the given size, unless it exists
+
+    Args:
+        work_dir (str): Directory of the generated files
+        megapixels (float): Size of the image in megapixels
+
+    Returns:
+        str: Path of the JPEG file
+    """
+    path = os.path.join(work_dir, f"source-{megapixels}mp.jpg")
+    if os.path.exists(path):
+        return path
+
+    width = round((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = round(width * 3 / 4)
+
+    # Smooth structure with fine noise compresses and decodes like a photo
+    channels = [Image.effect_noise((64, 48), sigma).resize((width, height), Image.Resampling.BICUBIC)
+                for sigma in [40, 60, 80]]
+    image = Image.merge("RGB", channels)
+    image = Image.blend(image, Image.effect_noise((width, height), 30).convert("RGB"), 0.15)
+    image.save(path, "JPEG", quality=90)
+    return path
+
+
+def prepare_render(work_dir:str, megapixels:float, crop:str, blur:int, decorated:bool):
+    """Label generation from a source file as done by the editor, without any cached stage
+
+    Args:
+        work_dir (str): Directory of the generated files
+        megapixels (float): Size of the source image in megapixels
+        crop (str): One of CROP_MODES
+        blur (int): Blur radius
+        decorated (bool): Print a text and a logo on the label
+
+    Returns:
+        callable: Function rendering the label
+    """
+    path = source_file(work_dir, megapixels)
+    template = next(iter(get_templates().values()))
+    params = dict(crop=crop, blur=blur, logo="None", text="")
+    if decorated:
+        params.update(logo="Tonuino", text="Benchmark Label")
+
+    def run():
+        clear_caches()
+        # A new source without the proxy cache, so every run decodes the file
+        render_label_from_source(SourceImage(path=path), template["sticker_width"],
+                                 template["sticker_height"], **params)
+    return run
+
+
+def prepare_export(work_dir:str, megapixels:float, template_name:str, dpi:int, mode:str):
+    """Export of a full sheet with distinct labels rendered at the export resolution by a
+    new PDFCreator
+
+    Args:
+        work_dir (str): Directory of the generated files
+        megapixels (float): Size of the source image in megapixels
+        template_name (str): Template name
+        dpi (int): Export resolution
+        mode (str): RASTER or NATIVE
+
+    Returns:
+        callable: Function exporting the sheet
+    """
+    template = get_templates()[template_name]
+    source = SourceImage.from_file(source_file(work_dir, megapixels))
+    rows, cols = template["sticker_pattern"]
+
+    label_data = {}
+    for row, col in itertools.product(range(rows), range(cols)):
+        label_data[(row, col)] = {
+            'source': source,
+            'final_print': render_label_from_source(source, template["sticker_width"], template["sticker_height"],
+                                                    text=f"Label {row + 1},{col + 1}", dpi=dpi),
+        }
+    output_path = os.path.join(work_dir, "benchmark.pdf")
+
+    def run():
+        PDFCreator(dpi=dpi, mode=mode, verify=False).export_pdf([(template, label_data)], output_path)
+    return run
+
+
+def benchmark_cases() -> list:
+    """All benchmark cases in a stable order
+
+    Returns:
+        list: List of BenchmarkCase
+    """
+    cases = []
+    for megapixels, crop, blur, decorated in itertools.product(SOURCE_MEGAPIXELS, CROP_MODES, BLUR_RADII,
+                                                               [False, True]):
+        name = f"render/{megapixels}mp/{crop.lower().replace(' ', '-')}/blur-{blur}"
+        if decorated:
+            name += "/text-logo"
+        cases.append(BenchmarkCase(name, prepare_render, dict(megapixels=megapixels, crop=crop, blur=blur,
+                                                              decorated=decorated)))
+
+    for template_name, dpi, mode in itertools.product(get_templates(), EXPORT_DPIS, EXPORT_MODES):
+        name = f"export/{template_name}/{dpi}dpi/{mode}"
+        cases.append(BenchmarkCase(name, prepare_export, dict(megapixels=EXPORT_SOURCE_MEGAPIXELS,
+                                                              template_name=template_name, dpi=dpi, mode=mode)))
+    return cases
+
+
+def peak_memory() -> int:
+    """Peak resident set size of the current process
+
+    Returns:
+        int: Peak memory in bytes or None if not supported on this platform
+    """
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                [(name, ctypes.c_size_t) for name in [
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                ]]
+
+        get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_current_process.restype = wintypes.HANDLE
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.c_void_p, wintypes.DWORD]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if not get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case:BenchmarkCase, work_dir:str, repeat:int) -> dict:
+    """Measure a benchmark case, executed in a worker process
+
+    Args:
+        case (BenchmarkCase): Benchmark case
+        work_dir (str): Directory of the generated files
+        repeat (int): Number of measured runs
+
+    Returns:
+        dict: Fastest and median time in seconds and peak memory growth in bytes
+    """
+    function = case.prepare(work_dir, **case.params)
+
+    memory_before = peak_memory()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    memory_after = peak_memory()
+
+    result = {"time": min(times), "median": statistics.median(times), "peak_bytes": None}
+    if memory_before is not None and memory_after is not None:
+        result["peak_bytes"] = memory_after - memory_before
+    return result
+
+
+def run_benchmarks(cases:list, repeat:int=3, progress_callback=None) -> dict:
+    """Run benchmark cases, each one in a fresh worker process
+
+    Args:
+        cases (list): List of BenchmarkCase
+        repeat (int, optional): Number of measured runs per case. Defaults to 3.
+        progress_callback (callable, optional): Called with (case name, result) after each
+            case. Defaults to None.
+
+    Returns:
+        dict: Results by case name
+    """
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="tonuino-benchmark-") as work_dir:
+        # Generate the source images up front, so their generation does not count as peak
+        # memory of the cases
+        megapixels = sorted({case.params["megapixels"] for case in cases})
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            list(executor.map(source_file, itertools.repeat(work_dir), megapixels))
+
+        for case in cases:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, case, work_dir, repeat).result()
+            results[case.name] = result
+            if progress_callback:
+                progress_callback(case.name, result)
+    return results
+
+
+def compare(results:dict, baseline:dict, threshold:float=DEFAULT_THRESHOLD) -> list:
+    """Find cases slower or larger than in the baseline
+
+    Args:
+        results (dict): Results by case name
+        baseline (dict): Baseline results by case name
+        threshold (float, optional): Relative change beyond which a case counts as regression.
+            Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        list: Names of the regressed cases
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        reference = baseline[name]
+
+        slower = result["time"] - reference["time"]
+        if slower > MIN_TIME_CHANGE and slower > reference["time"] * threshold:
+            regressions.append(name)
+            continue
+
+        if result["peak_bytes"] is not None and reference.get("peak_bytes") is not None:
+            larger = result["peak_bytes"] - reference["peak_bytes"]
+            if larger > MIN_MEMORY_CHANGE and larger > reference["peak_bytes"] * threshold:
+                regressions.append(name)
+    return regressions
+
+
+def format_result(name:str, result:dict, reference:dict=None) -> str:
+    """Format a result as a table row
+
+    Args:
+        name (str): Case name
+        result (dict): Result of the case
+        reference (dict, optional): Baseline result of the case. Defaults to None.
+
+    Returns:
+        str: Table row
+    """
+    def megabytes(value):
+        return "n/a" if value is None else f"{value / 1024 ** 2:.1f}"
+
+    row = f"{name:<48} {result['time'] * 1000:10.1f} ms {megabytes(result['peak_bytes']):>8} MB"
+    if reference is not None:
+        change = (result["time"] / reference["time"] - 1) * 100 if reference["time"] else 0
+        row += f"   baseline {reference['time'] * 1000:10.1f} ms ({change:+.0f}%)" \
+               f" {megabytes(reference.get('peak_bytes')):>8} MB"
+    return row
+
+
+def read_results(path:str) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    if data.get("version", 0) > RESULTS_VERSION:
+        raise ValueError(f"Benchmark results version {data['version']} is not supported")
+    return data["results"]
+
+
+def write_results(path:str, results:dict, repeat:int) -> None:
+    data = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": compositor.get_backend(),
+        "repeat": repeat,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=2, sort_keys=True)
+
+
+def main(argv:list=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark",
+                                     description="Benchmark label rendering and PDF export")
+    parser.add_argument("-k", "--filter", action="append", default=[],
+                        help="Only run cases whose name contains this text, may be given multiple times")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Measured runs per case")
+    parser.add_argument("--save", help="Write the results to this JSON file, e.g. as new baseline")
+    parser.add_argument("--baseline", help="Compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative change in time or peak memory reported as regression")
+    parser.add_argument("--backend", choices=compositor.available_backends(), default=compositor.get_backend(),
+                        help="Compositing backend")
+    parser.add_argument("--list", action="store_true", help="List the cases without running them")
+    args = parser.parse_args(argv)
+
+    # Worker processes select their backend from the environment
+    os.environ[compositor.BACKEND_ENV] = args.backend
+    compositor.set_backend(args.backend)
+
+    cases = [case for case in benchmark_cases()
+             if not args.filter or any(text in case.name for text in args.filter)]
+    if args.list:
+        print("\n".join(case.name for case in cases))
+        return 0
+    if not cases:
+        parser.error("no benchmark case matches the filter")
+
+    try:
+        baseline = read_results(args.baseline) if args.baseline else {}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Reading the baseline failed with error: {e}", file=sys.stderr)
+        return 1
+
+    results = run_benchmarks(
+        cases,
+        repeat=args.repeat,
+        progress_callback=lambda name, result: print(format_result(name, result, baseline.get(name)), flush=True),
+    )
+
+    if args.save:
+        write_results(args.save, results, args.repeat)
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            print("\n".join(f"  {name}" for name in regressions))
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import importlib
+import importlib.util
+import os
+from collections import namedtuple
+
+from PIL import Image, ImageChops, ImageStat
+
+# Compositing backends
+PIL_BACKEND = "pil"
+NUMPY_BACKEND = "numpy"
+
+# Environment variable selecting the backend
+BACKEND_ENV = "TONUINO_RENDER_BACKEND"
+
+# Maximum absolute difference per channel between the results of both backends. The NumPy
+# backend uses the same integer arithmetic as Pillow, so results are expected to be identical.
+TOLERANCE = 1
+
+# Layers of a label: blurred RGBA background covering the label, RGBA foreground and its
+# (x, y) offset, RGBA logo and its (x, y) position or None
+LabelLayers = namedtuple("LabelLayers", ["background", "foreground", "offset", "logo", "logo_position"])
+
+# Pillow pastes in C and measured faster than the NumPy stack, so NumPy is opt-in
+_backend = os.environ.get(BACKEND_ENV, PIL_BACKEND)
+
+
+# NumPy takes longer to import than the rest of the renderer, it is imported on first use of
+# the NumPy backend only
+_numpy_available = importlib.util.find_spec("numpy") is not None
+
+
+def _numpy():
+    return importlib.import_module("numpy")
+
+
+def available_backends() -> list:
+    return [PIL_BACKEND, NUMPY_BACKEND] if _numpy_available else [PIL_BACKEND]
+
+
+def get_backend() -> str:
+    """Backend used if none is given explicitly
+
+    Returns:
+        str: PIL_BACKEND or NUMPY_BACKEND
+    """
+    return _backend if _backend in available_backends() else PIL_BACKEND
+
+
+def set_backend(backend:str) -> None:
+    """Select the default compositing backend
+
+    Args:
+        backend (str): PIL_BACKEND or NUMPY_BACKEND
+    """
+    global _backend
+    if backend not in available_backends():
+        raise ValueError(f"Compositing backend '{backend}' is not available")
+    _backend = backend
+
+
+def compose(layers:LabelLayers, backend:str=None) -> Image.Image:
+    """Compose the layers of a single label
+
+    Args:
+        layers (LabelLayers): Layers of the label
+        backend (str, optional): PIL_BACKEND or NUMPY_BACKEND. Defaults to get_backend().
+
+    Returns:
+        Image.Image: RGBA label without text
+    """
+    return compose_batch([layers], backend)[0]
+
+
+def compose_batch(batch:list, backend:str=None) -> list:
+    """Compose the layers of many labels
+
+    The NumPy backend stacks all labels of the same size and blends them in one pass.
+
+    Args:
+        batch (list): List of LabelLayers
+        backend (str, optional): PIL_BACKEND or NUMPY_BACKEND. Defaults to get_backend().
+
+    Returns:
+        list: RGBA labels without text in the order of batch
+    """
+    backend = backend or get_backend()
+    if backend == PIL_BACKEND:
+        return [compose_pil(layers) for layers in batch]
+
+    # Group labels by size, each group is blended as one stack
+    results = [None] * len(batch)
+    groups = {}
+    for index, layers in enumerate(batch):
+        groups.setdefault(layers.background.size, []).append(index)
+
+    for size, indices in groups.items():
+        stack = compose_stack_numpy([batch[i] for i in indices], size)
+        for i, array in zip(indices, stack):
+            results[i] = Image.fromarray(array, "RGBA")
+    return results
+
+
+def compose_pil(layers:LabelLayers) -> Image.Image:
+    """Reference implementation using PIL paste operations
+
+    Args:
+        layers (LabelLayers): Layers of the label
+
+    Returns:
+        Image.Image: RGBA label without text
+    """
+    # Create a new image with the required target dimensions for print
+    final_print_image = Image.new("RGBA", layers.background.size, (255, 255, 255, 255))
+
+    # Paste the blurred image as the background
+    final_print_image.paste(layers.background, (0, 0))
+
+    # Center the original scaled image over the blurred background
+    final_print_image.paste(layers.foreground, layers.offset, layers.foreground)
+
+    # Paste the logo at the bottom-right corner
+    if layers.logo is not None:
+        final_print_image.paste(layers.logo, layers.logo_position, mask=layers.logo.split()[3])
+
+    return final_print_image
+
+
+def compose_stack_numpy(batch:list, size:tuple):
+    """Blend the layers of equally sized labels as one (N, H, W, 4) stack
+
+    Layers of the same size at the same position, e.g. the logos or the foregrounds of
+    equally shaped images, are blended as one sub-stack restricted to the covered region.
+
+    Args:
+        batch (list): List of LabelLayers with backgrounds of the given size
+        size (tuple): (width, height) of the labels
+
+    Returns:
+        np.ndarray: uint8 array of shape (N, H, W, 4)
+    """
+    np = _numpy()
+    stack = np.stack([np.asarray(layers.background.convert("RGBA")) for layers in batch])
+
+    for layer, position in [("foreground", "offset"), ("logo", "logo_position")]:
+        groups = {}
+        for index, layers in enumerate(batch):
+            image = getattr(layers, layer)
+            if image is not None:
+                groups.setdefault((image.size, getattr(layers, position)), []).append(index)
+
+        for (layer_size, layer_position), indices in groups.items():
+            box = clip_box((*layer_position, layer_position[0] + layer_size[0],
+                            layer_position[1] + layer_size[1]), size)
+            left, top, right, bottom = box
+            if right <= left or bottom <= top:
+                continue
+
+            # Part of the layers inside the label
+            crop = (left - layer_position[0], top - layer_position[1],
+                    right - layer_position[0], bottom - layer_position[1])
+            overlay = np.stack([np.asarray(getattr(batch[i], layer).convert("RGBA").crop(crop))
+                                for i in indices])
+
+            region = stack[indices, top:bottom, left:right]
+            blend(region, overlay, overlay[..., 3:4])
+            stack[indices, top:bottom, left:right] = region
+
+    return stack
+
+
+def blend(target, source, mask) -> None:
+    """Blend source into target in place using the mask, same rounding as PIL paste
+
+    Args:
+        target (np.ndarray): uint8 array, modified in place
+        source (np.ndarray): uint8 array broadcastable to target
+        mask (np.ndarray): uint8 alpha array broadcastable to target
+    """
+    if mask.min() == 255:
+        # Opaque layers, e.g. photos, replace the target
+        target[...] = source
+        return
+
+    np = _numpy()
+    # dst * (255 - a) + src * a + 128 is at most 65153, so 16 bit suffice
+    mask = mask.astype(np.uint16)
+    blended = target.astype(np.uint16) * (255 - mask)
+    blended += source.astype(np.uint16) * mask
+    blended += 128
+    blended += blended >> 8
+    target[...] = blended >> 8
+
+
+def clip_box(box:tuple, size:tuple) -> tuple:
+    left, top, right, bottom = box
+    width, height = size
+    return max(left, 0), max(top, 0), min(right, width), min(bottom, height)
+
+
+def region_stats(image:Image.Image, box:tuple, backend:str=None) -> tuple:
+    """Brightness and contrast of an image region, e.g. to choose the text color
+
+    Args:
+        image (Image.Image): Image
+        box (tuple): (left, top, right, bottom) region, clipped to the image
+        backend (str, optional): PIL_BACKEND or NUMPY_BACKEND. Defaults to get_backend().
+
+    Returns:
+        tuple: (mean, standard deviation) of the luminance between 0 and 255
+    """
+    return region_stats_batch([image], [box], backend)[0]
+
+
+def region_stats_batch(images:list, boxes:list, backend:str=None) -> list:
+    """Brightness and contrast of one region per image
+
+    The NumPy backend converts all equally sized images to luminance as one stack.
+
+    Args:
+        images (list): List of images
+        boxes (list): List of (left, top, right, bottom) regions, one per image
+        backend (str, optional): PIL_BACKEND or NUMPY_BACKEND. Defaults to get_backend().
+
+    Returns:
+        list: (mean, standard deviation) of the luminance per image
+    """
+    backend = backend or get_backend()
+    boxes = [clip_box(box, image.size) for image, box in zip(images, boxes)]
+
+    if backend == PIL_BACKEND:
+        results = []
+        for image, box in zip(images, boxes):
+            stat = ImageStat.Stat(image.crop(box).convert("L"))
+            results.append((stat.mean[0], stat.stddev[0]))
+        return results
+
+    # Only the regions are converted, equally sized regions as one stack
+    np = _numpy()
+    results = [None] * len(images)
+    groups = {}
+    for index, box in enumerate(boxes):
+        groups.setdefault((box[2] - box[0], box[3] - box[1]), []).append(index)
+
+    for indices in groups.values():
+        rgb = np.stack([np.asarray(images[i].crop(boxes[i]).convert("RGB")) for i in indices])
+        rgb = rgb.astype(np.uint32)
+
+        # ITU-R 601-2 luma transform with the fixed point rounding of PIL
+        luma = (rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16
+
+        flat = luma.reshape(len(indices), -1)
+        for i, mean, std in zip(indices, flat.mean(axis=1), flat.std(axis=1)):
+            results[i] = (float(mean), float(std))
+    return results
+
+
+def max_difference(image_a:Image.Image, image_b:Image.Image) -> int:
+    """Largest absolute per-channel difference between two images of the same size and mode
+
+    Args:
+        image_a (Image.Image): First image
+        image_b (Image.Image): Second image
+
+    Returns:
+        int: Difference between 0 and 255
+    """
+    difference = ImageChops.difference(image_a, image_b).getextrema()
+    if isinstance(difference[0], int):
+        return difference[1]
+    return max(high for _, high in difference)
@@ -1,15 +1,35 @@
-from PIL import Image, ImageFilter, ImageQt, ImageDraw, ImageFont, ImageGrab
-from PyQt6.QtCore import Qt
+import logging
+import math
+import os
+
+from PIL import Image, ImageQt
+from PyQt6.QtCore import Qt, QTimer, QThreadPool
 from PyQt6.QtGui import QPixmap, QPainter
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QFileDialog, QSlider, \
-    QLineEdit, QMessageBox, QGroupBox
-
-from .get_resources import template_data, espuino_logo, tonuino_logo
+    QLineEdit, QMessageBox, QGroupBox, QMenu, QCheckBox
+
+from .label_renderer import render_label_from_source, CROP_MODES, LOGOS
+from .render_cache import get_render_cache
+from .source_image import SourceImage, find_images, IMAGE_EXTENSIONS
+from .template_catalog import get_catalog
+from .render_worker import RenderWorker, RenderJob, BatchRenderWorker
+from .render_pool import PROCESS_COUNT
+from .import_worker import ImportWorker
+from .label_store import get_label_store
+from .preview_widget import SCALE_FACTOR
+from .source_watcher import SourceWatcher
+from .tracing import span
 
 # Size the label to be scaled for the editor image canvas
 PREVIEW_HEIGHT = 170
 PREVIEW_WIDTH = 278
 
+# Resolution of the draft shown while the design parameters change
+DRAFT_DPI = 50
+
+# Quiet time after the last change before the full quality label is rendered
+RENDER_DEBOUNCE_MS = 150
+
 
 class EditOptionsWidget(QWidget):
     def __init__(self):
@@ -22,15 +42,32 @@ class EditOptionsWidget(QWidget):
         self.__logger__ = None
         self.image_width = 1
         self.image_height = 1
-        self.label_data = {}
+        self.__pending_render__ = None
+        self.__render_counter__ = 0
+        self.__render_tokens__ = {}
+        self.__render_workers__ = {}
+        self.__import_workers__ = {}
+        # Further labels of a changed image file by the token of the import worker reopening it
+        self.__reloads__ = {}
+        self.__batch_jobs__ = {}
+        self.__batch_workers__ = []
+        self.__render_timer__ = QTimer(self)
+        self.__render_timer__.setSingleShot(True)
+        self.__render_timer__.setInterval(RENDER_DEBOUNCE_MS)
+        self.__render_timer__.timeout.connect(self.start_render)
+        self.__source_watcher__ = SourceWatcher(self)
+        self.__source_watcher__.source_changed.connect(self.reload_source)
         
         # Public class attributes
         self.config = None
+        self.sheets = [{}]
+        self.selected_sheet = 0
         self.selected_row = None
         self.selected_col = None
+        self.marked_cells = set()
 
         # Read template configuration
-        self.template_config = template_data
+        self.template_config = get_catalog()
 
         self.image_load_group = QGroupBox("Load Image ...")
         self.image_load_layout = QHBoxLayout()
@@ -38,12 +75,21 @@ class EditOptionsWidget(QWidget):
         # Load image from file
         self.image_selector_btn = QPushButton("From File")
         self.image_selector_btn.clicked.connect(self.select_image)
+        # Load all images of a folder
+        self.image_folder_btn = QPushButton("From Folder")
+        self.image_folder_btn.clicked.connect(self.select_folder)
         # Load image from clipboard
         self.image_load_from_clipboard = QPushButton("From Clipboard")
         self.image_load_from_clipboard.clicked.connect(self.load_image_from_clipboard)
 
         self.image_load_layout.addWidget(self.image_selector_btn)
+        self.image_load_layout.addWidget(self.image_folder_btn)
         self.image_load_layout.addWidget(self.image_load_from_clipboard)
+        # Reload labels whose image file changes
+        self.watch_checkbox = QCheckBox("Watch Files")
+        self.watch_checkbox.setToolTip("Render labels again when their image files are changed")
+        self.watch_checkbox.toggled.connect(self.update_watched_sources)
+        self.image_load_layout.addWidget(self.watch_checkbox)
         self.image_load_group.setLayout(self.image_load_layout)
 
         # Preview for selected image
@@ -60,12 +106,12 @@ class EditOptionsWidget(QWidget):
         # Logo selection dropdown
         self.logo_selector = QComboBox()
         self.logo_selector.setFixedWidth(350)
-        self.logo_selector.addItems(["None", "ESPuino", "Tonuino"])
+        self.logo_selector.addItems(LOGOS)
 
         # Crop selection dropdown
         self.crop_selector = QComboBox()
         self.crop_selector.setFixedWidth(350)
-        self.crop_selector.addItems(["Fit Auto", "Fit Width", "Fit Height", "Stretch"])
+        self.crop_selector.addItems(CROP_MODES)
 
         # Blur strength slider
         self.blur_slider = QSlider(Qt.Orientation.Horizontal)
@@ -77,6 +123,12 @@ class EditOptionsWidget(QWidget):
         # Line edit wdiget
         self.text_line = QLineEdit()
         self.text_line.setFixedWidth(350)
+
+        # Update the label preview while the design parameters change
+        self.blur_slider.valueChanged.connect(self.schedule_render)
+        self.crop_selector.currentTextChanged.connect(self.schedule_render)
+        self.logo_selector.currentTextChanged.connect(self.schedule_render)
+        self.text_line.textChanged.connect(self.schedule_render)
         
         # Custom text box
         text_layout = QHBoxLayout()
@@ -100,10 +152,21 @@ class EditOptionsWidget(QWidget):
         # Image selector
         self.label_image_generator_btn = QPushButton("Generate and apply sticker")
         self.label_image_generator_btn.clicked.connect(self.generate_image)
+
+        # Regenerate many labels at once, labels are marked with Ctrl+click in the preview
+        apply_menu = QMenu(self)
+        apply_menu.addAction("Apply to Selected Labels", lambda: self.apply_to_labels(self.selected_labels()))
+        apply_menu.addAction("Apply to Current Sheet", lambda: self.apply_to_labels(self.sheet_labels()))
+        apply_menu.addAction("Apply to All Sheets", lambda: self.apply_to_labels(self.all_labels()))
+        apply_menu.addSeparator()
+        apply_menu.addAction("Regenerate All Labels", lambda: self.apply_to_labels(self.all_labels(), same_params=False))
+        self.apply_btn = QPushButton("Apply to ...")
+        self.apply_btn.setMenu(apply_menu)
         
         # Layout for image generator button
         bottom_layout = QVBoxLayout()
         bottom_layout.addWidget(self.label_image_generator_btn)
+        bottom_layout.addWidget(self.apply_btn)
         
         # Add all layouts to the main layout
         layout.addLayout(image_layout)
@@ -115,6 +178,12 @@ class EditOptionsWidget(QWidget):
         
         self.setLayout(layout)
         
+    @property
+    def label_data(self) -> dict:
+        """Label data of the selected sheet, keyed by (row, col)
+        """
+        return self.sheets[self.selected_sheet]
+
     def registerPreviewer(self, previewer) -> None:
         """Register the preview widget
 
@@ -141,161 +210,382 @@ class EditOptionsWidget(QWidget):
         self.image_width = self.config["sticker_width"]
         self.image_height = self.config["sticker_height"]
         # Clear existing label data
-        self.label_data = {}
+        self.sheets = [{}]
+        self.selected_sheet = 0
+        self.marked_cells = set()
+        self.cancel_pending()
+        self.update_watched_sources()
+
+    def add_sheet(self) -> int:
+        """Append an empty sheet to the project
+
+        Returns:
+            int: Index of the new sheet
+        """
+        self.sheets.append({})
+        return len(self.sheets) - 1
+
+    def select_sheet(self, index:int) -> None:
+        """Set the sheet the selected label refers to
+
+        Args:
+            index (int): Sheet index
+        """
+        self.selected_sheet = index
+        self.load_label_params()
+        self.draw_original_image()
         
+    def current_params(self) -> dict:
+        """Design parameters as set in the editor controls
+
+        Returns:
+            dict: Parameters as expected by label_renderer.render_label
+        """
+        return {
+            "crop": self.crop_selector.currentText(),
+            "blur": self.blur_slider.value(),
+            "logo": self.logo_selector.currentText(),
+            "text": self.text_line.text(),
+        }
+
+    def load_label_params(self) -> None:
+        """Show the design parameters of the selected label in the editor controls
+        """
+        label = self.label_data.get((self.selected_row, self.selected_col), {})
+        if 'params' not in label:
+            return
+
+        params = label['params']
+        controls = [self.crop_selector, self.blur_slider, self.logo_selector, self.text_line]
+
+        # Do not trigger a re-render of the label while loading its parameters
+        for control in controls:
+            control.blockSignals(True)
+        self.crop_selector.setCurrentText(params["crop"])
+        self.blur_slider.setValue(params["blur"])
+        self.logo_selector.setCurrentText(params["logo"])
+        self.text_line.setText(params["text"])
+        for control in controls:
+            control.blockSignals(False)
+
+    def cancel_pending(self) -> None:
+        """Discard all pending renders and imports, e.g. when the sheets are replaced
+        """
+        self.__render_timer__.stop()
+        self.__pending_render__ = None
+        self.__render_tokens__ = {}
+        self.__reloads__ = {}
+
+        pool = QThreadPool.globalInstance()
+        for workers in [self.__render_workers__, self.__import_workers__]:
+            for token, worker in list(workers.items()):
+                if pool.tryTake(worker):
+                    del workers[token]
+
+        # Batches stop submitting labels and do not report the ones still rendering
+        for worker in self.__batch_workers__:
+            worker.cancel()
+            pool.tryTake(worker)
+        self.__batch_workers__ = []
+        self.__batch_jobs__ = {}
+
+    def next_render_token(self, key:tuple) -> int:
+        """Issue a new render token for a label, invalidating all pending renders of it
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
+
+        Returns:
+            int: Render token
+        """
+        self.__render_counter__ += 1
+        self.__render_tokens__[key] = self.__render_counter__
+        return self.__render_counter__
+
+    def screen_dpi(self) -> int:
+        """Resolution at which a label covers the editor image canvas and its cell in the
+        template preview at 100% zoom on the current screen
+
+        Labels are rendered at this resolution for the editor and the template preview, the
+        PDF export renders them again at the export resolution.
+
+        Returns:
+            int: Resolution in dots per inch
+        """
+        dpi = 25.4 * max(PREVIEW_WIDTH / self.image_width, PREVIEW_HEIGHT / self.image_height, SCALE_FACTOR)
+        return max(DRAFT_DPI, math.ceil(dpi * self.devicePixelRatioF()))
+
     def generate_image(self) -> None:
         """Generates label and updates template preview
         """
         # Selected label
         row = self.selected_row
         col = self.selected_col
-        
-        # Design parameters
-        blur_strength = self.blur_slider.value()
-        logo_setting = self.logo_selector.currentText()
-        text_setting = self.text_line.text()
-        crop_setting = self.crop_selector.currentText()
 
         if (row, col) not in self.label_data:
             QMessageBox.critical(self, "Generation Failed", "Please select image for this label first.")
             self.clear_image()
             return
-    
-        # Original un-scaled PIL image
-        original_image = self.label_data[(row, col)]['original']
-        
-        # Convert dimensions from mm to inches and calculate required pixels for 150 DPI
-        image_width_inch = self.image_width / 25.4
-        image_height_inch = self.image_height / 25.4
-        target_width_px = int(150 * image_width_inch)
-        target_height_px = int(150 * image_height_inch)
-
-        # stretch is default
-        scaled_width = target_width_px
-        scaled_height = target_height_px
-
-        if crop_setting == "Fit Auto":
-            if original_image.height / original_image.width > target_height_px / target_width_px:
-                crop_setting = "Fit Height"
-            else:
-                crop_setting = "Fit Width"
 
-        if crop_setting == "Fit Height":
-            # Scale original image to the given height with the given DPI
-            scale_factor = target_height_px / original_image.height
-            scaled_width = int(original_image.width * scale_factor)
-        elif crop_setting == "Fit Width":
-            scale_factor = target_width_px / original_image.width
-            scaled_height = int(original_image.height * scale_factor)
+        # Supersede any pending live render of this label, the label is composed on the thread
+        # pool and applied once it is finished, unless it has been rendered before
+        self.__render_timer__.stop()
+        self.__pending_render__ = None
+        self.render_in_background((self.selected_sheet, row, col), self.current_params())
 
-        # Ensure the image has an alpha channel if required
-        if original_image.mode != "RGBA":
-            original_image = original_image.convert("RGBA")
+    def schedule_render(self, *args) -> None:
+        """Show a draft of the selected label immediately and render it in full quality once the
+        design parameters stopped changing
+        """
+        row = self.selected_row
+        col = self.selected_col
+        if (row, col) not in self.label_data:
+            return
 
-        original_scaled = original_image.resize((scaled_width, scaled_height), Image.Resampling.LANCZOS)
+        params = self.current_params()
 
-        # Create a blurred version of the original image by stretching to target size and gaussian blur
-        blurred_image = original_image.resize((target_width_px, target_height_px), Image.Resampling.LANCZOS)
-        blurred_image = blurred_image.filter(ImageFilter.GaussianBlur(blur_strength))
+        # Low resolution draft from a small proxy of the source
+        draft = render_label_from_source(
+            self.label_data[(row, col)]['source'],
+            self.image_width,
+            self.image_height,
+            dpi=DRAFT_DPI,
+            **params
+        )
+        self.show_preview_image(draft)
 
-        # Scale the blurred image to match the target width while keeping aspect ratio
-        scale_factor_blur = target_width_px / blurred_image.width
-        blurred_scaled_height = int(blurred_image.height * scale_factor_blur)
-        
-        blurred_scaled = blurred_image.resize((target_width_px, blurred_scaled_height), Image.Resampling.LANCZOS)
-        
-        # Create a new image with the required target dimensions for print
-        final_print_image = Image.new("RGBA", (target_width_px, target_height_px), (255, 255, 255, 255))
+        # (Re-)start the debounce timer for the full quality render
+        self.__pending_render__ = ((self.selected_sheet, row, col), params)
+        self.__render_timer__.start()
 
-        # Paste the blurred image as the background
-        final_print_image.paste(blurred_scaled, (0, 0))
-        
-        # Center the original scaled image over the blurred background
-        x_offset = (target_width_px - scaled_width) // 2
-        y_offset = (target_height_px - scaled_height) // 2
-        final_print_image.paste(original_scaled, (x_offset, y_offset), original_scaled)
-
-        # Obtain logo based on logo_setting
-        if logo_setting == "ESPuino":
-            logo_image = espuino_logo
-        elif logo_setting == "Tonuino":
-            logo_image = tonuino_logo
-        else:
-            logo_image = None
-            
-        # Add the logo to the image
-        if logo_image:
-            logo_scale_factor = 0.1
-            logo_target_width = int(target_width_px * logo_scale_factor)
-            
-            # Keep aspect ratio for the logo
-            logo_scale_factor = logo_target_width / logo_image.width
-            logo_target_height = int(logo_image.height * logo_scale_factor)
-            logo_resized = logo_image.resize((logo_target_width, logo_target_height), Image.Resampling.LANCZOS)
-            
-            # Paste the logo at the bottom-right corner
-            logo_x = target_width_px - logo_resized.width - 10
-            logo_y = target_height_px - logo_resized.height
-            final_print_image.paste(logo_resized, (logo_x, logo_y), mask=logo_resized.split()[3])
-
-        # Add text to the top if text_setting is not empty or None
-        if text_setting:
-            draw = ImageDraw.Draw(final_print_image)
-            font_size = 30
-            font = ImageFont.truetype("arial.ttf", font_size)
-            
-            # Calculate text size using textbbox
-            bounding_box = draw.textbbox((0, 0), text_setting, font=font)
-            text_width = bounding_box[2] - bounding_box[0]
-            text_height = bounding_box[3] - bounding_box[1]
-            
-            # Adjust font size if necessary
-            max_text_width = target_width_px * 0.9  # Ensure text doesn't span too wide
-            if text_width > max_text_width:
-                font_size = int(max_text_width / text_width * font_size)
-                font = ImageFont.truetype("arial.ttf", font_size)
-                bounding_box = draw.textbbox((0, 0), text_setting, font=font)
-                text_width = bounding_box[2] - bounding_box[0]
-                text_height = bounding_box[3] - bounding_box[1]
-
-            # Position and draw the text
-            text_x = (target_width_px - text_width) // 2
-            text_y = 10  # Position from top
-            
-            # Determine text color based on the brightness of the top section of the blurred image
-            top_region = blurred_scaled.crop((0, 0, target_width_px, text_height)).convert("L")
-            total_brightness = sum(top_region.getdata())
-            avg_brightness = total_brightness / (top_region.width * top_region.height)
-            
-            # Choose white text if the background is dark, otherwise black
-            text_color = (255, 255, 255, 255) if avg_brightness < 128 else (0, 0, 0, 255)
-
-            # Draw the text on the image
-            draw.text((text_x, text_y), text_setting, font=font, fill=text_color)
-
-        # Store the final composition for printing
-        self.label_data[(row, col)]['final_print'] = final_print_image
-        
-        # Prepare for UI: convert the final_print image to a scaled QPixmap
-        final_print_qimage = ImageQt.ImageQt(final_print_image)
-        final_pixmap = QPixmap.fromImage(final_print_qimage)
-        final_pixmap = final_pixmap.scaled(
-            PREVIEW_WIDTH, PREVIEW_HEIGHT,
-            Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-            Qt.TransformationMode.SmoothTransformation
+    def start_render(self) -> None:
+        """Render the pending label in full quality on the thread pool
+        """
+        if self.__pending_render__ is None:
+            return
+
+        key, params = self.__pending_render__
+        self.__pending_render__ = None
+        self.render_in_background(key, params)
+
+    def render_in_background(self, key:tuple, params:dict) -> None:
+        """Render a label in full quality on the thread pool
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
+            params (dict): Design parameters
+        """
+        sheet, row, col = key
+        if sheet >= len(self.sheets) or (row, col) not in self.sheets[sheet]:
+            return
+
+        worker = RenderWorker(
+            self.next_render_token(key),
+            key,
+            self.sheets[sheet][(row, col)]['source'],
+            self.image_width,
+            self.image_height,
+            params,
+            dpi=self.screen_dpi(),
+            render_cache=get_render_cache(),
         )
-        
-        # Set the preview image
-        self.image_preview.setPixmap(final_pixmap)
-        
+        worker.signals.finished.connect(self.render_finished)
+        worker.signals.failed.connect(self.render_failed)
+
+        # Drop a queued render of the same label that has not started yet
+        pool = QThreadPool.globalInstance()
+        for token, queued in list(self.__render_workers__.items()):
+            if queued.cell == key and pool.tryTake(queued):
+                del self.__render_workers__[token]
+
+        self.__render_workers__[worker.token] = worker
+        pool.start(worker)
+
+    def selected_labels(self) -> list:
+        """Labels marked in the preview and the selected label
+
+        Returns:
+            list: (sheet, row, col) keys of the labels
+        """
+        keys = set(self.marked_cells)
+        if self.selected_row is not None and self.selected_col is not None:
+            keys.add((self.selected_sheet, self.selected_row, self.selected_col))
+        return sorted(keys)
+
+    def sheet_labels(self) -> list:
+        """Labels of the selected sheet
+
+        Returns:
+            list: (sheet, row, col) keys of the labels
+        """
+        return sorted((self.selected_sheet,) + cell for cell in self.label_data)
+
+    def all_labels(self) -> list:
+        """Labels of all sheets
+
+        Returns:
+            list: (sheet, row, col) keys of the labels
+        """
+        return sorted((sheet,) + cell for sheet, label_data in enumerate(self.sheets) for cell in label_data)
+
+    def apply_to_labels(self, keys:list, same_params:bool=True) -> None:
+        """Regenerate labels on all CPU cores, each label appears in the preview as it finishes
+
+        Args:
+            keys (list): (sheet, row, col) keys of the labels, keys without an image are skipped
+            same_params (bool, optional): Apply the design parameters of the editor controls,
+                texts are specific to a label and only applied to the selected label. Otherwise
+                each label is regenerated with its own parameters. Defaults to True.
+        """
+        params = self.current_params()
+        selected = (self.selected_sheet, self.selected_row, self.selected_col)
+
+        jobs = []
+        for key in keys:
+            sheet, row, col = key
+            label = self.sheets[sheet].get((row, col)) if sheet < len(self.sheets) else None
+            if label is None:
+                continue
+
+            if not same_params:
+                if 'params' not in label:
+                    continue
+                label_params = label['params']
+            elif key == selected:
+                label_params = params
+            else:
+                label_params = dict(params, text=label.get('params', {}).get('text', ""))
+            jobs.append(RenderJob(self.next_render_token(key), key, label['source'], label_params))
+
+        if not jobs:
+            if self.__logger__:
+                self.__logger__.log("No labels with an image to regenerate", logging.WARNING)
+            return
+
+        # Supersede any pending live render, the batch renders the selected label as well
+        self.__render_timer__.stop()
+        self.__pending_render__ = None
+
+        worker = BatchRenderWorker(jobs, self.image_width, self.image_height, dpi=self.screen_dpi(),
+                                   render_cache=get_render_cache())
+        worker.signals.finished.connect(self.render_finished)
+        worker.signals.failed.connect(self.render_failed)
+
+        # Batches whose labels all finished are no longer tracked
+        self.__batch_workers__ = [queued for queued in self.__batch_workers__
+                                  if any(job.token in self.__batch_jobs__ for job in queued.jobs)]
+        self.__batch_workers__.append(worker)
+        self.__batch_jobs__.update((job.token, job) for job in jobs)
+        QThreadPool.globalInstance().start(worker)
+
+        if self.__logger__:
+            self.__logger__.log(f"Regenerating {len(jobs)} label(s) on {PROCESS_COUNT} processes ...")
+
+    def load_sheets(self, sheets:list) -> None:
+        """Replace all sheets, e.g. by the sheets of a loaded project
+
+        Labels found in the render cache are shown immediately, all others are rendered
+        on the thread pool.
+
+        Args:
+            sheets (list): Label data dictionaries, one per sheet, keyed by (row, col)
+        """
+        self.sheets = sheets
+        self.selected_sheet = 0
+        self.marked_cells = set()
+        self.cancel_pending()
+
+        cache = get_render_cache()
+        dpi = self.screen_dpi()
+        for sheet, label_data in enumerate(sheets):
+            for (row, col), label in label_data.items():
+                if 'params' not in label:
+                    continue
+                key = cache.key(label['source'].digest, self.image_width, self.image_height, label['params'], dpi)
+                final_print_image = cache.get(key)
+                if final_print_image is None:
+                    self.render_in_background((sheet, row, col), label['params'])
+                else:
+                    label['final_print'] = get_label_store().put(final_print_image)
+
+        self.load_label_params()
+        self.draw_original_image()
+        self.update_watched_sources()
+
+    def render_finished(self, token:int, key:tuple, image:Image.Image) -> None:
+        """Apply a label rendered on the thread pool, unless it has been superseded
+
+        Args:
+            token (int): Render token
+            key (tuple): (sheet, row, col) the label was rendered for
+            image (Image.Image): Rendered label
+        """
+        worker = self.__render_workers__.pop(token, None) or self.__batch_jobs__.pop(token, None)
+        if worker is None or self.__render_tokens__.get(key) != token:
+            return
+
+        # The label may have been removed or loaded with another image in the meantime
+        sheet, row, col = key
+        if sheet >= len(self.sheets) or (row, col) not in self.sheets[sheet]:
+            return
+        if self.sheets[sheet][(row, col)]['source'] is not worker.source:
+            return
+
+        self.apply_label(key, image, worker.params)
+
+    def render_failed(self, token:int, key:tuple, error:str) -> None:
+        self.__render_workers__.pop(token, None)
+        self.__batch_jobs__.pop(token, None)
+        if self.__logger__:
+            self.__logger__.log(f"Label generation for ({key[1] + 1}, {key[2] + 1}) failed with error: {error}",
+                                logging.ERROR)
+
+    def apply_label(self, key:tuple, final_print_image:Image.Image, params:dict) -> None:
+        """Store a generated label and show it in the editor and the template preview
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
+            final_print_image (Image.Image): Generated label
+            params (dict): Design parameters the label was generated with
+        """
+        sheet, row, col = key
+
+        # Store the final composition and its parameters for printing, the label store spills it
+        # to disk beyond its memory budget
+        self.sheets[sheet][(row, col)]['final_print'] = get_label_store().put(final_print_image)
+        self.sheets[sheet][(row, col)]['params'] = params
+
+        with span("convert to QImage"):
+            final_print_qimage = ImageQt.ImageQt(final_print_image)
+
+        # Set the editor preview image if the label is still selected
+        if key == (self.selected_sheet, self.selected_row, self.selected_col):
+            self.show_preview_image(final_print_image)
+
         # Log
         if self.__logger__:
             self.__logger__.log(f"Generated label for ({row+1}, {col+1})")
-        
+
         # Update the image in the preview widget
         if self.__previewer__:
-            self.__previewer__.updateStickerImage(final_print_qimage)
-    
+            self.__previewer__.updateStickerImage(final_print_qimage, row, col, sheet)
+
+    def show_preview_image(self, image:Image.Image) -> None:
+        """Show a generated label in the editor image canvas
+
+        Args:
+            image (Image.Image): Generated label
+        """
+        # Prepare for UI: convert the image to a scaled QPixmap
+        with span("convert to QPixmap"):
+            pixmap = QPixmap.fromImage(ImageQt.ImageQt(image))
+            pixmap = pixmap.scaled(
+                PREVIEW_WIDTH, PREVIEW_HEIGHT,
+                Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                Qt.TransformationMode.SmoothTransformation
+            )
+        self.image_preview.setPixmap(pixmap)
+
     def draw_original_image(self) -> None:
         """Draws image from label data to editor image canvas
         """
@@ -309,9 +599,10 @@ class EditOptionsWidget(QWidget):
             return
     
         if 'final_print' in self.label_data[(row, col)]:
-            original_image = self.label_data[(row, col)]['final_print']
+            original_image = self.label_data[(row, col)]['final_print'].image()
         else:
-            original_image = self.label_data[(row, col)]['original']
+            # Smallest decoded proxy of the source sufficient for the canvas
+            original_image = self.label_data[(row, col)]['source'].proxy_to_fit(PREVIEW_WIDTH, PREVIEW_HEIGHT)
                        
         # Scale the original image to fit the required height with aspect ratio
         target_height = scaled_height = PREVIEW_HEIGHT
@@ -364,30 +655,33 @@ class EditOptionsWidget(QWidget):
         self.image_preview.setPixmap(final_pixmap)
 
     def select_image(self) -> None:
-        """Opens selected image using PIL stores image in label data
+        """Opens selected images and fills the labels starting from the selected one
         """
         if self.selected_col is None or self.selected_row is None:
             QMessageBox.critical(self, "Image Selection Failed", "Please select a label in the preview image first.")
             self.clear_image()
             return
         
-        file_name, _ = QFileDialog.getOpenFileName(
+        file_names, _ = QFileDialog.getOpenFileNames(
             self, 
-            "Select an Image", 
+            "Select Images",
             "", 
-            "Image Files (*.png *.jpg *.jpeg *.bmp)"
+            "Image Files (" + " ".join(f"*{extension}" for extension in IMAGE_EXTENSIONS) + ")"
         )
-        if file_name:
-            row = self.selected_row
-            col = self.selected_col 
-            
-            self.label_data[(row, col)] = {}
-            self.label_data[(row, col)]['path'] = file_name
-            self.label_data[(row, col)]['original'] = Image.open(file_name)
-            self.draw_original_image()
-            
-            if self.__logger__:
-                self.__logger__.log(f"Loaded image {file_name} for label ({row + 1},{col + 1})")
+        if file_names:
+            self.import_images(file_names)
+
+    def select_folder(self) -> None:
+        """Opens all images of a folder and fills the labels starting from the selected one
+        """
+        if self.selected_col is None or self.selected_row is None:
+            QMessageBox.critical(self, "Image Selection Failed", "Please select a label in the preview image first.")
+            self.clear_image()
+            return
+
+        folder = QFileDialog.getExistingDirectory(self, "Select Image Folder")
+        if folder:
+            self.import_images([folder])
 
     def load_image_from_clipboard(self) -> None:
         """Load image form clipboard
@@ -397,6 +691,8 @@ class EditOptionsWidget(QWidget):
             self.clear_image()
             return
 
+        # ImageGrab loads platform clipboard support, only needed here
+        from PIL import ImageGrab
         data = ImageGrab.grabclipboard()
         if data:
             if isinstance(data, Image.Image):
@@ -405,12 +701,218 @@ class EditOptionsWidget(QWidget):
                 col = self.selected_col
 
                 self.label_data[(row, col)] = {}
-                self.label_data[(row, col)]['original'] = data
+                self.label_data[(row, col)]['source'] = SourceImage.from_image(data)
                 self.draw_original_image()
 
                 if self.__logger__:
                     self.__logger__.log(f"Loaded image from clipboard for label ({row + 1},{col + 1})")
 
             if isinstance(data, list):
-                raise NotImplementedError(
-                    "Loading single/multiple file pathlist from clipboard is currently not supported")
+                # Copied files and folders
+                self.import_images(data)
+
+    def free_cells(self, start:tuple, count:int) -> list:
+        """Find labels to fill in order, adding sheets if required
+
+        The start label is always used, following labels are skipped if they already have an
+        image or an import pending.
+
+        Args:
+            start (tuple): (sheet, row, col) of the first label
+            count (int): Number of labels
+
+        Returns:
+            list: (sheet, row, col) keys of the labels
+        """
+        rows, cols = self.config["sticker_pattern"]
+        sheet, row, col = start
+        index = row * cols + col
+
+        cells = []
+        while len(cells) < count:
+            if index == rows * cols:
+                sheet, index = sheet + 1, 0
+                if sheet == len(self.sheets):
+                    self.sheets.append({})
+                continue
+
+            key = (sheet,) + divmod(index, cols)
+            pending = any(worker.cell == key for worker in self.__import_workers__.values())
+            if key == start or (key[1:] not in self.sheets[sheet] and not pending):
+                cells.append(key)
+            index += 1
+        return cells
+
+    def import_images(self, paths:list, start:tuple=None) -> None:
+        """Open images on the thread pool and fill the labels in order
+
+        A single image is loaded into the start label for editing. Several images are rendered
+        with the current design parameters and appear in the preview as they finish.
+
+        Args:
+            paths (list): Image files and folders
+            start (tuple, optional): (sheet, row, col) of the first label. Defaults to the
+                selected label.
+        """
+        if self.config is None:
+            return
+
+        paths = find_images(paths)
+        if not paths:
+            if self.__logger__:
+                self.__logger__.log("No supported images found", logging.WARNING)
+            return
+
+        if start is None:
+            start = (self.selected_sheet, self.selected_row or 0, self.selected_col or 0)
+
+        sheet_count = len(self.sheets)
+        cells = self.free_cells(start, len(paths))
+        if len(self.sheets) > sheet_count and self.__previewer__:
+            self.__previewer__.sync_sheets()
+
+        # Texts are specific to a label and not applied to bulk imports
+        params = None
+        if len(paths) > 1:
+            params = dict(self.current_params(), text="")
+
+        pool = QThreadPool.globalInstance()
+        for path, key in zip(paths, cells):
+            worker = ImportWorker(
+                self.next_render_token(key),
+                key,
+                path,
+                self.image_width,
+                self.image_height,
+                params=params,
+                dpi=self.screen_dpi(),
+                proxy_size=(PREVIEW_WIDTH, PREVIEW_HEIGHT),
+            )
+            worker.signals.finished.connect(self.import_finished)
+            worker.signals.failed.connect(self.import_failed)
+            self.__import_workers__[worker.token] = worker
+            pool.start(worker)
+
+        if self.__logger__:
+            self.__logger__.log(f"Importing {len(paths)} image(s) ...")
+
+    def import_finished(self, token:int, key:tuple, source:SourceImage, image:Image.Image) -> None:
+        """Store an imported image, unless the label has been changed in the meantime
+
+        Args:
+            token (int): Render token
+            key (tuple): (sheet, row, col) of the label
+            source (SourceImage): Opened source image
+            image (Image.Image): Rendered label or None
+        """
+        worker = self.__import_workers__.pop(token, None)
+        reloads = self.__reloads__.pop(token, [])
+        if worker is not None and reloads:
+            self.reload_labels(reloads, worker.path, source)
+        if worker is None or self.__render_tokens__.get(key) != token:
+            return
+
+        sheet, row, col = key
+        if sheet >= len(self.sheets):
+            return
+
+        self.sheets[sheet][(row, col)] = {'path': worker.path, 'source': source}
+        self.update_watched_sources()
+        if self.__logger__:
+            self.__logger__.log(f"Loaded image {worker.path} for label ({row + 1},{col + 1})")
+
+        if image is not None:
+            self.apply_label(key, image, worker.params)
+        elif key == (self.selected_sheet, self.selected_row, self.selected_col):
+            self.draw_original_image()
+
+    @staticmethod
+    def watched_path(label:dict) -> str:
+        """File a label is reloaded from when it changes
+
+        Args:
+            label (dict): Label data of a single cell
+
+        Returns:
+            str: Absolute path of the original image file, which differs from the path of the
+                source for labels of loaded projects, or None for images from the clipboard
+        """
+        path = label.get('origin') or label.get('path')
+        return os.path.abspath(path) if path else None
+
+    def update_watched_sources(self) -> None:
+        """Watch the image files of all labels if Watch Files is checked
+        """
+        paths = set()
+        if self.watch_checkbox.isChecked():
+            paths = {self.watched_path(label) for label_data in self.sheets for label in label_data.values()}
+            paths.discard(None)
+        self.__source_watcher__.set_paths(paths)
+
+    def reload_source(self, path:str) -> None:
+        """Decode a changed image file again and render the labels using it on the thread pool,
+        each with its own design parameters
+
+        The file is opened and hashed once by an import worker rendering one of the labels, the
+        other labels are rendered with its source by reload_labels.
+
+        Args:
+            path (str): Absolute path of the changed file
+        """
+        keys = [(sheet, row, col) for sheet, label_data in enumerate(self.sheets)
+                for (row, col), label in label_data.items() if self.watched_path(label) == path]
+        if not keys:
+            return
+
+        # The selected label comes first, its worker also decodes the proxy of the editor canvas
+        selected = (self.selected_sheet, self.selected_row, self.selected_col)
+        key = selected if selected in keys else keys[0]
+        sheet, row, col = key
+        worker = ImportWorker(
+            self.next_render_token(key),
+            key,
+            path,
+            self.image_width,
+            self.image_height,
+            params=self.sheets[sheet][(row, col)].get('params'),
+            dpi=self.screen_dpi(),
+            proxy_size=(PREVIEW_WIDTH, PREVIEW_HEIGHT) if key == selected else None,
+        )
+        worker.signals.finished.connect(self.import_finished)
+        worker.signals.failed.connect(self.import_failed)
+        self.__import_workers__[worker.token] = worker
+        self.__reloads__[worker.token] = [other for other in keys if other != key]
+        QThreadPool.globalInstance().start(worker)
+
+        if self.__logger__:
+            self.__logger__.log(f"Image {path} changed, rendering {len(keys)} label(s) again ...")
+
+    def reload_labels(self, keys:list, path:str, source:SourceImage) -> None:
+        """Render labels of a changed image file with its reopened source on the thread pool,
+        each with its own design parameters
+
+        Args:
+            keys (list): (sheet, row, col) of the labels
+            path (str): Absolute path of the changed file
+            source (SourceImage): Source opened from the changed file
+        """
+        for key in keys:
+            sheet, row, col = key
+            if sheet >= len(self.sheets) or (row, col) not in self.sheets[sheet]:
+                continue
+
+            # Labels loaded with another image in the meantime are kept
+            label = self.sheets[sheet][(row, col)]
+            if self.watched_path(label) != path:
+                continue
+
+            # The label keeps its previous image until it is rendered again
+            self.sheets[sheet][(row, col)] = dict(label, path=path, source=source)
+            if label.get('params') is not None:
+                self.render_in_background(key, label['params'])
+
+    def import_failed(self, token:int, key:tuple, error:str) -> None:
+        self.__reloads__.pop(token, None)
+        worker = self.__import_workers__.pop(token, None)
+        if self.__logger__ and worker is not None:
+            self.__logger__.log(f"Loading image {worker.path} failed with error: {error}", logging.ERROR)
@@ -0,0 +1,98 @@
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from .log_queue import get_logger
+from .pdf_generator import PDFCreator
+from .tracing import operation
+
+
+def snapshot_sheets(template:dict, sheets:list) -> list:
+    """Copy the project sheets so that edits during an export do not affect it
+
+    The label images themselves are never modified in place by the editor, copying the
+    containers is sufficient.
+
+    Args:
+        template (dict): Template configuration
+        sheets (list): List of label_data dicts as stored in Editor widget class
+
+    Returns:
+        list: List of (template, label_data) tuples as expected by PDFCreator.export_pdf
+    """
+    template = dict(template)
+    return [(template, {cell: dict(label) for cell, label in label_data.items()}) for label_data in sheets]
+
+
+class ExportSignals(QObject):
+    # Number of placed labels, total number of labels
+    cell_progress = pyqtSignal(int, int)
+    # Number of written pages, total number of pages
+    page_progress = pyqtSignal(int, int)
+    # Status message for the logger
+    message = pyqtSignal(str)
+    # Completed, output path if completed, else error message or empty string if cancelled
+    finished = pyqtSignal(bool, str)
+
+
+class ExportWorker(QRunnable):
+    """Runs a PDF export on a thread pool thread
+
+    The sheets must be a snapshot as returned by snapshot_sheets.
+    """
+    def __init__(self, pdf:PDFCreator, sheets:list, output_path:str):
+        super(ExportWorker, self).__init__()
+        self.setAutoDelete(False)
+
+        # Public class attributes
+        self.pdf = pdf
+        self.sheets = sheets
+        self.output_path = output_path
+        self.signals = ExportSignals()
+
+        # Private class attributes
+        self.__cancel_event__ = threading.Event()
+        self.__cells_done__ = 0
+        self.__cell_count__ = sum(
+            1 for _, label_data in sheets for label in label_data.values() if 'final_print' in label
+        )
+
+    def cancel(self) -> None:
+        """Request cancellation, the export stops before the next page
+        """
+        self.__cancel_event__.set()
+
+    def is_cancelled(self) -> bool:
+        return self.__cancel_event__.is_set()
+
+    def cell_done(self, page_number:int, row:int, col:int) -> None:
+        self.__cells_done__ += 1
+        self.signals.cell_progress.emit(self.__cells_done__, self.__cell_count__)
+
+    def page_done(self, page_number:int, page_count:int) -> None:
+        self.signals.page_progress.emit(page_number, page_count)
+        get_logger().info(f"Exported page {page_number}/{page_count}")
+
+    def run(self) -> None:
+        try:
+            with operation("Export PDF", pages=len(self.sheets), mode=self.pdf.mode, dpi=self.pdf.dpi):
+                completed = self.pdf.export_pdf(
+                    self.sheets,
+                    self.output_path,
+                    progress_callback=self.page_done,
+                    is_cancelled=self.is_cancelled,
+                    cell_callback=self.cell_done,
+                )
+        except Exception as e:
+            self.signals.finished.emit(False, str(e))
+            return
+
+        if completed:
+            stats = self.pdf.stats
+            self.signals.message.emit(
+                f"Exported {stats['cells_rendered'] + stats['cells_reused']} label(s), "
+                f"{stats['cells_reused']} unchanged since the previous export"
+            )
+            self.signals.finished.emit(True, self.output_path)
+        else:
+            self.signals.finished.emit(False, "")
@@ -1,26 +1,218 @@
-from PyQt6.QtWidgets import QWidget, QTextEdit, QVBoxLayout
+import logging
+import os
+from collections import deque
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QAction, QActionGroup
+from PyQt6.QtWidgets import QWidget, QPlainTextEdit, QVBoxLayout, QFileDialog, QMessageBox
 
 from time import gmtime, strftime
 
+from .log_queue import LogQueue, get_logger, set_log_file, log_file, LOG_FILE_ENV
+from .render_cache import default_cache_dir
+from .tracing import tracer
+
+# Interval in ms in which queued messages are shown in the log window
+LOG_FLUSH_MS = 100
+
+# Number of lines kept in the log window, older lines are removed
+MAX_LOG_LINES = 1000
+
+# Messages queued at most between two updates of the log window
+MAX_QUEUED_MESSAGES = 10000
+
+# Levels of the log window filter
+LOG_LEVELS = [
+    ("Debug", logging.DEBUG),
+    ("Info", logging.INFO),
+    ("Warning", logging.WARNING),
+    ("Error", logging.ERROR),
+]
+
 class FooterWidget(QWidget):
     def __init__(self):
         super(FooterWidget, self).__init__()
         layout = QVBoxLayout()
 
         # Log window
-        self.log_window = QTextEdit()
+        self.log_window = QPlainTextEdit()
         self.log_window.setStyleSheet("background-color: black; color: white; font-family: Sans-Serif;")
         self.log_window.setReadOnly(True)
+        self.log_window.setUndoRedoEnabled(False)
+        self.log_window.setMaximumBlockCount(MAX_LOG_LINES)
+        self.log_window.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.log_window.customContextMenuRequested.connect(self.show_context_menu)
+
+        # Public class attributes
+        self.level = logging.INFO
+
+        # Private class attributes, the lines of all levels are kept to filter them again
+        self.__lines__ = deque(maxlen=MAX_LOG_LINES)
+        self.__queue__ = LogQueue(MAX_QUEUED_MESSAGES)
+
+        # Messages of all threads are queued and shown in batches
+        logger = get_logger()
+        log_queue = self.__queue__
+        logger.addHandler(log_queue)
+        self.destroyed.connect(lambda: logger.removeHandler(log_queue))
+        self.__flush_timer__ = QTimer(self)
+        self.__flush_timer__.setInterval(LOG_FLUSH_MS)
+        self.__flush_timer__.timeout.connect(self.flush)
+        self.__flush_timer__.start()
+
+        if os.environ.get(LOG_FILE_ENV):
+            set_log_file(os.environ[LOG_FILE_ENV])
+
+        # Log a summary of every traced operation
+        tracer.add_listener(lambda operation: logger.info(operation.summary()))
 
         layout.addWidget(self.log_window)
         self.setLayout(layout)
-        
-    def log(self, message:str) -> None:
-        """Prints message to log widget
+
+    def log(self, message:str, level:int=logging.INFO) -> None:
+        """Prints message to log widget, may be called from any thread
 
         Args:
             message (str): Message
+            level (int, optional): Severity as defined by the logging module. Defaults to logging.INFO.
         """
         if message:
-            self.log_window.append(strftime("%Y-%m-%d %H:%M:%S", gmtime()) + " - " + message)
-        
\ No newline at end of file
+            get_logger().log(level, message)
+
+    def flush(self) -> None:
+        """Show all queued messages in the log window at once
+        """
+        records, dropped = self.__queue__.drain()
+        if not records and not dropped:
+            return
+
+        lines = [(record.levelno, self.format_record(record)) for record in records[-MAX_LOG_LINES:]]
+        if dropped:
+            lines.insert(0, (logging.WARNING, f"{dropped} message(s) dropped"))
+        self.__lines__.extend(lines)
+
+        visible = [line for levelno, line in lines if levelno >= self.level]
+        if visible:
+            self.log_window.appendPlainText("\n".join(visible))
+
+    @staticmethod
+    def format_record(record:logging.LogRecord) -> str:
+        line = strftime("%Y-%m-%d %H:%M:%S", gmtime(record.created)) + " - "
+        if record.levelno >= logging.WARNING:
+            line += record.levelname.capitalize() + ": "
+        return line + record.getMessage()
+
+    def set_level(self, level:int) -> None:
+        """Show only messages of the given or a higher level
+
+        Args:
+            level (int): Severity as defined by the logging module
+        """
+        self.flush()
+        self.level = level
+        self.log_window.setPlainText("\n".join(line for levelno, line in self.__lines__ if levelno >= level))
+        self.log_window.verticalScrollBar().setValue(self.log_window.verticalScrollBar().maximum())
+
+    def show_context_menu(self, position) -> None:
+        """Show the log window context menu extended by filter, log file and tracing actions
+
+        Args:
+            position (QPoint): Position in log window coordinates
+        """
+        menu = self.log_window.createStandardContextMenu()
+        menu.addSeparator()
+
+        level_menu = menu.addMenu("Show Messages")
+        level_group = QActionGroup(level_menu)
+        for title, level in LOG_LEVELS:
+            action = QAction(title, level_group)
+            action.setCheckable(True)
+            action.setChecked(level == self.level)
+            action.triggered.connect(lambda checked, level=level: self.set_level(level))
+            level_menu.addAction(action)
+
+        log_file_action = QAction("Write Log File ...", menu)
+        log_file_action.setCheckable(True)
+        log_file_action.setChecked(log_file() is not None)
+        log_file_action.toggled.connect(self.set_log_file)
+        menu.addAction(log_file_action)
+        menu.addSeparator()
+
+        tracing_action = QAction("Trace Render and Export Stages", menu)
+        tracing_action.setCheckable(True)
+        tracing_action.setChecked(tracer.enabled)
+        tracing_action.toggled.connect(self.set_tracing)
+        menu.addAction(tracing_action)
+
+        for title, slot in [("Show Stage Statistics", self.log_stage_stats),
+                            ("Export Trace ...", self.export_trace),
+                            ("Export Stage Statistics ...", self.export_stage_stats),
+                            ("Clear Trace", tracer.clear)]:
+            action = QAction(title, menu)
+            action.triggered.connect(slot)
+            menu.addAction(action)
+
+        menu.exec(self.log_window.viewport().mapToGlobal(position))
+
+    def set_log_file(self, enabled:bool) -> None:
+        """Start writing the full log history to a rotating log file or stop it
+
+        Args:
+            enabled (bool): Ask for a log file and start writing if True, else stop writing
+        """
+        if not enabled:
+            set_log_file(None)
+            self.log("Stopped writing the log file")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Write Log File", os.path.join(default_cache_dir(), "tonuino.log"),
+                                              "Log Files (*.log)")
+        if not path:
+            return
+        try:
+            set_log_file(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Log File Failed", f"Failed to open log file: {str(e)}")
+            return
+        self.log(f"Writing log file {path}")
+
+    def set_tracing(self, enabled:bool) -> None:
+        tracer.enabled = enabled
+        self.log("Tracing enabled" if enabled else "Tracing disabled")
+
+    def log_stage_stats(self) -> None:
+        """Print the cumulative statistics per stage to the log window
+        """
+        stats = tracer.stats()
+        if not stats:
+            self.log("No stages traced yet")
+            return
+        for name, count, total, self_time, mean, longest in stats:
+            self.log(f"{name}: {count} call(s), {self_time:.0f} ms self, {total:.0f} ms total, "
+                     f"{mean:.1f} ms mean, {longest:.1f} ms max")
+
+    def export_trace(self) -> None:
+        """Save all recorded spans as Chrome trace, e.g. for chrome://tracing or ui.perfetto.dev
+        """
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Chrome Trace (*.json)")
+        if not path:
+            return
+        try:
+            tracer.export_chrome_trace(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", f"Failed to export trace: {str(e)}")
+            return
+        self.log(f"Exported trace to {path}")
+
+    def export_stage_stats(self) -> None:
+        """Save the cumulative statistics per stage as CSV file
+        """
+        path, _ = QFileDialog.getSaveFileName(self, "Export Stage Statistics", "stages.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            tracer.export_stats(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", f"Failed to export stage statistics: {str(e)}")
+            return
+        self.log(f"Exported stage statistics to {path}")
@@ -1,37 +1,107 @@
 import os
 import sys
 import json
+import threading
 from PIL import Image
 
+# Directories searched for resource files, relative to the application base path. The first
+# one is used when running from source, the second one in the PyInstaller build.
+RESOURCE_DIRS = ["../resources", "resources"]
+
+# Resources loaded so far by file name
+_resources = {}
+_resources_lock = threading.Lock()
+
+
 def resource_path(relative_path:str):
     """
     Get the absolute path to the resource, works for dev and for PyInstaller
-    
+
     Args:
         relative_path (str): Path to resource file
     """
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-try:
-    json_path = resource_path('../resources/templates.json')
-    with open(json_path, 'r') as file:
-        template_data = json.load(file)
-except:
-    json_path = resource_path('resources/templates.json')
-    with open(json_path, 'r') as file:
-        template_data = json.load(file)
-        
-try:
-    espuino_logo_path = resource_path('../resources/espuino_logo.png')
-    espuino_logo = Image.open(espuino_logo_path)
-except:
-    espuino_logo_path = resource_path('resources/espuino_logo.png')
-    espuino_logo = Image.open(espuino_logo_path)
-    
-try:
-    tonuino_logo_path = resource_path('../resources/tonuino_logo.png')
-    tonuino_logo = Image.open(tonuino_logo_path)
-except:
-    tonuino_logo_path = resource_path('resources/tonuino_logo.png')
-    tonuino_logo = Image.open(tonuino_logo_path)
+
+def find_resource(file_name:str) -> str:
+    """Find a resource file in the resource directories
+
+    Args:
+        file_name (str): File name of the resource
+
+    Raises:
+        FileNotFoundError: The resource is in none of the resource directories
+
+    Returns:
+        str: Absolute path of the resource file
+    """
+    for directory in RESOURCE_DIRS:
+        path = resource_path(os.path.join(directory, file_name))
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"Resource '{file_name}' not found")
+
+
+def load_resource(file_name:str, loader) -> object:
+    """Load a resource on first use, later calls return the same object
+
+    Args:
+        file_name (str): File name of the resource
+        loader (callable): Function loading the resource from its path
+
+    Returns:
+        object: Loaded resource
+    """
+    with _resources_lock:
+        if file_name not in _resources:
+            _resources[file_name] = loader(find_resource(file_name))
+        return _resources[file_name]
+
+
+def _load_json(path:str) -> dict:
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def _load_image(path:str) -> Image.Image:
+    # Decode the image right away and release its file, a lazily opened file would share its
+    # read position with forked worker processes and render threads
+    with Image.open(path) as image:
+        image.load()
+    return image
+
+
+def get_templates() -> dict:
+    """Label templates by name
+
+    Returns:
+        dict: Template configurations from templates.json
+    """
+    return load_resource('templates.json', _load_json)
+
+
+def get_image(file_name:str) -> Image.Image:
+    """Image resource, e.g. a logo
+
+    Args:
+        file_name (str): File name of the image
+
+    Returns:
+        Image.Image: Decoded image, shared by all callers and not to be modified
+    """
+    return load_resource(file_name, _load_image)
+
+
+# Resources formerly loaded at import time, resolved on first access
+_LAZY_RESOURCES = {
+    "template_data": get_templates,
+    "espuino_logo": lambda: get_image('espuino_logo.png'),
+    "tonuino_logo": lambda: get_image('tonuino_logo.png'),
+}
+
+
+def __getattr__(name:str):
+    if name in _LAZY_RESOURCES:
+        return _LAZY_RESOURCES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
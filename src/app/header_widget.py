@@ -1,9 +1,15 @@
-from PyQt6.QtWidgets import QWidget, QPushButton, QLineEdit, QComboBox, QHBoxLayout, QFileDialog, QMessageBox
+from PyQt6.QtCore import Qt, QThreadPool, QStringListModel
+from PyQt6.QtWidgets import QWidget, QPushButton, QLineEdit, QComboBox, QHBoxLayout, QFileDialog, QMessageBox, \
+    QProgressBar, QCompleter
 
+import logging
 import os
 import app
 
-from .pdf_generator import PDFCreator
+from .pdf_generator import PDFCreator, NATIVE
+from .export_worker import ExportWorker, snapshot_sheets
+from .project import save_project, load_project, PROJECT_EXTENSION, PROJECT_FILTER
+from .template_catalog import get_catalog
 
 class HeaderWidget(QWidget):
     def __init__(self):
@@ -14,6 +20,16 @@ class HeaderWidget(QWidget):
         self.__editor__ = None
         self.__logger__ = None
         self.__templates__ = [None]
+        self.__export_worker__ = None
+
+        # Kept between exports, so a re-export only processes changed labels
+        self.__pdf_creator__ = PDFCreator(dpi=300, mode=NATIVE)
+
+        # Project file buttons
+        self.open_project_btn = QPushButton("Open Project")
+        self.open_project_btn.clicked.connect(self.open_project)
+        self.save_project_btn = QPushButton("Save Project")
+        self.save_project_btn.clicked.connect(self.save_project)
 
         # Button for project path
         self.project_path_btn = QPushButton("Select Export Path")
@@ -22,21 +38,41 @@ class HeaderWidget(QWidget):
         self.project_path_display = QLineEdit()
         self.project_path_display.setReadOnly(True)
 
-        # Label template dropdown
+        # Label template dropdown, typing words of a template name lists the matching templates
         self.label_template_dropdown = QComboBox()
-        self.__templates__ = [k for k,_ in app.template_data.items()]
+        self.__templates__ = list(get_catalog())
         self.label_template_dropdown.addItems(self.__templates__)
-        self.label_template_dropdown.currentTextChanged.connect(self.selected_template)
+        self.label_template_dropdown.setEditable(True)
+        self.label_template_dropdown.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        self.label_template_dropdown.setToolTip("Type to search templates")
+        self.__template_matches__ = QStringListModel(self.__templates__, self)
+        template_completer = QCompleter(self.__template_matches__, self)
+        template_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        template_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        template_completer.activated.connect(self.select_template_name)
+        self.label_template_dropdown.setCompleter(template_completer)
+        self.label_template_dropdown.lineEdit().textEdited.connect(self.search_templates)
+        self.label_template_dropdown.lineEdit().editingFinished.connect(self.restore_template_name)
+        self.label_template_dropdown.currentIndexChanged.connect(
+            lambda index: self.selected_template(self.__templates__[index]) if index >= 0 else None)
 
         # Build button
         self.build_button = QPushButton("Export PDF")
         self.build_button.clicked.connect(self.build_project)
 
+        # Export progress
+        self.export_progress_bar = QProgressBar()
+        self.export_progress_bar.setFixedWidth(160)
+        self.export_progress_bar.setVisible(False)
+
         # Add widgets to layout
         layout = QHBoxLayout()
+        layout.addWidget(self.open_project_btn)
+        layout.addWidget(self.save_project_btn)
         layout.addWidget(self.project_path_btn)
         layout.addWidget(self.project_path_display)
         layout.addWidget(self.label_template_dropdown)
+        layout.addWidget(self.export_progress_bar)
         layout.addWidget(self.build_button)
         self.setLayout(layout)
         
@@ -56,6 +92,9 @@ class HeaderWidget(QWidget):
             logger (ui.FooterWidget): Instance of logger widget class
         """
         self.__logger__ = logger
+
+        for error in get_catalog().errors:
+            self.__logger__.log(f"Skipped template: {error}", logging.WARNING)
         
     def registerEditor(self, editor:app.EditOptionsWidget) -> None:
         """Register the editor widget
@@ -73,9 +112,40 @@ class HeaderWidget(QWidget):
         """
         if self.__logger__:
             self.__logger__.log("New template selected. Clearing label data.")
-        self.__previewer__.select_template(index)
+        # The editor clears its sheets first, so the previewer shows an empty project
         self.__editor__.select_template(index)
+        self.__previewer__.select_template(index)
         
+    def current_template(self) -> str:
+        """Name of the selected template, regardless of a search typed into the dropdown
+        """
+        return self.__templates__[self.label_template_dropdown.currentIndex()]
+
+    def search_templates(self, text:str) -> None:
+        """Show the templates containing all typed words below the dropdown
+
+        Args:
+            text (str): Search text
+        """
+        self.__template_matches__.setStringList(get_catalog().search(text))
+        self.label_template_dropdown.completer().complete()
+
+    def select_template_name(self, name:str) -> None:
+        """Select a template found by the search
+
+        Args:
+            name (str): Template name
+        """
+        if name in self.__templates__:
+            self.label_template_dropdown.setCurrentIndex(self.__templates__.index(name))
+        self.label_template_dropdown.setEditText(self.current_template())
+
+    def restore_template_name(self) -> None:
+        """Show the name of the selected template again after an incomplete search
+        """
+        if self.label_template_dropdown.currentText() != self.current_template():
+            self.label_template_dropdown.setEditText(self.current_template())
+
     def select_project_path(self):
         """Open a dialog for selecting project path
         """
@@ -87,34 +157,130 @@ class HeaderWidget(QWidget):
             project_path = dialog.selectedFiles()[0]
             self.project_path_display.setText(project_path)
 
+    def save_project(self) -> None:
+        """Save all sheets with their source images to a project file
+        """
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Project", "", PROJECT_FILTER)
+        if not file_name:
+            return
+        if not file_name.endswith(PROJECT_EXTENSION):
+            file_name += PROJECT_EXTENSION
+
+        try:
+            save_project(file_name, self.current_template(), self.__editor__.sheets)
+        except (OSError, ValueError) as e:
+            if self.__logger__:
+                self.__logger__.log(f"Saving project failed with error: {e}", logging.ERROR)
+            QMessageBox.critical(self, "Save Failed", "An error occurred while saving the project.")
+            return
+
+        if self.__logger__:
+            self.__logger__.log(f"Project saved to {file_name}")
+
+    def open_project(self) -> None:
+        """Load a project file, labels are restored from the render cache where possible
+        """
+        file_name, _ = QFileDialog.getOpenFileName(self, "Open Project", "", PROJECT_FILTER)
+        if not file_name:
+            return
+
+        try:
+            template_name, sheets = load_project(file_name)
+        except (OSError, ValueError, KeyError) as e:
+            if self.__logger__:
+                self.__logger__.log(f"Opening project failed with error: {e}", logging.ERROR)
+            QMessageBox.critical(self, "Open Failed", "An error occurred while opening the project.")
+            return
+
+        if template_name not in self.__templates__:
+            QMessageBox.critical(self, "Open Failed", f"The project uses the unknown template '{template_name}'.")
+            return
+
+        # Switch the template without the change handler, which would clear the labels again
+        self.label_template_dropdown.blockSignals(True)
+        self.label_template_dropdown.setCurrentIndex(self.__templates__.index(template_name))
+        self.label_template_dropdown.blockSignals(False)
+        self.__editor__.select_template(template_name)
+        self.__previewer__.select_template(template_name)
+
+        self.__editor__.load_sheets(sheets or [{}])
+        self.__previewer__.load_sheets(len(sheets or [{}]))
+
+        if self.__logger__:
+            labels = sum(len(label_data) for label_data in sheets)
+            self.__logger__.log(f"Opened project {file_name} with {labels} label(s) on {len(sheets)} sheet(s)")
+
     def build_project(self) -> None:
-        """Generate PDF
+        """Generate PDF on a background thread, or cancel the running export
         """
+        if self.__export_worker__:
+            self.__export_worker__.cancel()
+            self.build_button.setEnabled(False)
+            if self.__logger__:
+                self.__logger__.log("Cancelling PDF export ...")
+            return
+
         if self.project_path_display.text() in [None, ""]:
             QMessageBox.critical(self, "Build Failed", "Please select a project folder first.")
             return
-        
-        try:
-            pdf = PDFCreator(dpi=300)
-            image = pdf.create_label_page(
-                label_data=self.__editor__.label_data,
-                top_margin=self.__editor__.config['top_margin'],
-                left_margin=self.__editor__.config['left_margin'],
-                sticker_pattern=self.__editor__.config['sticker_pattern'],
-                sticker_width=self.__editor__.config['sticker_width'],
-                sticker_height=self.__editor__.config['sticker_height'],
-                horizontal_margin=self.__editor__.config['horizontal_margin'],
-                vertical_margin=self.__editor__.config['vertical_margin'],
-            )
-            pdf_path = os.path.join(self.project_path_display.text(), "output.pdf")
-            pdf.save_to_pdf(image, pdf_path)
-            success = True
-        except Exception as e:
-            if self.__logger__:
-                self.__logger__.log(f"PDF Generation failed with error: {e}")
-            success = False
-        
-        if success:
+
+        # Export a snapshot so that edits made during the export cannot corrupt the output
+        sheets = snapshot_sheets(self.__editor__.config, self.__editor__.sheets)
+        pdf_path = os.path.join(self.project_path_display.text(), "output.pdf")
+
+        worker = ExportWorker(self.__pdf_creator__, sheets, pdf_path)
+        worker.signals.cell_progress.connect(self.export_progress)
+        worker.signals.page_progress.connect(self.export_page_progress)
+        worker.signals.finished.connect(self.export_finished)
+        if self.__logger__:
+            worker.signals.message.connect(self.__logger__.log)
+        self.__export_worker__ = worker
+
+        self.export_progress_bar.setValue(0)
+        self.export_page_progress(0, len(sheets))
+        self.export_progress_bar.setVisible(True)
+        self.build_button.setText("Cancel Export")
+        if self.__logger__:
+            self.__logger__.log(f"Exporting {len(sheets)} page(s) to {pdf_path} ...")
+
+        QThreadPool.globalInstance().start(worker)
+
+    def export_progress(self, done:int, total:int) -> None:
+        """Update the progress bar of the PDF export
+
+        Args:
+            done (int): Number of placed labels
+            total (int): Total number of labels
+        """
+        self.export_progress_bar.setMaximum(max(total, 1))
+        self.export_progress_bar.setValue(done)
+
+    def export_page_progress(self, done:int, total:int) -> None:
+        """Show the page in progress on the progress bar of the PDF export
+
+        Args:
+            done (int): Number of written pages
+            total (int): Total number of pages
+        """
+        self.export_progress_bar.setFormat(f"Page {min(done + 1, total)}/{total} - %p%")
+
+    def export_finished(self, completed:bool, result:str) -> None:
+        """Reset export controls and report the result
+
+        Args:
+            completed (bool): True if the PDF was written
+            result (str): Output path if completed, else error message or empty if cancelled
+        """
+        self.__export_worker__ = None
+        self.export_progress_bar.setVisible(False)
+        self.build_button.setText("Export PDF")
+        self.build_button.setEnabled(True)
+
+        if completed:
             QMessageBox.information(self, "Build Successful", "PDF successfully created.")
-        else:
-            QMessageBox.critical(self, "Build Failed", "An error occurred while creating the PDF.")
\ No newline at end of file
+        elif result:
+            if self.__logger__:
+                self.__logger__.log(f"PDF Generation failed with error: {result}", logging.ERROR)
+            QMessageBox.critical(self, "Build Failed", "An error occurred while creating the PDF.")
+        elif self.__logger__:
+            self.__logger__.log("PDF export cancelled.")
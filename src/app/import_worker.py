@@ -0,0 +1,54 @@
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from .label_renderer import DEFAULT_DPI
+from .render_cache import render_label_cached
+from .source_image import SourceImage
+from .tracing import operation
+
+
+class ImportSignals(QObject):
+    # Request token, cell key (sheet, row, col), SourceImage, rendered PIL image or None
+    finished = pyqtSignal(int, object, object, object)
+    # Request token, cell key (sheet, row, col), error message
+    failed = pyqtSignal(int, object, str)
+
+
+class ImportWorker(QRunnable):
+    """Opens a source image on a thread pool thread
+
+    Decodes the proxies needed by the editor and optionally renders the label, so the GUI
+    thread never waits for image decoding.
+    """
+    def __init__(self, token:int, cell:tuple, path:str, width_mm:float, height_mm:float, params:dict=None,
+                 dpi:int=DEFAULT_DPI, proxy_size:tuple=None):
+        super(ImportWorker, self).__init__()
+        self.setAutoDelete(False)
+
+        # Public class attributes
+        self.token = token
+        self.cell = cell
+        self.path = path
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.params = params
+        self.dpi = dpi
+        self.proxy_size = proxy_size
+        self.signals = ImportSignals()
+
+    def run(self) -> None:
+        try:
+            with operation("Import image", path=self.path):
+                source = SourceImage.from_file(self.path)
+
+                # Decode the proxy shown in the editor canvas ahead of time
+                if self.proxy_size:
+                    source.proxy_to_fit(*self.proxy_size)
+
+                image = None
+                if self.params is not None:
+                    image = render_label_cached(source, self.width_mm, self.height_mm, dpi=self.dpi, **self.params)
+        except Exception as e:
+            self.signals.failed.emit(self.token, self.cell, str(e))
+            return
+
+        self.signals.finished.emit(self.token, self.cell, source, image)
@@ -0,0 +1,475 @@
+from collections import namedtuple
+
+from PIL import Image, ImageFilter, ImageDraw
+
+from .get_resources import get_image
+from . import compositor
+from .compositor import LabelLayers
+from .label_store import memory_budget, STAGE_CACHE_SHARE
+from .stage_cache import StageCache
+from .text_layout import layout_text, TextLayout
+from .tracing import span
+
+# Supported design options as shown in the editor widget
+CROP_MODES = ["Fit Auto", "Fit Width", "Fit Height", "Stretch"]
+LOGOS = ["None", "ESPuino", "Tonuino"]
+
+# Resolution of the label composition used by the editor
+DEFAULT_DPI = 150
+
+# Version of the rendered output, increase on every change of the output to invalidate
+# labels cached on disk
+RENDERER_VERSION = 1
+
+# Pixel geometry of a label: (width, height) of the label and of the scaled foreground,
+# (x, y) offset of the foreground and the scale of the design relative to DEFAULT_DPI
+LabelGeometry = namedtuple("LabelGeometry", ["target_size", "scaled_size", "offset", "dpi_scale"])
+
+# Maximum height of the text block relative to the label height
+MAX_TEXT_HEIGHT = 0.3
+
+# Relative share of the memoized pipeline stages in STAGE_CACHE_SHARE of the memory budget,
+# about 128 MB for the rgba stage with the default budget
+STAGE_WEIGHTS = {
+    "rgba": 128,
+    "stretched": 32,
+    "blurred": 64,
+    "foreground": 64,
+    "logo": 4,
+    "base": 64,
+}
+
+
+def stage_limits(budget:int) -> dict:
+    """Memory budget of each stage cache in bytes
+
+    Args:
+        budget (int): Memory budget of all images in bytes
+
+    Returns:
+        dict: Budget by stage name
+    """
+    total = sum(STAGE_WEIGHTS.values())
+    return {stage: int(budget * STAGE_CACHE_SHARE * weight / total) for stage, weight in STAGE_WEIGHTS.items()}
+
+
+# Memoized pipeline stages
+STAGE_CACHES = {stage: StageCache(stage, limit) for stage, limit in stage_limits(memory_budget()).items()}
+
+# Default design parameters of a label
+DEFAULT_PARAMS = {
+    "crop": "Fit Auto",
+    "blur": 20,
+    "logo": "None",
+    "text": "",
+}
+
+
+def mm_to_px(length_mm:float, dpi:int) -> int:
+    """Convert a length in mm to pixels for the given resolution
+
+    Args:
+        length_mm (float): Length in mm
+        dpi (int): Resolution in dots per inch
+
+    Returns:
+        int: Length in pixels
+    """
+    return int(dpi * (length_mm / 25.4))
+
+
+def get_logo(logo:str) -> Image.Image:
+    """Get logo image by its name
+
+    Args:
+        logo (str): One of LOGOS
+
+    Returns:
+        Image.Image: Logo image or None if no logo is selected
+    """
+    if logo == "ESPuino":
+        return get_image("espuino_logo.png")
+    elif logo == "Tonuino":
+        return get_image("tonuino_logo.png")
+    return None
+
+
+def is_plain_copy(image_size:tuple, width_mm:float, height_mm:float, crop:str="Fit Auto", logo:str="None",
+                  text:str="", dpi:int=DEFAULT_DPI, **kwargs) -> bool:
+    """Check whether a label shows nothing but the source image scaled to the label size
+
+    Such labels need no composition, e.g. the PDF export can embed the source file directly.
+
+    Args:
+        image_size (tuple): (width, height) of the source image
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        crop (str, optional): One of CROP_MODES. Defaults to "Fit Auto".
+        logo (str, optional): One of LOGOS. Defaults to "None".
+        text (str, optional): Label text. Defaults to "".
+        dpi (int, optional): Resolution of the composed label. Defaults to DEFAULT_DPI.
+
+    Returns:
+        bool: True if the label is the stretched source image without overlay
+    """
+    if text or get_logo(logo) is not None:
+        return False
+    if crop == "Stretch":
+        return True
+
+    # The foreground covers the whole label if the aspect ratios match at label resolution
+    image_width, image_height = image_size
+    target_width_px = mm_to_px(width_mm, dpi)
+    target_height_px = mm_to_px(height_mm, dpi)
+    return (int(image_width * target_height_px / image_height) == target_width_px
+            and int(image_height * target_width_px / image_width) == target_height_px)
+
+
+# Names of the pipeline stages in traces
+STAGE_SPANS = {
+    "rgba": "convert to RGBA",
+    "foreground": "resize foreground",
+    "stretched": "resize background",
+    "blurred": "blur",
+    "logo": "resize logo",
+}
+
+
+def cached_stage(stage:str, key:tuple, factory):
+    """Get the result of a pipeline stage from its cache or compute it
+
+    Args:
+        stage (str): Name of the stage in STAGE_CACHES
+        key (tuple): Inputs of the stage, the first item identifies the source image and
+            disables caching if None
+        factory (callable): Computes the stage result
+
+    Returns:
+        Stage result, must not be modified by the caller
+    """
+    def compute():
+        with span(STAGE_SPANS[stage]):
+            return factory()
+
+    if key[0] is None:
+        return compute()
+    return STAGE_CACHES[stage].get(key, compute)
+
+
+def cache_stats() -> dict:
+    """Get hit and miss statistics of all pipeline stage caches
+
+    Returns:
+        dict: Statistics as returned by StageCache.stats by stage name
+    """
+    return {name: cache.stats() for name, cache in STAGE_CACHES.items()}
+
+
+def clear_caches() -> None:
+    for cache in STAGE_CACHES.values():
+        cache.clear()
+
+
+def set_stage_budget(budget:int) -> None:
+    """Resize the stage caches to their share of a new memory budget
+
+    Args:
+        budget (int): Memory budget of all images in bytes
+    """
+    for stage, limit in stage_limits(budget).items():
+        STAGE_CACHES[stage].resize(limit)
+
+
+def stage_cache_bytes() -> int:
+    """Memory in bytes used by all stage caches
+    """
+    return sum(cache.stats()["bytes"] for cache in STAGE_CACHES.values())
+
+
+def label_geometry(image_size:tuple, width_mm:float, height_mm:float, crop:str, dpi:int) -> LabelGeometry:
+    """Compute the pixel geometry of a label
+
+    Args:
+        image_size (tuple): (width, height) of the source image
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        crop (str): One of CROP_MODES
+        dpi (int): Resolution of the composed label
+
+    Returns:
+        LabelGeometry: Label size, size and offset of the foreground and the design scale
+    """
+    if crop not in CROP_MODES:
+        raise ValueError(f"Unknown crop mode '{crop}'")
+
+    # Convert dimensions from mm to the required pixels for the given DPI
+    target_width_px = mm_to_px(width_mm, dpi)
+    target_height_px = mm_to_px(height_mm, dpi)
+    image_width, image_height = image_size
+
+    # stretch is default
+    scaled_width = target_width_px
+    scaled_height = target_height_px
+
+    if crop == "Fit Auto":
+        if image_height / image_width > target_height_px / target_width_px:
+            crop = "Fit Height"
+        else:
+            crop = "Fit Width"
+
+    if crop == "Fit Height":
+        # Scale original image to the given height with the given DPI
+        scale_factor = target_height_px / image_height
+        scaled_width = int(image_width * scale_factor)
+    elif crop == "Fit Width":
+        scale_factor = target_width_px / image_width
+        scaled_height = int(image_height * scale_factor)
+
+    # Center the original scaled image over the blurred background
+    x_offset = (target_width_px - scaled_width) // 2
+    y_offset = (target_height_px - scaled_height) // 2
+
+    return LabelGeometry(
+        (target_width_px, target_height_px),
+        (scaled_width, scaled_height),
+        (x_offset, y_offset),
+        # Pixel sizes of the design are defined at DEFAULT_DPI
+        dpi / DEFAULT_DPI,
+    )
+
+
+def stage_rgba(image:Image.Image, cache_key) -> Image.Image:
+    """Ensure the image has an alpha channel if required
+    """
+    return cached_stage("rgba", (cache_key,),
+                        lambda: image if image.mode == "RGBA" else image.convert("RGBA"))
+
+
+def stage_foreground(image:Image.Image, cache_key, scaled_size:tuple) -> Image.Image:
+    """Scale the source image to the foreground size
+    """
+    return cached_stage("foreground", (cache_key, scaled_size),
+                        lambda: stage_rgba(image, cache_key).resize(scaled_size, Image.Resampling.LANCZOS))
+
+
+def stage_stretched(image:Image.Image, cache_key, target_size:tuple) -> Image.Image:
+    """Stretch the source image to the label size
+    """
+    return cached_stage("stretched", (cache_key, target_size),
+                        lambda: stage_rgba(image, cache_key).resize(target_size, Image.Resampling.LANCZOS))
+
+
+def stage_blurred(image:Image.Image, cache_key, target_size:tuple, blur_radius:float) -> Image.Image:
+    """Create a blurred version of the original image by stretching to target size and gaussian blur
+    """
+    return cached_stage(
+        "blurred",
+        (cache_key, target_size, blur_radius),
+        lambda: stage_stretched(image, cache_key, target_size).filter(ImageFilter.GaussianBlur(blur_radius))
+    )
+
+
+def stage_logo(logo:str, logo_target_width:int) -> Image.Image:
+    """Scale a logo to the given width keeping its aspect ratio
+    """
+    def resize_logo():
+        logo_image = get_logo(logo)
+        logo_scale_factor = logo_target_width / logo_image.width
+        logo_target_height = int(logo_image.height * logo_scale_factor)
+        return logo_image.resize((logo_target_width, logo_target_height), Image.Resampling.LANCZOS)
+
+    return cached_stage("logo", (logo, logo_target_width), resize_logo)
+
+
+def label_layers(image:Image.Image, geometry:LabelGeometry, blur:int, logo:str, cache_key=None) -> LabelLayers:
+    """Get the image layers of a label from the stage caches
+
+    Args:
+        image (Image.Image): Un-scaled source image
+        geometry (LabelGeometry): Geometry as returned by label_geometry
+        blur (int): Gaussian blur radius in pixels at DEFAULT_DPI
+        logo (str): One of LOGOS
+        cache_key (hashable, optional): Identity of the source image content. Defaults to None.
+
+    Returns:
+        LabelLayers: Layers to be composed by the compositor
+    """
+    if logo not in LOGOS:
+        raise ValueError(f"Unknown logo '{logo}'")
+
+    target_width_px, target_height_px = geometry.target_size
+    background = stage_blurred(image, cache_key, geometry.target_size, blur * geometry.dpi_scale)
+    foreground = stage_foreground(image, cache_key, geometry.scaled_size)
+
+    logo_resized = None
+    logo_position = None
+    if get_logo(logo):
+        logo_resized = stage_logo(logo, int(target_width_px * 0.1))
+
+        # Paste the logo at the bottom-right corner
+        logo_position = (
+            target_width_px - logo_resized.width - int(10 * geometry.dpi_scale),
+            target_height_px - logo_resized.height,
+        )
+
+    return LabelLayers(background, foreground, geometry.offset, logo_resized, logo_position)
+
+
+def fit_text(text:str, geometry:LabelGeometry) -> tuple:
+    """Lay out the label text in the top band of the label
+
+    Args:
+        text (str): Label text
+        geometry (LabelGeometry): Geometry as returned by label_geometry
+
+    Returns:
+        tuple: (TextLayout, (left, top, right, bottom) box covered by the text block)
+    """
+    target_width_px, target_height_px = geometry.target_size
+
+    # Largest font size up to 30 px at DEFAULT_DPI fitting the top band, wrapped if required
+    text_y = int(10 * geometry.dpi_scale)  # Position from top
+    layout = layout_text(
+        text,
+        max_width=target_width_px * 0.9,  # Ensure text doesn't span too wide
+        max_height=target_height_px * MAX_TEXT_HEIGHT,
+        max_size=int(30 * geometry.dpi_scale),
+        min_size=int(8 * geometry.dpi_scale),
+    )
+    return layout, (0, text_y, target_width_px, text_y + layout.height)
+
+
+def draw_text(image:Image.Image, layout:TextLayout, box:tuple, avg_brightness:float) -> None:
+    """Draw the text lines centered into the box
+
+    Args:
+        image (Image.Image): Label, modified in place
+        layout (TextLayout): Layout as returned by fit_text
+        box (tuple): Box as returned by fit_text
+        avg_brightness (float): Brightness of the background behind the text
+    """
+    # Choose white text if the background is dark, otherwise black
+    text_color = (255, 255, 255, 255) if avg_brightness < 128 else (0, 0, 0, 255)
+
+    draw = ImageDraw.Draw(image)
+    for index, (line, line_width) in enumerate(zip(layout.lines, layout.line_widths)):
+        text_x = (image.width - line_width) // 2
+        draw.text((text_x, box[1] + index * layout.line_height), line, font=layout.font, fill=text_color)
+
+
+def render_label(image:Image.Image, width_mm:float, height_mm:float, crop:str="Fit Auto", blur:int=20,
+                 logo:str="None", text:str="", dpi:int=DEFAULT_DPI, cache_key=None, backend:str=None) -> Image.Image:
+    """Compose a printable label from a source image and the design parameters
+
+    The composition is split into stages (alpha conversion, background stretch, blur,
+    foreground scaling, logo scaling, base composition and text). With a cache_key every stage
+    result is memoized by its inputs, e.g. changing the text does not redo the blur and
+    changing the blur does not redo the foreground scaling.
+
+    Args:
+        image (Image.Image): Un-scaled source image
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        crop (str, optional): One of CROP_MODES. Defaults to "Fit Auto".
+        blur (int, optional): Gaussian blur radius of the background in pixels at DEFAULT_DPI.
+            Defaults to 20.
+        logo (str, optional): One of LOGOS. Defaults to "None".
+        text (str, optional): Text printed on top of the label. Defaults to "".
+        dpi (int, optional): Resolution of the composed label. Blur, text size and margins
+            scale with it, so the label looks the same at every resolution. Defaults to DEFAULT_DPI.
+        cache_key (hashable, optional): Identity of the source image content. Stage results
+            are only cached if given. Defaults to None.
+        backend (str, optional): Compositing backend, see compositor. Defaults to the
+            selected backend.
+
+    Returns:
+        Image.Image: RGBA label image
+    """
+    return render_labels(
+        [(image, dict(crop=crop, blur=blur, logo=logo, text=text), cache_key)],
+        width_mm, height_mm, dpi=dpi, backend=backend,
+    )[0]
+
+
+def render_labels(jobs:list, width_mm:float, height_mm:float, dpi:int=DEFAULT_DPI, backend:str=None) -> list:
+    """Compose many labels of the same size, e.g. all cells of a sheet, as one batch
+
+    The scaled layers come from the stage caches, composition and brightness analysis run
+    as one stacked batch with the NumPy backend.
+
+    Args:
+        jobs (list): List of (image, params, cache_key) tuples. params holds the design
+            parameters as accepted by render_label, cache_key may be None
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        dpi (int, optional): Resolution of the composed labels. Defaults to DEFAULT_DPI.
+        backend (str, optional): Compositing backend, see compositor. Defaults to the
+            selected backend.
+
+    Returns:
+        list: RGBA label images in the order of jobs
+    """
+    backend = backend or compositor.get_backend()
+    params = [dict(DEFAULT_PARAMS, **job_params) for _, job_params, _ in jobs]
+    geometries = [label_geometry(image.size, width_mm, height_mm, p["crop"], dpi)
+                  for (image, _, _), p in zip(jobs, params)]
+
+    # Base composition without text, composed in one batch for all cache misses
+    base_keys = []
+    bases = []
+    for (image, _, cache_key), p, geometry in zip(jobs, params, geometries):
+        key = (cache_key, geometry.target_size, geometry.scaled_size, p["blur"] * geometry.dpi_scale,
+               p["logo"], backend)
+        base_keys.append(key)
+        bases.append(STAGE_CACHES["base"].peek(key) if cache_key is not None else None)
+
+    missing = [i for i, base in enumerate(bases) if base is None]
+    layers = [label_layers(jobs[i][0], geometries[i], params[i]["blur"], params[i]["logo"], jobs[i][2])
+              for i in missing]
+    with span("compose", count=len(layers), backend=backend):
+        composed = compositor.compose_batch(layers, backend)
+    for i, base in zip(missing, composed):
+        bases[i] = base
+        if jobs[i][2] is not None:
+            STAGE_CACHES["base"].put(base_keys[i], base)
+
+    labels = [base.copy() for base in bases]
+
+    # Add text to the top if text is not empty or None
+    texts = [i for i, p in enumerate(params) if p["text"]]
+    if texts:
+        with span("fit text"):
+            layouts = [fit_text(params[i]["text"], geometries[i]) for i in texts]
+        backgrounds = [
+            stage_blurred(jobs[i][0], jobs[i][2], geometries[i].target_size,
+                          params[i]["blur"] * geometries[i].dpi_scale)
+            for i in texts
+        ]
+
+        # Determine text color based on the brightness of the top section of the blurred image
+        with span("text color"):
+            stats = compositor.region_stats_batch(backgrounds, [box for _, box in layouts], backend)
+        with span("draw text"):
+            for i, (layout, box), (avg_brightness, _) in zip(texts, layouts, stats):
+                draw_text(labels[i], layout, box, avg_brightness)
+
+    return labels
+
+
+def render_label_from_source(source, width_mm:float, height_mm:float, dpi:int=DEFAULT_DPI, **params) -> Image.Image:
+    """Compose a label from the smallest proxy of a source image sufficient for the resolution
+
+    Args:
+        source (SourceImage): Source image of the label
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        dpi (int, optional): Resolution of the composed label. Defaults to DEFAULT_DPI.
+        **params: Design parameters as accepted by render_label
+
+    Returns:
+        Image.Image: RGBA label image
+    """
+    image = source.proxy_to_cover(mm_to_px(width_mm, dpi), mm_to_px(height_mm, dpi))
+
+    # Proxies of a source differ in size, so (source, size) identifies the image content
+    return render_label(image, width_mm, height_mm, dpi=dpi, cache_key=(source.uid, image.size), **params)
@@ -0,0 +1,271 @@
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from PIL import Image
+
+from .stage_cache import estimate_size
+from .tracing import span
+
+# Environment variable with the memory budget of the label store in MB
+MEMORY_BUDGET_ENV = "TONUINO_MEMORY_BUDGET"
+
+# Memory budget of the resident images in bytes, least recently used images are spilled beyond
+DEFAULT_MEMORY_BUDGET = 1024 ** 3
+
+# Share of the memory budget used by the stage caches of the label renderer, the label store
+# keeps its resident images within the rest
+STAGE_CACHE_SHARE = 0.35
+
+# Environment variable overriding the parent directory of the spill files
+SPILL_DIR_ENV = "TONUINO_SPILL_DIR"
+
+# Unique numbers of spill files
+_SPILL_IDS = itertools.count(1)
+
+
+def memory_budget() -> int:
+    """Memory budget in bytes from MEMORY_BUDGET_ENV in MB or DEFAULT_MEMORY_BUDGET
+    """
+    if os.environ.get(MEMORY_BUDGET_ENV):
+        return int(os.environ[MEMORY_BUDGET_ENV]) * 1024 ** 2
+    return DEFAULT_MEMORY_BUDGET
+
+
+def load_image(image) -> Image.Image:
+    """Pixels of an image which may be held by a label store
+
+    Args:
+        image: StoredImage or Image.Image
+
+    Returns:
+        Image.Image: Resident image, reloaded if it has been spilled
+    """
+    if isinstance(image, StoredImage):
+        return image.image()
+    return image
+
+
+class StoredImage:
+    """Image held by a LabelStore, resident in memory or spilled to disk
+
+    A spilled image is read back from its raw spill file on the next call of image(), or
+    recreated by its loader if it has one, e.g. a proxy decoded from its source file. The
+    identity of a stored image never changes, so it can key caches across spills. Stored
+    images must not be modified in place.
+    """
+    def __init__(self, store, image:Image.Image, loader=None):
+        # Public class attributes
+        self.mode = image.mode
+        self.size = image.size
+        self.nbytes = estimate_size(image)
+
+        # Private class attributes, the spill path is shared with the finalizer removing the file
+        self.__store__ = store
+        self.__image__ = image
+        self.__loader__ = loader
+        self.__spill__ = [None]
+        self.__lock__ = threading.Lock()
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def resident(self) -> bool:
+        return self.__image__ is not None
+
+    def image(self) -> Image.Image:
+        """Get the image, reloaded if it has been spilled
+
+        Returns:
+            Image.Image: Image
+        """
+        with self.__lock__:
+            image = self.__image__
+            if image is None:
+                with span("reload image", spilled=self.__loader__ is None):
+                    if self.__loader__ is not None:
+                        image = self.__loader__()
+                    else:
+                        with open(self.__spill__[0], "rb") as file:
+                            image = Image.frombytes(self.mode, self.size, file.read())
+                self.__image__ = image
+
+        self.__store__.touch(self)
+        return image
+
+    def spill(self) -> None:
+        """Release the resident image, writing it to a spill file first unless it can be
+        recreated by the loader. A spill file is written once and kept until the image is
+        released.
+        """
+        with self.__lock__:
+            if self.__image__ is None:
+                return
+            if self.__loader__ is None and self.__spill__[0] is None:
+                path = self.__store__.spill_path()
+                with span("spill image"):
+                    with open(path, "wb") as file:
+                        file.write(self.__image__.tobytes())
+                self.__spill__[0] = path
+            self.__image__ = None
+
+
+class LabelStore:
+    """Thread-safe store of label and source images bounded by a memory budget
+
+    Images beyond the budget are spilled in least recently used order, rendered labels to raw
+    files in a temporary spill directory and proxies of source files by dropping them, as the
+    source file can be decoded again. Consumers get the pixels from StoredImage.image() and
+    need not know whether an image is resident. A share of the budget can be reserved for
+    other caches, e.g. the stage caches of the label renderer.
+    """
+    def __init__(self, budget:int=DEFAULT_MEMORY_BUDGET, directory:str=None, reserved:float=0.0):
+        # Public class attributes
+        self.budget = budget
+        self.reserved = reserved
+
+        # Private class attributes
+        self.__lock__ = threading.Lock()
+        self.__parent__ = directory
+        self.__directory__ = None
+        self.__items__ = {}
+        self.__resident__ = OrderedDict()
+        self.__resident_bytes__ = 0
+
+    def put(self, image:Image.Image, loader=None) -> StoredImage:
+        """Add an image to the store
+
+        Args:
+            image (Image.Image): Image, must not be modified afterwards
+            loader (callable, optional): Function recreating the image, if given the image is
+                dropped instead of written to a spill file. Defaults to None.
+
+        Returns:
+            StoredImage: Handle of the image
+        """
+        stored = StoredImage(self, image, loader)
+        key = id(stored)
+        with self.__lock__:
+            self.__items__[key] = stored.nbytes
+        weakref.finalize(stored, self.forget, key, stored.__spill__)
+        self.touch(stored)
+        return stored
+
+    def touch(self, stored:StoredImage) -> None:
+        """Mark a resident image as used most recently and spill others beyond the budget
+
+        Args:
+            stored (StoredImage): Resident image
+        """
+        key = id(stored)
+        with self.__lock__:
+            if key in self.__resident__:
+                self.__resident__.move_to_end(key)
+                return
+            self.__resident__[key] = weakref.ref(stored)
+            self.__resident_bytes__ += stored.nbytes
+            victims = self.evict()
+        self.spill(victims)
+
+    def evict(self) -> list:
+        """Remove the least recently used images beyond the budget from the resident images,
+        called with the lock held. The most recently used image stays even if beyond the budget.
+
+        Returns:
+            list: Removed images to be spilled after releasing the lock
+        """
+        victims = []
+        budget = self.budget * (1 - self.reserved)
+        while self.__resident_bytes__ > budget and len(self.__resident__) > 1:
+            key, ref = self.__resident__.popitem(last=False)
+            self.__resident_bytes__ -= self.__items__.get(key, 0)
+            stored = ref()
+            if stored is not None:
+                victims.append(stored)
+        return victims
+
+    @staticmethod
+    def spill(victims:list) -> None:
+        # Spilling takes the lock of each image, which may be reloading and touch the store
+        for stored in victims:
+            stored.spill()
+
+    def forget(self, key:int, spill:list) -> None:
+        """Remove a released image, called by its finalizer
+
+        Args:
+            key (int): Id of the released StoredImage
+            spill (list): Spill path of the image or None in a list
+        """
+        with self.__lock__:
+            nbytes = self.__items__.pop(key, 0)
+            if self.__resident__.pop(key, None) is not None:
+                self.__resident_bytes__ -= nbytes
+        if spill[0] is not None:
+            try:
+                os.remove(spill[0])
+            except OSError:
+                pass
+
+    def set_budget(self, budget:int) -> None:
+        """Change the memory budget, spilling images right away if it is lowered
+
+        Args:
+            budget (int): Budget in bytes
+        """
+        with self.__lock__:
+            self.budget = budget
+            victims = self.evict()
+        self.spill(victims)
+
+    def spill_path(self) -> str:
+        """Path of a new spill file, the spill directory is created on first use and removed
+        on exit
+        """
+        with self.__lock__:
+            if self.__directory__ is None:
+                self.__directory__ = tempfile.mkdtemp(prefix="tonuino-spill-", dir=self.__parent__)
+                atexit.register(shutil.rmtree, self.__directory__, ignore_errors=True)
+            return os.path.join(self.__directory__, f"{next(_SPILL_IDS)}.raw")
+
+    def stats(self) -> dict:
+        """Current residency of the stored images
+
+        Returns:
+            dict: Counts and sizes in bytes of the resident and spilled images and the budget
+        """
+        with self.__lock__:
+            total_bytes = sum(self.__items__.values())
+            return {
+                "resident": len(self.__resident__),
+                "resident_bytes": self.__resident_bytes__,
+                "spilled": len(self.__items__) - len(self.__resident__),
+                "spilled_bytes": total_bytes - self.__resident_bytes__,
+                "budget": self.budget,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_label_store() -> LabelStore:
+    """Shared label store with the memory_budget, of which STAGE_CACHE_SHARE is reserved for
+    the stage caches
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LabelStore(memory_budget(), os.environ.get(SPILL_DIR_ENV), reserved=STAGE_CACHE_SHARE)
+        return _store
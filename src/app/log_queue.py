@@ -0,0 +1,97 @@
+import logging
+import logging.handlers
+import os
+import threading
+from collections import deque
+
+# Name of the application logger
+LOGGER_NAME = "tonuino"
+
+# Environment variable with the path of the log file, the full history is only written to a
+# file if set or enabled in the log window
+LOG_FILE_ENV = "TONUINO_LOG_FILE"
+
+# Size of a log file and number of rotated files kept
+MAX_LOG_FILE_BYTES = 1024 ** 2
+LOG_FILE_BACKUPS = 3
+
+# Format of the log file lines
+LOG_FILE_FORMAT = "%(asctime)s %(levelname)s %(threadName)s - %(message)s"
+
+
+class LogQueue(logging.Handler):
+    """Logging handler collecting records from any thread until they are drained
+
+    The queue is bounded, if nobody drains it the oldest records are dropped and counted.
+    """
+    def __init__(self, max_records:int, level:int=logging.NOTSET):
+        super(LogQueue, self).__init__(level)
+
+        # Private class attributes
+        self.__records__ = deque()
+        self.__max_records__ = max_records
+        self.__dropped__ = 0
+        self.__queue_lock__ = threading.Lock()
+
+    def emit(self, record:logging.LogRecord) -> None:
+        with self.__queue_lock__:
+            self.__records__.append(record)
+            if len(self.__records__) > self.__max_records__:
+                self.__records__.popleft()
+                self.__dropped__ += 1
+
+    def drain(self) -> tuple:
+        """Take all queued records
+
+        Returns:
+            tuple: (list of LogRecord, number of records dropped since the last drain)
+        """
+        with self.__queue_lock__:
+            records = list(self.__records__)
+            self.__records__.clear()
+            dropped = self.__dropped__
+            self.__dropped__ = 0
+        return records, dropped
+
+
+def get_logger() -> logging.Logger:
+    """Application logger, messages reach the log window and the log file if enabled
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.DEBUG)
+        # Messages are shown in the log window, not on the console
+        logger.propagate = False
+    return logger
+
+
+def set_log_file(path:str) -> None:
+    """Write the full log history to a rotating log file
+
+    Args:
+        path (str): Log file path or None to stop writing a log file
+    """
+    logger = get_logger()
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            logger.removeHandler(handler)
+            handler.close()
+
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=MAX_LOG_FILE_BYTES,
+                                                       backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        handler.setFormatter(logging.Formatter(LOG_FILE_FORMAT))
+        logger.addHandler(handler)
+
+
+def log_file() -> str:
+    """Path of the current log file
+
+    Returns:
+        str: Path or None if no log file is written
+    """
+    for handler in get_logger().handlers:
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            return handler.baseFilename
+    return None
@@ -3,6 +3,7 @@ from app import HeaderWidget
 from app import PreviewWidget
 from app import EditOptionsWidget
 from app import FooterWidget
+from app import MemoryWidget
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -35,6 +36,10 @@ class MainWindow(QMainWindow):
         
         # Header
         self.header = HeaderWidget()
+
+        # Residency of the label images in the status bar
+        self.memory = MemoryWidget()
+        self.statusBar().addPermanentWidget(self.memory)
         
         # Register components
         self.header.registerEditor(self.edit_options)
@@ -44,6 +49,7 @@ class MainWindow(QMainWindow):
         self.edit_options.registerLogger(self.footer)
         self.edit_options.registerPreviewer(self.preview)
         self.preview.registerEditor(self.edit_options)
+        self.memory.registerLogger(self.footer)
 
         # Add components to layout
         self.layout.addWidget(self.header)
@@ -0,0 +1,89 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QLabel, QInputDialog, QMessageBox
+
+from .label_renderer import set_stage_budget, stage_cache_bytes
+from .label_store import get_label_store
+from .proxy_cache import get_proxy_cache
+from .render_cache import get_render_cache
+
+# Interval in ms in which the residency of the label store is updated
+MEMORY_UPDATE_MS = 1000
+
+# Range of the memory budget in MB which can be set in the UI
+MIN_BUDGET_MB = 64
+MAX_BUDGET_MB = 64 * 1024
+
+class MemoryWidget(QLabel):
+    """Shows how much of the label store is resident in memory and how much is spilled to disk
+    """
+    def __init__(self):
+        super(MemoryWidget, self).__init__()
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+
+        budget_action = QAction("Set Memory Budget ...", self)
+        budget_action.triggered.connect(self.select_budget)
+        self.addAction(budget_action)
+
+        purge_action = QAction("Clear Image Cache ...", self)
+        purge_action.triggered.connect(self.purge_caches)
+        self.addAction(purge_action)
+
+        # Private class attributes
+        self.__logger__ = None
+        self.__update_timer__ = QTimer(self)
+        self.__update_timer__.setInterval(MEMORY_UPDATE_MS)
+        self.__update_timer__.timeout.connect(self.update_residency)
+        self.__update_timer__.start()
+
+        self.update_residency()
+
+    def registerLogger(self, logger) -> None:
+        """Registers the logger widget to provide log output
+
+        Args:
+            logger (FooterWidget): Logger widget
+        """
+        self.__logger__ = logger
+
+    def update_residency(self) -> None:
+        stats = get_label_store().stats()
+        stage_bytes = stage_cache_bytes()
+        mb = 1024 ** 2
+        self.setText(f"Memory: {(stats['resident_bytes'] + stage_bytes) / mb:.0f} of {stats['budget'] / mb:.0f} MB, "
+                     f"{stats['spilled']} image(s) on disk")
+        self.setToolTip(f"{stats['resident']} image(s) in memory ({stats['resident_bytes'] / mb:.1f} MB)\n"
+                        f"Intermediate render results in memory ({stage_bytes / mb:.1f} MB)\n"
+                        f"{stats['spilled']} image(s) spilled to disk ({stats['spilled_bytes'] / mb:.1f} MB)\n"
+                        "Right-click to change the memory budget or clear the image cache")
+
+    def select_budget(self) -> None:
+        """Ask for a new memory budget of the label store
+        """
+        store = get_label_store()
+        budget, ok = QInputDialog.getInt(self, "Memory Budget", "Images kept in memory (MB):",
+                                         store.budget // 1024 ** 2, MIN_BUDGET_MB, MAX_BUDGET_MB)
+        if not ok:
+            return
+
+        store.set_budget(budget * 1024 ** 2)
+        set_stage_budget(budget * 1024 ** 2)
+        self.update_residency()
+        if self.__logger__:
+            self.__logger__.log(f"Memory budget set to {budget} MB")
+
+    def purge_caches(self) -> None:
+        """Remove all decoded source images and rendered labels from the disk caches
+        """
+        caches = [get_proxy_cache(), get_render_cache()]
+        size = sum(entry_size for cache in caches for _, entry_size, _ in cache.entries())
+        answer = QMessageBox.question(self, "Clear Image Cache",
+                                      f"Remove {size / 1024 ** 2:.1f} MB of cached images from disk? "
+                                      "Images are decoded and labels rendered again when needed.")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+
+        for cache in caches:
+            cache.clear()
+        if self.__logger__:
+            self.__logger__.log(f"Cleared {size / 1024 ** 2:.1f} MB of cached images")
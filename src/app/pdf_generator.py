@@ -1,61 +1,186 @@
+import hashlib
+import json
+import os
+
 from PIL import Image
 
+from .label_renderer import is_plain_copy
+from .label_store import get_label_store, load_image
+from .pdf_writer import PDFWriter, POINTS_PER_INCH
+from .render_cache import render_label_cached
+from .sheet_geometry import PAGE_WIDTH_MM, PAGE_HEIGHT_MM
+from .template_catalog import cell_rects, sheet_geometry
+from .tracing import span
+
+# Export modes
+RASTER = "raster"  # Each page is one image at the export resolution
+NATIVE = "native"  # Each label is embedded as image object at its own resolution
+
+# Pixels of a raster page strip, bounds the memory of the page assembly at any resolution
+STRIP_PIXELS = 4 * 1024 ** 2
+
+# Height of a JPEG block row, strip heights are a multiple of it
+JPEG_BLOCK = 16
+
+# Environment variable enabling the verification of incremental exports against a full rebuild
+VERIFY_ENV = "TONUINO_VERIFY_EXPORT"
+
 class PDFCreator:
-    def __init__(self, dpi=150):
+    """Creates printable PDFs of label sheets
+
+    Labels with a source image are rendered once at the export resolution instead of
+    resampling the label shown in the editor. Rendered and encoded labels as well as encoded
+    raster pages are kept between exports and reused as long as the label images and the
+    template are unchanged, so a re-export only processes the labels changed since the
+    previous export. Exports done once, e.g. by the batch export, disable the reuse, so each
+    label is released as soon as its page is written.
+    """
+    def __init__(self, dpi=150, mode=RASTER, verify=None, reuse=True):
         # Public class attributes
         self.dpi = dpi
-        
+        self.mode = mode
+        self.verify = bool(os.environ.get(VERIFY_ENV)) if verify is None else verify
+        self.reuse = reuse
+        self.stats = {}
+
+        # Private class attributes, label caches are keyed by id() of the label image and
+        # hold the image itself so that the id cannot be reused while cached
+        self.__prints__ = {}
+        self.__encoded__ = {}
+        self.__pages__ = {}
+
         # Constants for A4 page size at 150 DPI
         self.a4_width_px = int(210 / 25.4 * dpi)  # Convert mm to inches and multiply by 150 dpi
         self.a4_height_px = int(297 / 25.4 * dpi)
 
-    def create_label_page(self, label_data:dict, top_margin:float, left_margin:float, sticker_pattern:tuple,
-                          sticker_width:float, sticker_height:float, horizontal_margin:float, vertical_margin:float) -> Image:
-        """Create a PIL Image of the final sticker template suitable for PDF print
+    def strip_height(self) -> int:
+        """Height in pixels of the strips a raster page is assembled and encoded in
+
+        Returns:
+            int: Multiple of the JPEG block height, the whole page at low resolutions
+        """
+        rows = STRIP_PIXELS // self.a4_width_px // JPEG_BLOCK * JPEG_BLOCK
+        return max(JPEG_BLOCK, min(rows, self.a4_height_px))
+
+    def create_label_page(self, template:dict, label_data:dict, top:int=0, bottom:int=None,
+                          cell_callback=None) -> Image:
+        """Create a PIL Image of the final sticker template suitable for PDF print, or of a
+        horizontal strip of it
+
+        Each label is resized to its sticker size for the rows of the strip only, with the
+        same sampling as a resize of the whole label, so strips line up seamlessly.
 
         Args:
+            template (dict): Template configuration as found in templates.json
             label_data (dict): Dict with label data as stored in Editor widget class
-            top_margin (float): Top margin of upper left sticker in mm
-            left_margin (float): Left margin of upper left sticker in mm
-            sticker_pattern (tuple): 2-Tuple with(rows, colums) representing sticker pattern
-            sticker_width (float): Sticker width in mm
-            sticker_height (float): Sticker height in mm
-            horizontal_margin (float): Horizontal margin between stickers in mm
-            vertical_margin (float): Vertical margin between stickers in mm
+            top (int, optional): First pixel row of the strip. Defaults to 0.
+            bottom (int, optional): Pixel row below the strip. Defaults to the page height.
+            cell_callback (callable, optional): Called with (row, col) after the last part of a
+                label has been placed. Defaults to None.
 
         Returns:
-            Image: PIL Image suitable for print out
+            Image: RGB image of the page rows from top to bottom
         """
-        # Create a blank A4 page
-        page = Image.new('RGBA', (self.a4_width_px, self.a4_height_px), (255, 255, 255, 255))
-
-        # Convert dimensions to pixels
-        top_margin_px = int(top_margin / 25.4 * self.dpi)
-        left_margin_px = int(left_margin / 25.4 * self.dpi)
-        sticker_width_px = int(sticker_width / 25.4 * self.dpi)
-        sticker_height_px = int(sticker_height / 25.4 * self.dpi)
-        horizontal_margin_px = int(horizontal_margin / 25.4 * self.dpi)
-        vertical_margin_px = int(vertical_margin / 25.4 * self.dpi)
-
-        # Arrange the labels on the page
-        for row in range(sticker_pattern[0]):
-            for col in range(sticker_pattern[1]):
-                # Calculate position for each label
-                x_position = left_margin_px + col * (sticker_width_px + horizontal_margin_px)
-                y_position = top_margin_px + row * (sticker_height_px + vertical_margin_px)
-
-                # Check if label data exists for this position
-                if (row, col) in label_data and 'final_print' in label_data[(row, col)]:
-                    label_image = label_data[(row, col)]['final_print']
-
-                    # Resize the label to fit the sticker dimensions
-                    label_image_resized = label_image.resize((sticker_width_px, sticker_height_px), Image.Resampling.LANCZOS)
-
-                    # Paste the label onto the page
-                    page.paste(label_image_resized, (x_position, y_position), mask=label_image_resized)
+        if bottom is None:
+            bottom = self.a4_height_px
+
+        # Create a blank strip of an A4 page
+        page = Image.new('RGB', (self.a4_width_px, bottom - top), (255, 255, 255))
+
+        for (row, col), x_position, y_position, sticker_width_px, sticker_height_px in cell_rects(template, self.dpi):
+            # Skip labels outside the strip
+            first = max(top, y_position) - y_position
+            last = min(bottom, y_position + sticker_height_px) - y_position
+            if first >= last or (row, col) not in label_data or 'final_print' not in label_data[(row, col)]:
+                continue
+
+            # Resize the rows of the label inside the strip to the sticker dimensions, labels
+            # rendered at the export resolution fit already
+            label_image = load_image(self.print_label(label_data[(row, col)], template))
+            if label_image.size == (sticker_width_px, sticker_height_px):
+                part = label_image.crop((0, first, sticker_width_px, last))
+            else:
+                scale = label_image.height / sticker_height_px
+                with span("resize label"):
+                    part = label_image.resize((sticker_width_px, last - first), Image.Resampling.LANCZOS,
+                                              box=(0, first * scale, label_image.width, last * scale))
+
+            # Paste the label onto the page
+            page.paste(part, (x_position, y_position + first - top), mask=part if part.mode == "RGBA" else None)
+
+            if cell_callback and y_position + sticker_height_px <= bottom:
+                cell_callback(row, col)
 
         return page
 
+    def print_label(self, label:dict, template:dict):
+        """Get a label rendered at the export resolution, from the cache if unchanged
+
+        Labels without source image or design parameters, e.g. of the batch export, are
+        printed as they are.
+
+        Args:
+            label (dict): Label data of a single cell
+            template (dict): Template configuration as found in templates.json
+
+        Returns:
+            Image.Image or StoredImage: Label image
+        """
+        image = label['final_print']
+        if 'source' not in label or 'params' not in label:
+            return image
+
+        key = (id(image), template['sticker_width'], template['sticker_height'])
+        entry = self.__prints__.get(key)
+        if entry is not None and entry[0] is image:
+            return entry[1]
+
+        print_image = get_label_store().put(render_label_cached(
+            label['source'], template['sticker_width'], template['sticker_height'], dpi=self.dpi, **label['params']))
+        if self.reuse:
+            self.__prints__[key] = (image, print_image)
+        return print_image
+
+    def encoded_label(self, image) -> list:
+        """Get the digest and the JPEG encoding of a label, from the cache if unchanged
+
+        Args:
+            image (Image.Image or StoredImage): Label image
+
+        Returns:
+            list: [image, digest, encoded or None], encoded as returned by PDFWriter.encode_jpeg
+                is filled in by the caller on first use
+        """
+        entry = self.__encoded__.get(id(image))
+        if entry is not None and entry[0] is image:
+            self.stats["cells_reused"] = self.stats.get("cells_reused", 0) + 1
+            return entry
+
+        self.stats["cells_rendered"] = self.stats.get("cells_rendered", 0) + 1
+        with span("hash label"):
+            entry = [image, self.image_digest(load_image(image)), None]
+        if self.reuse:
+            self.__encoded__[id(image)] = entry
+        return entry
+
+    def prune_caches(self, sheets:list) -> None:
+        """Drop cached labels and pages not used by the given sheets
+
+        Args:
+            sheets (list): List of (template, label_data) tuples of the last export
+        """
+        used = {id(label['final_print']) for _, label_data in sheets for label in label_data.values()
+                if 'final_print' in label}
+        self.__prints__ = {key: entry for key, entry in self.__prints__.items() if key[0] in used}
+        used.update(id(entry[1]) for entry in self.__prints__.values())
+        self.__encoded__ = {key: entry for key, entry in self.__encoded__.items() if key in used}
+        self.__pages__ = {index: page for index, page in self.__pages__.items() if index < len(sheets)}
+
+    def clear_caches(self) -> None:
+        self.__prints__ = {}
+        self.__encoded__ = {}
+        self.__pages__ = {}
+
     def save_to_pdf(self, page_image:Image, output_path:str) -> None:
         """Save image as a PDF
 
@@ -64,3 +189,243 @@ class PDFCreator:
             output_path (str): Output path
         """
         page_image.convert('RGB').save(output_path, 'PDF', resolution=self.dpi)
+
+    def export_pdf(self, sheets:list, output_path:str, progress_callback=None, is_cancelled=None,
+                   cell_callback=None) -> bool:
+        """Render sheets and stream them page by page into a multi-page PDF
+
+        Only one page image is held in memory at a time, regardless of the number of sheets.
+        Without reuse, sheets may be an iterator producing the sheets while they are written.
+
+        Args:
+            sheets (iterable): (template, label_data) tuples, one per page. template is a
+                template configuration dict as found in templates.json
+            output_path (str): Output path
+            progress_callback (callable, optional): Called with (page_number, page_count) after
+                each written page, page_count is None for iterators. Defaults to None.
+            is_cancelled (callable, optional): Polled before each page, returning True aborts
+                the export and removes the incomplete file. Defaults to None.
+            cell_callback (callable, optional): Called with (page_number, row, col) after each
+                placed label. Defaults to None.
+
+        Returns:
+            bool: True if all pages were written, False if the export was cancelled
+
+        Raises:
+            ValueError: In verify mode, if the PDF differs from a full rebuild
+        """
+        self.stats = {"cells_rendered": 0, "cells_reused": 0, "pages_reused": 0}
+
+        # Pruning the caches and verifying the export need all sheets after writing them
+        if self.reuse or self.verify:
+            sheets = list(sheets)
+        page_count = len(sheets) if isinstance(sheets, list) else None
+
+        # Image objects already written to the PDF, shared between all pages
+        image_ids = {}
+
+        with PDFWriter(output_path) as writer:
+            for page_number, (template, label_data) in enumerate(sheets, start=1):
+                if is_cancelled and is_cancelled():
+                    writer.abort()
+                    return False
+
+                if cell_callback:
+                    on_cell = lambda row, col, page=page_number: cell_callback(page, row, col)
+                else:
+                    on_cell = None
+
+                with span("page", page=page_number, mode=self.mode):
+                    if self.mode == NATIVE:
+                        self.write_native_page(writer, template, label_data, image_ids, cell_callback=on_cell)
+                    else:
+                        self.write_raster_page(writer, page_number - 1, template, label_data, cell_callback=on_cell)
+
+                if progress_callback:
+                    progress_callback(page_number, page_count)
+
+        if self.reuse:
+            self.prune_caches(sheets)
+
+        if self.verify:
+            self.verify_export(sheets, output_path)
+        return True
+
+    def verify_export(self, sheets:list, output_path:str) -> None:
+        """Compare an exported PDF with a full rebuild without cached labels
+
+        Args:
+            sheets (list): List of (template, label_data) tuples as passed to export_pdf
+            output_path (str): Path of the exported PDF
+
+        Raises:
+            ValueError: The exported PDF differs from the full rebuild
+        """
+        verify_path = output_path + ".verify"
+        try:
+            PDFCreator(dpi=self.dpi, mode=self.mode, verify=False).export_pdf(sheets, verify_path)
+            with open(output_path, "rb") as exported, open(verify_path, "rb") as rebuilt:
+                identical = exported.read() == rebuilt.read()
+        finally:
+            if os.path.exists(verify_path):
+                os.remove(verify_path)
+
+        if not identical:
+            # Do not reuse anything that might have caused the difference
+            self.clear_caches()
+            raise ValueError("Incremental export differs from a full rebuild")
+
+    def write_raster_page(self, writer:PDFWriter, page_index:int, template:dict, label_data:dict,
+                          cell_callback=None) -> None:
+        """Write a page as image, reusing the encoded page of the previous export if none of
+        its labels changed
+
+        The page is assembled and JPEG encoded in horizontal strips of STRIP_PIXELS, so the
+        memory needed does not grow with the resolution. At low resolutions the page is a
+        single strip.
+
+        Args:
+            writer (PDFWriter): Open PDF writer
+            page_index (int): Index of the page in the export
+            template (dict): Template configuration as found in templates.json
+            label_data (dict): Dict with label data as stored in Editor widget class
+            cell_callback (callable, optional): Called with (row, col) after each placed label.
+                Defaults to None.
+        """
+        page_width_pt = 210 / 25.4 * POINTS_PER_INCH
+        page_height_pt = 297 / 25.4 * POINTS_PER_INCH
+
+        layout = json.dumps(template, sort_keys=True)
+        labels = {cell: label['final_print'] for cell, label in label_data.items() if 'final_print' in label}
+
+        cached = self.__pages__.get(page_index)
+        if (cached is not None and cached[0] == layout and cached[1].keys() == labels.keys()
+                and all(cached[1][cell] is image for cell, image in labels.items())):
+            encoded = cached[2]
+            self.stats["pages_reused"] += 1
+            self.stats["cells_reused"] += len(labels)
+            if cell_callback:
+                for row, col in sorted(labels):
+                    cell_callback(row, col)
+        else:
+            # Each label is reported once, although it may span several strips
+            placed = set()
+            def on_cell(row, col):
+                if (row, col) not in placed:
+                    placed.add((row, col))
+                    self.stats["cells_rendered"] += 1
+                    if cell_callback:
+                        cell_callback(row, col)
+
+            # Strips overlap the next strip by one row, which hides hairlines between strips
+            # in PDF viewers
+            encoded = []
+            strip_height = self.strip_height()
+            for top in range(0, self.a4_height_px, strip_height):
+                bottom = min(top + strip_height + 1, self.a4_height_px)
+                with span("assemble strip", top=top):
+                    strip = self.create_label_page(template, label_data, top, bottom, cell_callback=on_cell)
+                encoded.append((top, writer.encode_jpeg(strip)))
+                del strip
+            if self.reuse:
+                self.__pages__[page_index] = (layout, labels, encoded)
+
+        # Strips are placed at their pixel rows scaled to the page
+        scale = page_height_pt / self.a4_height_px
+        placements = []
+        for top, strip in encoded:
+            image_id = writer.write_jpeg(*strip)
+            placements.append((image_id, 0, top * scale, page_width_pt, strip[2] * scale))
+        writer.add_page(page_width_pt, page_height_pt, placements)
+
+    def write_native_page(self, writer:PDFWriter, template:dict, label_data:dict, image_ids:dict,
+                          cell_callback=None) -> None:
+        """Write a page placing each label as its own image object at its print size
+
+        Identical labels are written once and referenced from every cell using them.
+
+        Args:
+            writer (PDFWriter): Open PDF writer
+            template (dict): Template configuration as found in templates.json
+            label_data (dict): Dict with label data as stored in Editor widget class
+            image_ids (dict): Object numbers of already written images by their identity key
+            cell_callback (callable, optional): Called with (row, col) after each placed label.
+                Defaults to None.
+        """
+        mm_to_pt = POINTS_PER_INCH / 25.4
+        geometry = sheet_geometry(template)
+
+        placements = []
+        for row, col in geometry.cells():
+            if (row, col) not in label_data or 'final_print' not in label_data[(row, col)]:
+                continue
+
+            label = label_data[(row, col)]
+            passthrough = self.get_passthrough_jpeg(label, template)
+
+            if passthrough:
+                key = ("file",) + passthrough
+            else:
+                print_image = self.print_label(label, template)
+                encoded = self.encoded_label(print_image)
+                key = ("image", encoded[1])
+
+            if key not in image_ids:
+                if passthrough:
+                    with open(passthrough[0], "rb") as file:
+                        data = file.read()
+                    with Image.open(passthrough[0]) as source:
+                        image_ids[key] = writer.write_jpeg(data, source.width, source.height, source.mode)
+                else:
+                    if encoded[2] is None:
+                        encoded[2] = writer.encode_jpeg(load_image(print_image))
+                    image_ids[key] = writer.write_jpeg(*encoded[2])
+
+            placements.append((image_ids[key],) + tuple(value * mm_to_pt for value in geometry.cell_rect(row, col)))
+
+            if cell_callback:
+                cell_callback(row, col)
+
+        writer.add_page(PAGE_WIDTH_MM * mm_to_pt, PAGE_HEIGHT_MM * mm_to_pt, placements)
+
+    def get_passthrough_jpeg(self, label:dict, template:dict) -> tuple:
+        """Check whether the label can be embedded as its unmodified JPEG source file, as
+        rendered at the export resolution
+
+        Args:
+            label (dict): Label data of a single cell
+            template (dict): Template configuration as found in templates.json
+
+        Returns:
+            tuple: (path, modification time, file size) of the source or None
+        """
+        path = label.get('path')
+        if not path or 'params' not in label or not os.path.isfile(path):
+            return None
+
+        with Image.open(path) as source:
+            # Only baseline color spaces and upright images can be shown as is
+            if source.format != "JPEG" or source.mode not in ("RGB", "L"):
+                return None
+            if source.getexif().get(0x0112, 1) != 1:
+                return None
+            if not is_plain_copy(source.size, template['sticker_width'], template['sticker_height'],
+                                 dpi=self.dpi, **label['params']):
+                return None
+
+        stat = os.stat(path)
+        return path, stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def image_digest(image:Image.Image) -> str:
+        """Content hash of an image to detect identical labels
+
+        Args:
+            image (Image.Image): PIL image
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha1(f"{image.mode}{image.size}".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
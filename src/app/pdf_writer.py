@@ -0,0 +1,194 @@
+import io
+import os
+
+from PIL import Image
+
+from .tracing import span
+
+# PDF user space units per inch
+POINTS_PER_INCH = 72
+
+
+class PDFWriter:
+    """Minimal PDF writer that streams one page at a time to disk
+
+    Only the byte offsets of written objects are kept in memory, so the memory footprint
+    does not grow with the number of pages.
+    """
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, output_path:str, jpeg_quality:int=90):
+        # Public class attributes
+        self.output_path = output_path
+        self.jpeg_quality = jpeg_quality
+
+        # Private class attributes
+        self.__file__ = open(output_path, "wb")
+        self.__offsets__ = {}
+        self.__page_ids__ = []
+        self.__next_id__ = self.PAGES_ID + 1
+
+        self.__file__.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def page_count(self) -> int:
+        return len(self.__page_ids__)
+
+    def reserve_id(self) -> int:
+        """Reserve an object number for an object written later
+
+        Returns:
+            int: Object number
+        """
+        object_id = self.__next_id__
+        self.__next_id__ += 1
+        return object_id
+
+    def write_object(self, content:bytes, object_id:int=None, stream:bytes=None) -> int:
+        """Write an indirect object to the file
+
+        Args:
+            content (bytes): Object content, a dictionary if stream is given
+            object_id (int, optional): Reserved object number. Defaults to a new number.
+            stream (bytes, optional): Stream data appended to the object. Defaults to None.
+
+        Returns:
+            int: Object number
+        """
+        if object_id is None:
+            object_id = self.reserve_id()
+
+        self.__offsets__[object_id] = self.__file__.tell()
+        self.__file__.write(b"%d 0 obj\n" % object_id)
+        self.__file__.write(content)
+        if stream is not None:
+            self.__file__.write(b"\nstream\n")
+            self.__file__.write(stream)
+            self.__file__.write(b"\nendstream")
+        self.__file__.write(b"\nendobj\n")
+        return object_id
+
+    def write_image(self, image:Image.Image) -> int:
+        """Write a JPEG encoded image XObject
+
+        Args:
+            image (Image.Image): PIL image, converted to RGB if required
+
+        Returns:
+            int: Object number of the image
+        """
+        return self.write_jpeg(*self.encode_jpeg(image))
+
+    def encode_jpeg(self, image:Image.Image) -> tuple:
+        """Encode an image as written by write_image
+
+        Args:
+            image (Image.Image): PIL image, converted to RGB if required
+
+        Returns:
+            tuple: (data, width, height, mode) as accepted by write_jpeg
+        """
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffer = io.BytesIO()
+        with span("encode JPEG", size=image.size):
+            image.save(buffer, "JPEG", quality=self.jpeg_quality)
+        return buffer.getvalue(), image.width, image.height, image.mode
+
+    def write_jpeg(self, data:bytes, width:int, height:int, mode:str="RGB") -> int:
+        """Write already JPEG encoded data as image XObject
+
+        Args:
+            data (bytes): JPEG file content
+            width (int): Image width in pixels
+            height (int): Image height in pixels
+            mode (str, optional): PIL mode of the JPEG, "RGB" or "L". Defaults to "RGB".
+
+        Returns:
+            int: Object number of the image
+        """
+        color_space = b"/DeviceGray" if mode == "L" else b"/DeviceRGB"
+        header = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+                  b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                  % (width, height, color_space, len(data)))
+        return self.write_object(header, stream=data)
+
+    def add_page(self, width_pt:float, height_pt:float, placements:list) -> None:
+        """Add a page showing already written images
+
+        Args:
+            width_pt (float): Page width in points
+            height_pt (float): Page height in points
+            placements (list): List of (image_id, x, y, width, height) tuples in points,
+                measured from the top left corner of the page
+        """
+        resources = b" ".join(b"/Im%d %d 0 R" % (image_id, image_id) for image_id in
+                              dict.fromkeys(p[0] for p in placements))
+        content = b"".join(
+            b"q %.4f 0 0 %.4f %.4f %.4f cm /Im%d Do Q\n" % (w, h, x, height_pt - y - h, image_id)
+            for image_id, x, y, w, h in placements
+        )
+        content_id = self.write_object(b"<< /Length %d >>" % len(content), stream=content)
+
+        page_id = self.write_object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /XObject << %s >> >> /Contents %d 0 R >>"
+            % (self.PAGES_ID, width_pt, height_pt, resources, content_id)
+        )
+        self.__page_ids__.append(page_id)
+
+    def add_page_image(self, image:Image.Image, width_pt:float, height_pt:float) -> None:
+        """Add a page covered by a single image
+
+        Args:
+            image (Image.Image): Page image
+            width_pt (float): Page width in points
+            height_pt (float): Page height in points
+        """
+        image_id = self.write_image(image)
+        self.add_page(width_pt, height_pt, [(image_id, 0, 0, width_pt, height_pt)])
+
+    def close(self) -> None:
+        """Write page tree, cross reference table and trailer and close the file
+        """
+        if self.__file__.closed:
+            return
+
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.__page_ids__)
+        self.write_object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.__page_ids__)),
+                          object_id=self.PAGES_ID)
+        self.write_object(b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES_ID, object_id=self.CATALOG_ID)
+
+        xref_offset = self.__file__.tell()
+        size = self.__next_id__
+        self.__file__.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for object_id in range(1, size):
+            if object_id in self.__offsets__:
+                self.__file__.write(b"%010d 00000 n \n" % self.__offsets__[object_id])
+            else:
+                # Reserved but never written
+                self.__file__.write(b"0000000000 65535 f \n")
+        self.__file__.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                            % (size, self.CATALOG_ID, xref_offset))
+        self.__file__.close()
+
+    def abort(self) -> None:
+        """Close and remove the incomplete file
+        """
+        if self.__file__.closed:
+            return
+
+        self.__file__.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
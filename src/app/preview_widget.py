@@ -1,35 +1,287 @@
-from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QVBoxLayout, QWidget, QGraphicsPixmapItem
-from PyQt6.QtCore import Qt
+import itertools
+import math
+
+from PIL import ImageQt
+from PyQt6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QVBoxLayout, QWidget, QGraphicsPixmapItem, \
+    QHBoxLayout, QComboBox, QPushButton, QToolTip
+from PyQt6.QtCore import Qt, QTimer, QEvent, pyqtSignal
 from PyQt6.QtCore import QRectF
-from PyQt6.QtGui import QPainter, QPixmap, QImage, QBrush, QColor
+from PyQt6.QtGui import QPainter, QPixmap, QPixmapCache, QImage, QColor, QPen
 
 import app
-from .get_resources import template_data
+from .sheet_geometry import SheetGeometry, PAGE_WIDTH_MM, PAGE_HEIGHT_MM
+from .template_catalog import get_catalog, sheet_geometry
+from .tracing import span
 
 # Scale factor for UI rendering
 SCALE_FACTOR = 5
 
+# Vertical gap between the sheets of a project in mm
+SHEET_GAP_MM = 10
+
+# Memory budget of the label pixmap cache in KB
+PIXMAP_CACHE_KB = 64 * 1024
+
+# Label pixmap heights are rounded up to multiples of this, so small zoom changes reuse pixmaps
+LOD_STEP = 32
+
+# Zoom range relative to the initial view and zoom factor per wheel step
+MIN_ZOOM = 0.5
+MAX_ZOOM = 8
+ZOOM_STEP = 1.25
+
+# Delay before pixmaps are regenerated for a new zoom level
+LOD_DELAY_MS = 100
+
+# Unique ids of label images used in pixmap cache keys
+_IMAGE_IDS = itertools.count(1)
+
+
+class SheetView(QGraphicsView):
+    """Graphics view showing all sheets of a project stacked vertically
+
+    The static sheet, paper and cell outlines, is rendered once per zoom level into a pixmap
+    and drawn as background of every visible sheet. Clicks and tooltips are resolved to cells from the
+    template geometry, so the scene holds nothing but the generated label images.
+    """
+    # Signals
+    cell_clicked = pyqtSignal(int, int, int)
+    cell_toggled = pyqtSignal(int, int, int)
+    zoom_requested = pyqtSignal(float)
+    viewport_changed = pyqtSignal()
+    files_dropped = pyqtSignal(list, object)
+
+    def __init__(self, scene:QGraphicsScene):
+        super(SheetView, self).__init__(scene)
+
+        # Public class attributes
+        self.sheet_geometry = None
+        self.sheet_pixmap = QPixmap()
+        self.sheet_count = 1
+        self.sheet_pitch = (PAGE_HEIGHT_MM + SHEET_GAP_MM) * SCALE_FACTOR
+
+        self.setBackgroundBrush(QColor(200, 200, 200))
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.setAcceptDrops(True)
+
+    def set_sheets(self, sheet_geometry:SheetGeometry, sheet_count:int) -> None:
+        """Set the template and number of sheets to show
+
+        Args:
+            sheet_geometry (SheetGeometry): Cell geometry of the template
+            sheet_count (int): Number of sheets
+        """
+        self.sheet_geometry = sheet_geometry
+        self.sheet_pixmap = QPixmap()
+        self.set_sheet_count(sheet_count)
+
+    def set_sheet_pixmap(self, sheet_pixmap:QPixmap) -> None:
+        self.sheet_pixmap = sheet_pixmap
+        self.resetCachedContent()
+        self.viewport().update()
+
+    def set_sheet_count(self, sheet_count:int) -> None:
+        self.sheet_count = sheet_count
+        self.setSceneRect(QRectF(
+            0, 0,
+            PAGE_WIDTH_MM * SCALE_FACTOR,
+            sheet_count * self.sheet_pitch - SHEET_GAP_MM * SCALE_FACTOR
+        ))
+        self.resetCachedContent()
+        self.viewport().update()
+
+    def sheet_rect(self, sheet:int) -> QRectF:
+        return QRectF(0, sheet * self.sheet_pitch, PAGE_WIDTH_MM * SCALE_FACTOR, PAGE_HEIGHT_MM * SCALE_FACTOR)
+
+    def cell_rect(self, sheet:int, row:int, col:int) -> QRectF:
+        """Get the scene rectangle of a cell
+
+        Args:
+            sheet (int): Sheet index
+            row (int): Row of the cell
+            col (int): Column of the cell
+
+        Returns:
+            QRectF: Rectangle in scene coordinates
+        """
+        x, y, width, height = self.sheet_geometry.cell_rect(row, col)
+        return QRectF(
+            x * SCALE_FACTOR,
+            sheet * self.sheet_pitch + y * SCALE_FACTOR,
+            width * SCALE_FACTOR,
+            height * SCALE_FACTOR
+        )
+
+    def visible_rect(self) -> QRectF:
+        return self.mapToScene(self.viewport().rect()).boundingRect()
+
+    def sheets_in(self, rect:QRectF) -> range:
+        """Find the sheets intersecting a scene rectangle
+
+        Args:
+            rect (QRectF): Rectangle in scene coordinates
+
+        Returns:
+            range: Sheet indices
+        """
+        first = max(0, math.floor(rect.top() / self.sheet_pitch))
+        last = min(self.sheet_count - 1, math.floor(rect.bottom() / self.sheet_pitch))
+        return range(first, last + 1)
+
+    def visible_sheets(self) -> range:
+        return self.sheets_in(self.visible_rect())
+
+    def cell_at(self, position) -> tuple:
+        """Find the cell at a scene position
+
+        Args:
+            position (QPointF): Position in scene coordinates
+
+        Returns:
+            tuple: (sheet, row, col) or None if the position is not on a cell
+        """
+        if self.sheet_geometry is None:
+            return None
+
+        sheet = math.floor(position.y() / self.sheet_pitch)
+        if not 0 <= sheet < self.sheet_count:
+            return None
+
+        cell = self.sheet_geometry.cell_at(
+            position.x() / SCALE_FACTOR,
+            (position.y() - sheet * self.sheet_pitch) / SCALE_FACTOR
+        )
+        if cell is None:
+            return None
+        return (sheet,) + cell
+
+    def drawBackground(self, painter:QPainter, rect:QRectF) -> None:
+        super(SheetView, self).drawBackground(painter, rect)
+        if self.sheet_pixmap.isNull():
+            return
+
+        source = QRectF(self.sheet_pixmap.rect())
+        for sheet in self.sheets_in(rect):
+            painter.drawPixmap(self.sheet_rect(sheet), self.sheet_pixmap, source)
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.MouseButton.LeftButton:
+            cell = self.cell_at(self.mapToScene(event.position().toPoint()))
+            if cell is not None and event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+                self.cell_toggled.emit(*cell)
+            elif cell is not None:
+                self.cell_clicked.emit(*cell)
+        super(SheetView, self).mousePressEvent(event)
+
+    def viewportEvent(self, event) -> bool:
+        if event.type() == QEvent.Type.ToolTip:
+            cell = self.cell_at(self.mapToScene(event.pos()))
+            if cell is None:
+                QToolTip.hideText()
+            else:
+                QToolTip.showText(event.globalPos(), f"Label {cell[1] + 1},{cell[2] + 1}", self.viewport())
+            return True
+        return super(SheetView, self).viewportEvent(event)
+
+    def wheelEvent(self, event) -> None:
+        """Zoom with Ctrl + mouse wheel, scroll otherwise
+        """
+        if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
+            if event.angleDelta().y() > 0:
+                self.zoom_requested.emit(ZOOM_STEP)
+            elif event.angleDelta().y() < 0:
+                self.zoom_requested.emit(1 / ZOOM_STEP)
+            event.accept()
+        else:
+            super(SheetView, self).wheelEvent(event)
+
+    def dragEnterEvent(self, event) -> None:
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super(SheetView, self).dragEnterEvent(event)
+
+    def dragMoveEvent(self, event) -> None:
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super(SheetView, self).dragMoveEvent(event)
+
+    def dropEvent(self, event) -> None:
+        """Emit dropped files and folders with the cell they were dropped on
+        """
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if not paths:
+            super(SheetView, self).dropEvent(event)
+            return
+
+        event.acceptProposedAction()
+        self.files_dropped.emit(paths, self.cell_at(self.mapToScene(event.position().toPoint())))
+
+    def scrollContentsBy(self, dx:int, dy:int) -> None:
+        super(SheetView, self).scrollContentsBy(dx, dy)
+        self.viewport_changed.emit()
+
+    def resizeEvent(self, event) -> None:
+        super(SheetView, self).resizeEvent(event)
+        self.viewport_changed.emit()
+
+
 class PreviewWidget(QWidget):
 
     def __init__(self):
         super(PreviewWidget, self).__init__()
-        
+
         # Private class attributes
         self.editor = None
         self.logger = None
-        self.labels = {}
+        self.sheet_geometry = None
+        self.zoom = 1.0
+
+        # Private class attributes
+        self.__label_images__ = {}
+        self.__image_keys__ = {}
+        self.__pixmap_items__ = {}
+        self.__pixmap_keys__ = {}
+        self.__selection__ = None
+        self.__marks__ = {}
+        self.__lod_timer__ = QTimer(self)
+        self.__lod_timer__.setSingleShot(True)
+        self.__lod_timer__.setInterval(LOD_DELAY_MS)
+        self.__lod_timer__.timeout.connect(self.update_level_of_detail)
+
+        QPixmapCache.setCacheLimit(PIXMAP_CACHE_KB)
 
         # Read template configuration
-        self.template_config = template_data
+        self.template_config = get_catalog()
 
         # Initialize graphics scene and view
         self.scene = QGraphicsScene(self)
-        self.view = QGraphicsView(self.scene)
-        
+        self.view = SheetView(self.scene)
+        self.view.cell_clicked.connect(self.cell_clicked)
+        self.view.cell_toggled.connect(self.cell_toggled)
+        self.view.zoom_requested.connect(lambda factor: self.set_zoom(self.zoom * factor))
+        self.view.viewport_changed.connect(self.update_visible_labels)
+        self.view.files_dropped.connect(self.files_dropped)
+
+        # Sheet navigation
+        self.sheet_selector = QComboBox()
+        self.sheet_selector.addItem("Sheet 1")
+        self.sheet_selector.currentIndexChanged.connect(self.select_sheet)
+        self.add_sheet_btn = QPushButton("Add Sheet")
+        self.add_sheet_btn.clicked.connect(self.add_sheet)
+
+        sheet_layout = QHBoxLayout()
+        sheet_layout.addWidget(self.sheet_selector)
+        sheet_layout.addWidget(self.add_sheet_btn)
+
         layout = QVBoxLayout()
+        layout.addLayout(sheet_layout)
         layout.addWidget(self.view)
         self.setLayout(layout)
-        
+
     def registerEditor(self, editor:app.EditOptionsWidget):
         """Register the editor widget
 
@@ -37,7 +289,7 @@ class PreviewWidget(QWidget):
             editor (ui.EditOptionsWidget): Instance of editor widget class
         """
         self.editor = editor
-        
+
     def registerLogger(self, logger:app.FooterWidget):
         """Register the logger widget
 
@@ -54,57 +306,163 @@ class PreviewWidget(QWidget):
         """
         self.selected_template = template_name
         self.config = self.template_config[template_name]
+
+        # A new template starts with a single empty sheet
+        self.sheet_selector.blockSignals(True)
+        self.sheet_selector.clear()
+        self.sheet_selector.addItem("Sheet 1")
+        self.sheet_selector.blockSignals(False)
+
         self.render_template(self.selected_template)
 
+    def load_sheets(self, sheet_count:int) -> None:
+        """Show the sheets of a loaded project
+
+        Args:
+            sheet_count (int): Number of sheets
+        """
+        self.sheet_selector.blockSignals(True)
+        self.sheet_selector.clear()
+        self.sheet_selector.addItems([f"Sheet {index + 1}" for index in range(sheet_count)])
+        self.sheet_selector.blockSignals(False)
+
+        self.render_template(self.selected_template)
+
+    def add_sheet(self) -> None:
+        """Append an empty sheet to the project and show it
+        """
+        index = self.editor.add_sheet()
+        self.sheet_selector.addItem(f"Sheet {index + 1}")
+        self.view.set_sheet_count(self.sheet_selector.count())
+        self.sheet_selector.setCurrentIndex(index)
+
+        if self.logger:
+            self.logger.log(f"Added sheet {index + 1}")
+
+    def sync_sheets(self) -> None:
+        """Show sheets the editor added, e.g. while importing images
+        """
+        for index in range(self.sheet_selector.count(), len(self.editor.sheets)):
+            self.sheet_selector.addItem(f"Sheet {index + 1}")
+        self.view.set_sheet_count(self.sheet_selector.count())
+
+    def select_sheet(self, index:int) -> None:
+        """Select the given sheet and scroll to it if it is not visible
+
+        Args:
+            index (int): Sheet index
+        """
+        if index < 0:
+            return
+
+        self.editor.select_sheet(index)
+        if index not in self.view.visible_sheets():
+            self.view.centerOn(self.view.sheet_rect(index).center())
+        self.update_selection()
+
     def render_template(self, template_name:str) -> None:
         """Render template in preview canvas
 
         Args:
             template_name (str): Name of selected template
         """
+        self.clear_label_images()
         self.scene.clear()
-        self.labels = {}
+        self.__selection__ = None
+        self.__marks__ = {}
 
         if template_name not in self.template_config:
             return
 
-        pattern = self.config["sticker_pattern"]
-        top_margin = self.config["top_margin"] * SCALE_FACTOR
-        left_margin = self.config["left_margin"] * SCALE_FACTOR
-        sticker_width = self.config["sticker_width"] * SCALE_FACTOR
-        sticker_height = self.config["sticker_height"] * SCALE_FACTOR
-        h_margin = self.config["horizontal_margin"] * SCALE_FACTOR
-        v_margin = self.config["vertical_margin"] * SCALE_FACTOR
-
-        # Draw labels
-        for row in range(pattern[0]):
-            for col in range(pattern[1]):
-                x = left_margin + col * (sticker_width + h_margin)
-                y = top_margin + row * (sticker_height + v_margin)
-                
-                label_rect = QRectF(x, y, sticker_width, sticker_height)
-                label = QGraphicsRectItem(label_rect)
-                label.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemIsSelectable)
-                label.setToolTip(f"Label {row + 1},{col + 1}")
-                self.scene.addItem(label)
-                label.setZValue(1)
-                self.labels[(row, col)] = label
-
-                # Connect to clicks
-                label.mousePressEvent = lambda _, r=row, c=col: self.select_sticker(r, c)
-                
-        # Draw A4 paper
-        label_rect = QRectF(0, 0, 210 * SCALE_FACTOR, 297 * SCALE_FACTOR)
-        label = QGraphicsRectItem(label_rect)
-        label.setBrush(QBrush(QColor(255, 255, 255, 255)))
-        self.scene.addItem(label)
-                
+        self.sheet_geometry = sheet_geometry(self.config)
+        self.view.set_sheets(self.sheet_geometry, self.sheet_selector.count())
+
+        # Outline of the selected label
+        self.__selection__ = QGraphicsRectItem()
+        self.__selection__.setPen(QPen(QColor(0, 120, 215), 2 * SCALE_FACTOR))
+        self.__selection__.setZValue(1)
+        self.__selection__.hide()
+        self.scene.addItem(self.__selection__)
+
         # Set scene view
-        self.view.setScene(self.scene)
-        self.view.setSceneRect(self.scene.itemsBoundingRect())
         self.view.setRenderHint(QPainter.RenderHint.Antialiasing)
-        self.view.resetTransform()
-        self.view.scale(1 / SCALE_FACTOR, 1 / SCALE_FACTOR)
+        self.set_zoom(self.zoom)
+        self.update_visible_labels()
+        self.update_selection()
+        self.update_marks()
+
+    def render_sheet_pixmap(self) -> QPixmap:
+        """Render the A4 paper with the label outlines of the template at the displayed resolution
+
+        Returns:
+            QPixmap: Rendered sheet
+        """
+        # Device pixels per mm
+        scale = SCALE_FACTOR * self.view.transform().m22() * self.view.devicePixelRatioF()
+
+        pixmap = QPixmap(math.ceil(PAGE_WIDTH_MM * scale), math.ceil(PAGE_HEIGHT_MM * scale))
+        pixmap.fill(QColor(255, 255, 255, 255))
+
+        painter = QPainter(pixmap)
+        painter.scale(scale, scale)
+        pen = QPen(QColor(0, 0, 0))
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        for row, col in self.sheet_geometry.cells():
+            painter.drawRect(QRectF(*self.sheet_geometry.cell_rect(row, col)))
+        painter.end()
+
+        return pixmap
+
+    def cell_clicked(self, sheet:int, row:int, col:int) -> None:
+        if sheet != self.editor.selected_sheet:
+            self.sheet_selector.setCurrentIndex(sheet)
+        self.select_sticker(row, col)
+
+        # A plain click ends a multi-selection
+        if self.editor.marked_cells:
+            self.editor.marked_cells.clear()
+            self.update_marks()
+
+    def cell_toggled(self, sheet:int, row:int, col:int) -> None:
+        """Add a label to or remove it from the labels marked with Ctrl+click
+
+        Args:
+            sheet (int): Label sheet
+            row (int): Label row
+            col (int): Label column
+        """
+        self.editor.marked_cells ^= {(sheet, row, col)}
+        self.update_marks()
+
+    def update_marks(self) -> None:
+        """Outline the labels marked in the editor
+        """
+        if self.sheet_geometry is None or self.editor is None:
+            return
+
+        for key in list(self.__marks__):
+            if key not in self.editor.marked_cells:
+                self.scene.removeItem(self.__marks__.pop(key))
+
+        for key in self.editor.marked_cells:
+            if key not in self.__marks__:
+                mark = QGraphicsRectItem(self.view.cell_rect(*key))
+                mark.setPen(QPen(QColor(0, 120, 215), SCALE_FACTOR, Qt.PenStyle.DashLine))
+                mark.setZValue(1)
+                self.scene.addItem(mark)
+                self.__marks__[key] = mark
+
+    def files_dropped(self, paths:list, cell:tuple) -> None:
+        """Import dropped images starting at the label they were dropped on
+
+        Args:
+            paths (list): Dropped files and folders
+            cell (tuple): (sheet, row, col) or None if not dropped on a label
+        """
+        if cell is not None:
+            self.cell_clicked(*cell)
+        self.editor.import_images(paths, start=cell)
 
     def select_sticker(self, row:int, col:int) -> None:
         """Emit the selected row and column
@@ -115,30 +473,187 @@ class PreviewWidget(QWidget):
         """
         self.editor.selected_row = row
         self.editor.selected_col = col
+        self.editor.load_label_params()
         self.editor.draw_original_image()
+        self.update_selection()
+
+    def update_selection(self) -> None:
+        if self.__selection__ is None or self.editor is None:
+            return
+
+        row, col = self.editor.selected_row, self.editor.selected_col
+        if row is None or col is None:
+            self.__selection__.hide()
+            return
 
-    def updateStickerImage(self, image:QImage) -> None:
+        self.__selection__.setRect(self.view.cell_rect(self.editor.selected_sheet, row, col))
+        self.__selection__.show()
+
+    def updateStickerImage(self, image:QImage, row:int=None, col:int=None, sheet:int=None) -> None:
         """Renders generated label image in preview scene
 
+        Each label has a single pixmap item which is updated in place. Labels on sheets
+        outside of the view get their item once they are scrolled into view.
+
         Args:
             image (QImage): QImage instance containing generated label image
+            row (int, optional): Label row. Defaults to the selected row.
+            col (int, optional): Label column. Defaults to the selected column.
+            sheet (int, optional): Label sheet. Defaults to the selected sheet.
+        """
+        if row is None or col is None:
+            row = self.editor.selected_row
+            col = self.editor.selected_col
+        if sheet is None:
+            sheet = self.editor.selected_sheet
+        key = (sheet, row, col)
+
+        if sheet not in self.view.visible_sheets():
+            self.remove_label(key)
+            return
+
+        # Drop the pixmaps of the previous image
+        self.remove_label_pixmaps(key)
+        self.__label_images__[key] = image
+        self.__image_keys__[key] = f"label-{next(_IMAGE_IDS)}"
+
+        pixmap_item = self.__pixmap_items__.get(key)
+        if pixmap_item is None:
+            pixmap_item = QGraphicsPixmapItem()
+            pixmap_item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+            pixmap_item.setZValue(0.5)
+            self.scene.addItem(pixmap_item)
+            self.__pixmap_items__[key] = pixmap_item
+
+        self.update_pixmap_item(key)
+
+    def update_visible_labels(self) -> None:
+        """Create pixmap items for labels scrolled into view and drop those scrolled out of view
+        """
+        if self.sheet_geometry is None or self.editor is None:
+            return
+
+        rect = self.view.visible_rect()
+        visible = set()
+        for sheet in self.view.sheets_in(rect):
+            if sheet >= len(self.editor.sheets):
+                break
+
+            # Visible part of the sheet in mm
+            top = sheet * self.view.sheet_pitch
+            cells = self.sheet_geometry.cells_in(
+                rect.left() / SCALE_FACTOR,
+                (rect.top() - top) / SCALE_FACTOR,
+                rect.right() / SCALE_FACTOR,
+                (rect.bottom() - top) / SCALE_FACTOR
+            )
+            label_data = self.editor.sheets[sheet]
+            visible.update((sheet,) + cell for cell in cells if 'final_print' in label_data.get(cell, {}))
+
+        for key in list(self.__pixmap_items__):
+            if key not in visible:
+                self.remove_label(key)
+
+        for key in visible - set(self.__pixmap_items__):
+            sheet, row, col = key
+            self.updateStickerImage(ImageQt.ImageQt(self.editor.sheets[sheet][(row, col)]['final_print'].image()),
+                                    row, col, sheet)
+
+    def update_pixmap_item(self, key:tuple) -> None:
+        """Show the label pixmap matching the current zoom level
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
         """
-        # Get rect dimensions
-        rect = self.labels[(self.editor.selected_row, self.editor.selected_col)].rect()
-        
-        # Create a QBrush with the QImage converted to QPixmap
-        pixmap = QPixmap.fromImage(image)
-        
-        # Scale the pixmap while maintaining aspect ratio
-        target_height = int(rect.height())
-        scaled_pixmap = pixmap.scaledToHeight(target_height, mode=Qt.TransformationMode.SmoothTransformation)
-
-        # Calculate position to center the QPixmap in the QGraphicsRectItem
-        pixmap_item = QGraphicsPixmapItem(scaled_pixmap)
+        rect = self.view.cell_rect(*key)
+        pixmap = self.label_pixmap(key)
+        pixmap_item = self.__pixmap_items__[key]
+
+        # Scale the pixmap to the label height while maintaining aspect ratio
+        scale = rect.height() / pixmap.height()
+        pixmap_item.setPixmap(pixmap)
+        pixmap_item.setScale(scale)
+
+        # Calculate position to center the QPixmap in the label rectangle
         pixmap_item.setPos(
-            rect.left() + (rect.width() - scaled_pixmap.width()) / 2,
-            rect.top() + (rect.height() - scaled_pixmap.height()) / 2
+            rect.left() + (rect.width() - pixmap.width() * scale) / 2,
+            rect.top() + (rect.height() - pixmap.height() * scale) / 2
         )
 
-        # Add the pixmap item to the scene
-        self.scene.addItem(pixmap_item)
\ No newline at end of file
+    def label_pixmap(self, key:tuple) -> QPixmap:
+        """Get the label image scaled to the resolution it is displayed at
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
+
+        Returns:
+            QPixmap: Pixmap from the pixmap cache
+        """
+        image = self.__label_images__[key]
+        height = self.display_height(self.view.cell_rect(*key).height(), image.height())
+
+        pixmap_key = f"{self.__image_keys__[key]}-{height}"
+        pixmap = QPixmapCache.find(pixmap_key)
+        if pixmap is None:
+            with span("scale label pixmap", height=height):
+                pixmap = QPixmap.fromImage(image.scaledToHeight(height, Qt.TransformationMode.SmoothTransformation))
+            QPixmapCache.insert(pixmap_key, pixmap)
+            self.__pixmap_keys__.setdefault(key, set()).add(pixmap_key)
+        return pixmap
+
+    def display_height(self, scene_height:float, image_height:int) -> int:
+        """Height in device pixels of a scene item, rounded up to the next level of detail
+
+        Args:
+            scene_height (float): Height in scene coordinates
+            image_height (int): Height of the image, which is never exceeded
+
+        Returns:
+            int: Pixmap height
+        """
+        device_height = scene_height * self.view.transform().m22() * self.view.devicePixelRatioF()
+        return max(1, min(image_height, LOD_STEP * math.ceil(device_height / LOD_STEP)))
+
+    def remove_label_pixmaps(self, key:tuple) -> None:
+        for pixmap_key in self.__pixmap_keys__.pop(key, ()):
+            QPixmapCache.remove(pixmap_key)
+
+    def remove_label(self, key:tuple) -> None:
+        """Remove the pixmap item of a label from the scene
+
+        Args:
+            key (tuple): (sheet, row, col) of the label
+        """
+        self.remove_label_pixmaps(key)
+        self.__label_images__.pop(key, None)
+        self.__image_keys__.pop(key, None)
+        pixmap_item = self.__pixmap_items__.pop(key, None)
+        if pixmap_item is not None:
+            self.scene.removeItem(pixmap_item)
+
+    def clear_label_images(self) -> None:
+        """Forget all label images and pixmaps before the scene is cleared
+        """
+        for key in list(self.__pixmap_keys__):
+            self.remove_label_pixmaps(key)
+        self.__label_images__ = {}
+        self.__image_keys__ = {}
+        self.__pixmap_items__ = {}
+
+    def update_level_of_detail(self) -> None:
+        for key in self.__pixmap_items__:
+            self.update_pixmap_item(key)
+
+    def set_zoom(self, zoom:float) -> None:
+        """Zoom the preview, label pixmaps follow the new resolution after a short delay
+
+        Args:
+            zoom (float): Zoom factor relative to the initial view
+        """
+        self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, zoom))
+        self.view.resetTransform()
+        self.view.scale(self.zoom / SCALE_FACTOR, self.zoom / SCALE_FACTOR)
+        if self.sheet_geometry is not None:
+            self.view.set_sheet_pixmap(self.render_sheet_pixmap())
+        self.update_visible_labels()
+        self.__lod_timer__.start()
@@ -0,0 +1,184 @@
+import hashlib
+import io
+import json
+import os
+import re
+import zipfile
+
+from .proxy_cache import get_proxy_cache, hash_file
+from .render_cache import default_cache_dir
+from .source_image import SourceImage
+
+# Version of the project file format
+PROJECT_VERSION = 1
+
+# File extension and file dialog filter of project files
+PROJECT_EXTENSION = ".tonuino"
+PROJECT_FILTER = f"Tonuino Label Projects (*{PROJECT_EXTENSION})"
+
+# Name of the project description inside the project file
+PROJECT_JSON = "project.json"
+
+# Directory of the source images inside the project file, files are named by their digest
+SOURCES_DIR = "sources"
+
+# SHA-256 hex digest naming a source image, anything else is rejected as it is used in paths
+DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def save_project(path:str, template_name:str, sheets:list) -> None:
+    """Save the labels of all sheets with their source images to a project file
+
+    The project file is a zip archive with a project.json and each source image stored once
+    under its content digest. The digest is taken from the stored bytes, so files changed since
+    they were imported are stored under their current digest. Rendered labels are not stored,
+    they are restored from the render cache or rendered again.
+
+    Args:
+        path (str): Project file path
+        template_name (str): Name of the template
+        sheets (list): Label data dictionaries, one per sheet, keyed by (row, col)
+    """
+    project = {"version": PROJECT_VERSION, "template": template_name, "sheets": []}
+    temp_path = path + ".tmp"
+
+    try:
+        with zipfile.ZipFile(temp_path, "w") as archive:
+            # Digests of the stored source images by SourceImage.uid
+            written = {}
+            for label_data in sheets:
+                labels = []
+                for (row, col), label in sorted(label_data.items()):
+                    if 'source' not in label:
+                        continue
+                    source = label['source']
+
+                    # Images are compressed already, store them as they are
+                    if source.uid not in written:
+                        if source.path is not None:
+                            with open(source.path, "rb") as file:
+                                data = file.read()
+                        else:
+                            buffer = io.BytesIO()
+                            source.full().save(buffer, "PNG")
+                            data = buffer.getvalue()
+                        digest = hashlib.sha256(data).hexdigest()
+                        if digest not in written.values():
+                            archive.writestr(f"{SOURCES_DIR}/{digest}", data, zipfile.ZIP_STORED)
+                        written[source.uid] = digest
+                    digest = written[source.uid]
+
+                    labels.append({
+                        "cell": [row, col],
+                        "source": digest,
+                        "params": label.get('params'),
+                        # Original image file, watched for changes after loading the project
+                        "origin": label.get('origin') or label.get('path'),
+                    })
+                project["sheets"].append({"labels": labels})
+
+            archive.writestr(PROJECT_JSON, json.dumps(project, indent=2), zipfile.ZIP_DEFLATED)
+
+        # Never leave a partially written project file behind
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_project(path:str, sources_dir:str=None) -> tuple:
+    """Load a project file
+
+    Source images are extracted into a content-addressed directory, files already extracted
+    by an earlier load are reused. The content of every source image has to match its digest.
+
+    Args:
+        path (str): Project file path
+        sources_dir (str, optional): Directory for the extracted source images. Defaults to the
+            sources directory in the cache directory.
+
+    Raises:
+        ValueError: The file is not a valid project file
+
+    Returns:
+        tuple: (template name, list of label data dictionaries keyed by (row, col))
+    """
+    sources_dir = sources_dir or os.path.join(default_cache_dir(), SOURCES_DIR)
+
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValueError(f"'{path}' is not a project file")
+
+    with archive:
+        try:
+            project = json.loads(archive.read(PROJECT_JSON))
+        except KeyError:
+            raise ValueError(f"'{path}' is not a project file")
+        if project.get("version", 0) > PROJECT_VERSION:
+            raise ValueError(f"Project file version {project['version']} is not supported")
+
+        os.makedirs(sources_dir, exist_ok=True)
+        sources = {}
+        sheets = []
+        for sheet in project["sheets"]:
+            label_data = {}
+            for label in sheet["labels"]:
+                digest = label["source"]
+                if digest not in sources:
+                    source_path = extract_source(archive, digest, sources_dir)
+                    sources[digest] = SourceImage.from_file(source_path, digest=digest)
+
+                entry = {'path': sources[digest].path, 'source': sources[digest]}
+                if label.get("params") is not None:
+                    entry['params'] = label["params"]
+                if label.get("origin"):
+                    entry['origin'] = label["origin"]
+                label_data[tuple(label["cell"])] = entry
+            sheets.append(label_data)
+
+    return project["template"], sheets
+
+
+def extract_source(archive:zipfile.ZipFile, digest:str, sources_dir:str) -> str:
+    """Extract a source image unless it has been extracted before
+
+    Args:
+        archive (zipfile.ZipFile): Open project file
+        digest (str): Digest of the source image
+        sources_dir (str): Directory for the extracted source images
+
+    Raises:
+        ValueError: The digest is invalid or does not match the content of the source image
+
+    Returns:
+        str: Path of the extracted file
+    """
+    if not isinstance(digest, str) or not DIGEST_PATTERN.fullmatch(digest):
+        raise ValueError(f"Invalid source image digest {digest!r}")
+
+    info = archive.getinfo(f"{SOURCES_DIR}/{digest}")
+    path = os.path.join(sources_dir, digest)
+    try:
+        if os.path.isfile(path) and get_proxy_cache().file_digest(path) == digest:
+            return path
+    except OSError:
+        pass
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with archive.open(info) as source, open(temp_path, "wb") as target:
+            while True:
+                block = source.read(1024 * 1024)
+                if not block:
+                    break
+                target.write(block)
+        if hash_file(temp_path) != digest:
+            raise ValueError(f"Source image {digest} does not match its digest")
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return path
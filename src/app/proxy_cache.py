@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from .render_cache import RenderCache
+from .tracing import span
+
+# Disk budget of the cached proxies and file identities in bytes, least recently used files
+# are removed beyond
+MAX_PROXY_CACHE_BYTES = 1024 ** 3
+
+# Version of the proxy decoding, cached proxies of another version are not used
+PROXY_VERSION = 2
+
+# Block size used to hash source files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path:str) -> str:
+    """SHA-256 of the content of a file
+
+    Args:
+        path (str): File path
+
+    Returns:
+        str: Hex digest
+    """
+    sha = hashlib.sha256()
+    with span("hash file"), open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_identity(path:str) -> tuple:
+    """Size and modification time of a file, which change whenever the file is written
+
+    Args:
+        path (str): File path
+
+    Returns:
+        tuple: (size, modification time in ns) or None if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ProxyCache(RenderCache):
+    """Persistent disk cache of source image proxies, similar to a thumbnail cache
+
+    Proxies are keyed by the content digest of their source file and the reduction factor, so
+    a file used in several labels, projects or sessions is decoded once per factor. Next to the
+    proxies the cache keeps file identity records mapping the path, size and modification time
+    of a file to its content digest, which spares hashing unchanged files again. Both share the
+    least recently used eviction of the render cache. Proxies are stored uncompressed, reading
+    them has to be cheaper than decoding their source, and are written on a background thread
+    so a cache miss does not wait for the write.
+    """
+    # PNG proxies of earlier versions are no longer read but still evicted
+    SUBDIRECTORY = "proxies"
+    EXTENSIONS = (".tiff", ".digest", ".png")
+    FORMAT = "TIFF"
+    SAVE_OPTIONS = {"compression": "raw"}
+    SPAN_NAME = "proxy cache"
+
+    def __init__(self, directory:str=None, max_bytes:int=MAX_PROXY_CACHE_BYTES):
+        super(ProxyCache, self).__init__(directory, max_bytes)
+
+        # Private class attributes, a single writer keeps the writes in order
+        self.__writer__ = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ProxyCacheWriter")
+
+    @staticmethod
+    def proxy_key(source_digest:str, factor:int) -> str:
+        """Cache key of a proxy
+
+        Args:
+            source_digest (str): Content digest of the source file
+            factor (int): Reduction factor of the proxy
+
+        Returns:
+            str: Hex digest
+        """
+        description = json.dumps([PROXY_VERSION, source_digest, factor])
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    @staticmethod
+    def identity_key(path:str) -> str:
+        """Key of the identity of a file, which changes with its size or modification time
+
+        Args:
+            path (str): File path
+
+        Raises:
+            OSError: The file does not exist
+
+        Returns:
+            str: Hex digest
+        """
+        stat = os.stat(path)
+        description = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def identity_path(self, key:str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".digest")
+
+    def file_digest(self, path:str) -> str:
+        """Content digest of a file, hashed only if the file is new or has changed
+
+        Args:
+            path (str): File path
+
+        Raises:
+            OSError: The file cannot be read
+
+        Returns:
+            str: SHA-256 of the file content as returned by hash_file
+        """
+        identity_path = self.identity_path(self.identity_key(path))
+        try:
+            with open(identity_path, "r", encoding="ascii") as file:
+                digest = file.read().strip()
+            os.utime(identity_path)
+            if len(digest) == 64:
+                return digest
+        except (OSError, ValueError):
+            pass
+
+        digest = hash_file(path)
+        temp_path = f"{identity_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(identity_path), exist_ok=True)
+            with open(temp_path, "w", encoding="ascii") as file:
+                file.write(digest)
+            os.replace(temp_path, identity_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return digest
+
+    def get_proxy(self, source_digest:str, factor:int) -> Image.Image:
+        """Load a cached proxy
+
+        Args:
+            source_digest (str): Content digest of the source file
+            factor (int): Reduction factor of the proxy
+
+        Returns:
+            Image.Image: Proxy or None if not cached
+        """
+        return self.get(self.proxy_key(source_digest, factor))
+
+    def put_proxy(self, source_digest:str, factor:int, image:Image.Image) -> None:
+        """Store a proxy on the background writer, failures are ignored as the cache is optional
+
+        Args:
+            source_digest (str): Content digest of the source file
+            factor (int): Reduction factor of the proxy
+            image (Image.Image): Decoded and upright proxy, not to be modified afterwards
+        """
+        self.__writer__.submit(self.put, self.proxy_key(source_digest, factor), image)
+
+    def flush(self) -> None:
+        """Wait until all proxies passed to put_proxy are written
+        """
+        self.__writer__.submit(lambda: None).result()
+
+    def clear(self) -> None:
+        # Pending writes would add proxies again after clearing
+        self.flush()
+        super(ProxyCache, self).clear()
+
+
+_proxy_cache = None
+_proxy_cache_lock = threading.Lock()
+
+
+def get_proxy_cache() -> ProxyCache:
+    """Proxy cache in the default cache directory, created on first use
+    """
+    global _proxy_cache
+    with _proxy_cache_lock:
+        if _proxy_cache is None:
+            _proxy_cache = ProxyCache()
+        return _proxy_cache
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from PIL import Image
+
+from .label_renderer import render_label_from_source, DEFAULT_DPI, DEFAULT_PARAMS, RENDERER_VERSION
+from .tracing import span
+
+# Environment variable overriding the cache directory
+CACHE_DIR_ENV = "TONUINO_CACHE_DIR"
+
+# Application directory name inside the user cache directory
+APP_DIR = "TonuinoLabelMaker"
+
+# Disk budget of the rendered labels in bytes, least recently used labels are removed beyond
+MAX_CACHE_BYTES = 512 * 1024 ** 2
+
+# Fast PNG compression, the cache favours speed over size
+PNG_COMPRESS_LEVEL = 1
+
+
+def default_cache_dir() -> str:
+    """Platform specific cache directory of the application
+
+    Returns:
+        str: Directory from CACHE_DIR_ENV or the user cache directory
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.join(home, "AppData", "Local"))
+    elif sys.platform == "darwin":
+        base = os.path.join(home, "Library", "Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(home, ".cache"))
+    return os.path.join(base, APP_DIR)
+
+
+class RenderCache:
+    """Content-addressed disk cache of rendered labels
+
+    Labels are keyed by the digest of their source image, the label size, the design
+    parameters, the resolution and RENDERER_VERSION, so cached labels stay valid across
+    sessions and projects until the renderer changes.
+    """
+    # Subdirectory of the cache directory and file extensions of the cached files, images are
+    # stored with the first extension in FORMAT with SAVE_OPTIONS
+    SUBDIRECTORY = "renders"
+    EXTENSIONS = (".png",)
+    FORMAT = "PNG"
+    SAVE_OPTIONS = {"compress_level": PNG_COMPRESS_LEVEL}
+
+    # Prefix of the trace spans of cache reads and writes
+    SPAN_NAME = "render cache"
+
+    def __init__(self, directory:str=None, max_bytes:int=MAX_CACHE_BYTES):
+        # Public class attributes
+        self.directory = os.path.join(directory or default_cache_dir(), self.SUBDIRECTORY)
+        self.max_bytes = max_bytes
+
+        # Private class attributes
+        self.__lock__ = threading.Lock()
+        self.__written__ = 0
+
+    @staticmethod
+    def key(source_digest:str, width_mm:float, height_mm:float, params:dict, dpi:int) -> str:
+        """Cache key of a rendered label
+
+        Args:
+            source_digest (str): SourceImage.digest of the source image
+            width_mm (float): Label width in mm
+            height_mm (float): Label height in mm
+            params (dict): Design parameters
+            dpi (int): Resolution of the label
+
+        Returns:
+            str: Hex digest
+        """
+        description = json.dumps(
+            [RENDERER_VERSION, source_digest, width_mm, height_mm, dpi, dict(DEFAULT_PARAMS, **params)],
+            sort_keys=True
+        )
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.EXTENSIONS[0])
+
+    def get(self, key:str) -> Image.Image:
+        """Load a cached label
+
+        Args:
+            key (str): Key as returned by key
+
+        Returns:
+            Image.Image: Label or None if not cached
+        """
+        path = self.path(key)
+        try:
+            with span(f"{self.SPAN_NAME} read"), Image.open(path) as image:
+                image.load()
+            # Mark as recently used for the eviction
+            os.utime(path)
+        except (OSError, SyntaxError):
+            # Missing, truncated or unreadable files are cache misses
+            return None
+        return image
+
+    def put(self, key:str, image:Image.Image) -> None:
+        """Store a label, failures are ignored as the cache is optional
+
+        Args:
+            key (str): Key as returned by key
+            image (Image.Image): Rendered label
+        """
+        path = self.path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with span(f"{self.SPAN_NAME} write"):
+                image.save(temp_path, self.FORMAT, **self.SAVE_OPTIONS)
+            # Readers never see partially written files
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self.__lock__:
+            self.__written__ += size
+            prune = self.__written__ > self.max_bytes // 10
+            if prune:
+                self.__written__ = 0
+        if prune:
+            self.prune()
+
+    def entries(self) -> list:
+        """List all cached files
+
+        Returns:
+            list: (last use, size, path) of each cached file
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if not file.endswith(self.EXTENSIONS):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self) -> None:
+        """Remove least recently used files beyond the disk budget
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self) -> None:
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Render cache in the default cache directory, created on first use
+    """
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        return _render_cache
+
+
+def render_label_cached(source, width_mm:float, height_mm:float, dpi:int=DEFAULT_DPI, cache:RenderCache=None,
+                        **params) -> Image.Image:
+    """Load a label from the render cache or render and cache it
+
+    Args:
+        source (SourceImage): Source image of the label
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        dpi (int, optional): Resolution of the composed label. Defaults to DEFAULT_DPI.
+        cache (RenderCache, optional): Cache to use. Defaults to get_render_cache().
+        **params: Design parameters as accepted by render_label
+
+    Returns:
+        Image.Image: RGBA label image
+    """
+    cache = cache or get_render_cache()
+    key = cache.key(source.digest, width_mm, height_mm, params, dpi)
+
+    image = cache.get(key)
+    if image is None:
+        image = render_label_from_source(source, width_mm, height_mm, dpi=dpi, **params)
+        cache.put(key, image)
+    return image
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from PIL import Image
+
+from .label_renderer import render_label, mm_to_px
+
+# Image modes transferred as they are, others are converted to RGBA, the mode the renderer
+# works in anyway
+SHARED_MODES = ("L", "RGB", "RGBA")
+
+# Bytes per pixel of the shared image modes
+MODE_BYTES = {"L": 1, "RGB": 3, "RGBA": 4}
+
+# Number of worker processes of the process pool
+PROCESS_COUNT = os.cpu_count() or 1
+
+# Image in a shared memory block, identified by the block name
+SharedImage = namedtuple("SharedImage", ["name", "mode", "size"])
+
+
+def shared_size(mode:str, size:tuple) -> int:
+    return max(1, size[0] * size[1] * MODE_BYTES[mode])
+
+
+def allocate_image(mode:str, size:tuple) -> tuple:
+    """Create a shared memory block for an image
+
+    The process creating a block owns it and has to close and unlink it, which also works on
+    Windows where a block disappears with the last open handle.
+
+    Args:
+        mode (str): Image mode, one of SHARED_MODES
+        size (tuple): (width, height) in pixels
+
+    Returns:
+        tuple: (SharedImage, SharedMemory)
+    """
+    block = SharedMemory(create=True, size=shared_size(mode, size))
+    return SharedImage(block.name, mode, size), block
+
+
+def release_image(block:SharedMemory) -> None:
+    """Close and unlink a shared memory block created by allocate_image, blocks already
+    unlinked are ignored
+
+    Args:
+        block (SharedMemory): Block owned by this process
+    """
+    block.close()
+    try:
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def share_image(image:Image.Image) -> tuple:
+    """Copy an image into a new shared memory block
+
+    Args:
+        image (Image.Image): Image, converted to RGBA if its mode is not in SHARED_MODES
+
+    Returns:
+        tuple: (SharedImage, SharedMemory) as returned by allocate_image
+    """
+    if image.mode not in SHARED_MODES:
+        image = image.convert("RGBA")
+    shared, block = allocate_image(image.mode, image.size)
+    try:
+        data = image.tobytes()
+        block.buf[:len(data)] = data
+    except BaseException:
+        release_image(block)
+        raise
+    return shared, block
+
+
+def read_image(shared:SharedImage) -> Image.Image:
+    """Copy an image out of a shared memory block
+
+    Args:
+        shared (SharedImage): Shared image
+
+    Returns:
+        Image.Image: Image independent of the block
+    """
+    block = SharedMemory(name=shared.name)
+    try:
+        view = block.buf[:shared_size(shared.mode, shared.size)]
+        image = Image.frombytes(shared.mode, shared.size, view)
+        view.release()
+    finally:
+        block.close()
+    return image
+
+
+def write_image(shared:SharedImage, image:Image.Image) -> None:
+    """Copy an image into an allocated shared memory block
+
+    Args:
+        shared (SharedImage): Block allocated for the mode and size of the image
+        image (Image.Image): Image
+
+    Raises:
+        ValueError: The image does not match the block
+    """
+    if (image.mode, image.size) != (shared.mode, shared.size):
+        raise ValueError(f"Image {image.mode} {image.size} does not match shared image {shared.mode} {shared.size}")
+    block = SharedMemory(name=shared.name)
+    try:
+        data = image.tobytes()
+        block.buf[:len(data)] = data
+    finally:
+        block.close()
+
+
+def label_size(width_mm:float, height_mm:float, dpi:int) -> tuple:
+    """Pixel size of a label rendered at a resolution
+    """
+    return mm_to_px(width_mm, dpi), mm_to_px(height_mm, dpi)
+
+
+def render_shared(source:SharedImage, result:SharedImage, cache_key:tuple, width_mm:float, height_mm:float,
+                  dpi:int, params:dict) -> None:
+    """Render a label from a shared source proxy into a shared result block, executed in a
+    worker process
+
+    Stage caches live per worker process, so labels of the same source rendered by the same
+    worker share their intermediate results.
+
+    Args:
+        source (SharedImage): Decoded source proxy
+        result (SharedImage): RGBA block of the label size
+        cache_key (tuple): Identity of the source proxy for the stage caches
+        width_mm (float): Label width in mm
+        height_mm (float): Label height in mm
+        dpi (int): Resolution of the label
+        params (dict): Design parameters
+    """
+    image = read_image(source)
+    write_image(result, render_label(image, width_mm, height_mm, dpi=dpi, cache_key=cache_key, **params))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared process pool with a worker per CPU, started on first use
+
+    Workers are spawned rather than forked, forking a process running Qt threads is unsafe.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROCESS_COUNT, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def reset_process_pool() -> None:
+    """Drop a broken process pool, the next get_process_pool starts a new one
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
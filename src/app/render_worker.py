@@ -0,0 +1,212 @@
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from .label_renderer import render_label_from_source, DEFAULT_DPI
+from .render_cache import RenderCache, render_label_cached
+from .render_pool import (allocate_image, release_image, share_image, read_image, render_shared, label_size,
+                          get_process_pool, reset_process_pool, PROCESS_COUNT)
+from .source_image import SourceImage
+from .tracing import operation
+
+# Jobs submitted to the process pool per worker process, more wait in the queue so the shared
+# memory of labels not yet being rendered is not allocated early
+JOBS_PER_PROCESS = 2
+
+
+class RenderSignals(QObject):
+    # Request token, cell key (sheet, row, col), rendered PIL image
+    finished = pyqtSignal(int, object, object)
+    # Request token, cell key (sheet, row, col), error message
+    failed = pyqtSignal(int, object, str)
+
+
+class RenderWorker(QRunnable):
+    """Renders a single label on a thread pool thread
+
+    The result carries the cell it was requested for, so it can be applied even if the
+    selection changed in the meantime.
+    """
+    def __init__(self, token:int, cell:tuple, source:SourceImage, width_mm:float, height_mm:float, params:dict,
+                 dpi:int=None, render_cache:RenderCache=None):
+        super(RenderWorker, self).__init__()
+        self.setAutoDelete(False)
+
+        # Public class attributes
+        self.token = token
+        self.cell = cell
+        self.source = source
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.params = params
+        self.dpi = dpi
+        self.render_cache = render_cache
+        self.signals = RenderSignals()
+
+    def run(self) -> None:
+        kwargs = dict(self.params)
+        if self.dpi:
+            kwargs["dpi"] = self.dpi
+
+        try:
+            with operation("Render label", cell=self.cell):
+                if self.render_cache:
+                    image = render_label_cached(self.source, self.width_mm, self.height_mm, cache=self.render_cache,
+                                                **kwargs)
+                else:
+                    image = render_label_from_source(self.source, self.width_mm, self.height_mm, **kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self.token, self.cell, str(e))
+            return
+
+        self.signals.finished.emit(self.token, self.cell, image)
+
+
+class RenderJob:
+    """Label of a BatchRenderWorker, rendered for a single cell
+    """
+    def __init__(self, token:int, cell:tuple, source:SourceImage, params:dict):
+        # Public class attributes
+        self.token = token
+        self.cell = cell
+        self.source = source
+        self.params = params
+
+
+class BatchRenderWorker(QRunnable):
+    """Renders many labels of the same size on all CPU cores
+
+    Runs on a thread pool thread and feeds a process pool. Each source proxy is decoded once in
+    this process and shared with the worker processes through shared memory, the rendered
+    labels are returned the same way, so neither is pickled. Labels found in the render cache
+    are not rendered again. Results are emitted per job as they complete, with the signals of
+    RenderWorker.
+    """
+    def __init__(self, jobs:list, width_mm:float, height_mm:float, dpi:int=DEFAULT_DPI,
+                 render_cache:RenderCache=None):
+        super(BatchRenderWorker, self).__init__()
+        self.setAutoDelete(False)
+
+        # Public class attributes
+        self.jobs = jobs
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.dpi = dpi
+        self.render_cache = render_cache
+        self.signals = RenderSignals()
+
+        # Private class attributes
+        self.__cancelled__ = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop submitting jobs, jobs already rendering are finished but not emitted
+        """
+        self.__cancelled__.set()
+
+    def run(self) -> None:
+        with operation("Render labels", count=len(self.jobs)):
+            self.render_all()
+
+    def cache_key(self, job:RenderJob) -> str:
+        # Same key as render_label_cached, so both workers share the cached labels
+        return self.render_cache.key(job.source.digest, self.width_mm, self.height_mm, job.params, self.dpi)
+
+    def render_all(self) -> None:
+        size = label_size(self.width_mm, self.height_mm, self.dpi)
+        queue = deque(self.jobs)
+        running = {}
+        # Shared proxy blocks by source uid with the number of submitted jobs using them
+        sources = {}
+
+        def release_source(uid:int) -> None:
+            sources[uid][2] -= 1
+            if sources[uid][2] <= 0:
+                _, block, _ = sources.pop(uid)
+                release_image(block)
+
+        def submit(job:RenderJob) -> None:
+            uid = job.source.uid
+            if uid not in sources:
+                proxy = job.source.proxy_to_cover(*size)
+                shared, block = share_image(proxy)
+                sources[uid] = [shared, block, 0]
+            shared = sources[uid][0]
+            sources[uid][2] += 1
+
+            try:
+                result, result_block = allocate_image("RGBA", size)
+            except BaseException:
+                release_source(uid)
+                raise
+            try:
+                future = get_process_pool().submit(render_shared, shared, result, (uid, shared.size), self.width_mm,
+                                                   self.height_mm, self.dpi, job.params)
+            except BaseException:
+                release_image(result_block)
+                release_source(uid)
+                raise
+            running[future] = (job, result, result_block)
+
+        try:
+            while queue or running:
+                while queue and len(running) < JOBS_PER_PROCESS * PROCESS_COUNT and not self.__cancelled__.is_set():
+                    job = queue.popleft()
+                    try:
+                        if self.render_cache:
+                            image = self.render_cache.get(self.cache_key(job))
+                            if image is not None:
+                                self.signals.finished.emit(job.token, job.cell, image)
+                                continue
+                        submit(job)
+                    except BrokenProcessPool:
+                        queue.appendleft(job)
+                        raise
+                    except Exception as e:
+                        self.signals.failed.emit(job.token, job.cell, str(e))
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, result, result_block = running.pop(future)
+                    try:
+                        future.result()
+                        image = read_image(result)
+                    except BrokenProcessPool:
+                        queue.appendleft(job)
+                        raise
+                    except Exception as e:
+                        if not self.__cancelled__.is_set():
+                            self.signals.failed.emit(job.token, job.cell, str(e))
+                    else:
+                        if self.render_cache:
+                            self.render_cache.put(self.cache_key(job), image)
+                        if not self.__cancelled__.is_set():
+                            self.signals.finished.emit(job.token, job.cell, image)
+                    finally:
+                        release_image(result_block)
+                        release_source(job.source.uid)
+
+        except BrokenProcessPool as e:
+            # A worker process died, the pool cannot be used anymore and the next batch starts a
+            # new one
+            reset_process_pool()
+            failed = list(queue) + [job for job, _, _ in running.values()]
+            if not self.__cancelled__.is_set():
+                for job in failed:
+                    self.signals.failed.emit(job.token, job.cell, f"Render process failed: {e}")
+
+        finally:
+            # Blocks are left only if rendering stopped early, e.g. by a broken pool or an
+            # unexpected error, and are released whatever the cause so no shared memory leaks
+            for future, (_, _, result_block) in running.items():
+                future.cancel()
+                release_image(result_block)
+            running.clear()
+            for _, block, _ in sources.values():
+                release_image(block)
+            sources.clear()
@@ -0,0 +1,81 @@
+import math
+
+# A4 page size in mm
+PAGE_WIDTH_MM = 210
+PAGE_HEIGHT_MM = 297
+
+
+class SheetGeometry:
+    """Cell geometry of a sheet template in mm
+
+    Cells are laid out on a regular grid, so cell lookups are computed from the grid pitch
+    instead of testing every cell.
+    """
+    def __init__(self, template:dict):
+        # Public class attributes
+        self.rows, self.cols = template["sticker_pattern"]
+        self.top_margin = template["top_margin"]
+        self.left_margin = template["left_margin"]
+        self.cell_width = template["sticker_width"]
+        self.cell_height = template["sticker_height"]
+        self.pitch_x = self.cell_width + template["horizontal_margin"]
+        self.pitch_y = self.cell_height + template["vertical_margin"]
+
+    def cells(self) -> list:
+        return [(row, col) for row in range(self.rows) for col in range(self.cols)]
+
+    def cell_rect(self, row:int, col:int) -> tuple:
+        """Get the rectangle of a cell
+
+        Args:
+            row (int): Row of the cell
+            col (int): Column of the cell
+
+        Returns:
+            tuple: (x, y, width, height) in mm from the top left corner of the page
+        """
+        return (
+            self.left_margin + col * self.pitch_x,
+            self.top_margin + row * self.pitch_y,
+            self.cell_width,
+            self.cell_height,
+        )
+
+    def cell_at(self, x:float, y:float) -> tuple:
+        """Find the cell at a position on the page
+
+        Args:
+            x (float): Horizontal position in mm
+            y (float): Vertical position in mm
+
+        Returns:
+            tuple: (row, col) of the cell or None if the position is not on a cell
+        """
+        col = math.floor((x - self.left_margin) / self.pitch_x)
+        row = math.floor((y - self.top_margin) / self.pitch_y)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+
+        # Positions in the gap between two cells belong to no cell
+        cell_x, cell_y, _, _ = self.cell_rect(row, col)
+        if x - cell_x > self.cell_width or y - cell_y > self.cell_height:
+            return None
+        return row, col
+
+    def cells_in(self, left:float, top:float, right:float, bottom:float) -> list:
+        """Find all cells intersecting a rectangle on the page
+
+        Args:
+            left (float): Left edge in mm
+            top (float): Top edge in mm
+            right (float): Right edge in mm
+            bottom (float): Bottom edge in mm
+
+        Returns:
+            list: (row, col) of the cells
+        """
+        first_col = max(0, math.floor((left - self.left_margin) / self.pitch_x))
+        last_col = min(self.cols - 1, math.floor((right - self.left_margin) / self.pitch_x))
+        first_row = max(0, math.floor((top - self.top_margin) / self.pitch_y))
+        last_row = min(self.rows - 1, math.floor((bottom - self.top_margin) / self.pitch_y))
+        return [(row, col) for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)]
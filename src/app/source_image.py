@@ -0,0 +1,325 @@
+import functools
+import hashlib
+import itertools
+import math
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from .label_store import get_label_store
+from .proxy_cache import ProxyCache, get_proxy_cache, hash_file, file_identity
+from .tracing import span
+
+# EXIF orientations which swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Number of proxy resolutions kept per source image
+MAX_PROXIES = 3
+
+# Unique ids of source images, unlike id() they are never reused
+_UIDS = itertools.count(1)
+
+# Smallest reduction factor of proxies kept in the proxy cache, full resolution images are
+# decoded from their file
+MIN_CACHED_FACTOR = 2
+
+# Formats the decoder itself scales down while decoding, which is faster than reading a cached
+# proxy, so their proxies are not cached
+DRAFT_FORMATS = ("JPEG",)
+
+# Live source images of files by content digest, shared by all labels using the same file
+_SOURCES = weakref.WeakValueDictionary()
+_SOURCES_LOCK = threading.Lock()
+
+# File extensions of supported source images
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def find_images(paths:list) -> list:
+    """Expand files and folders to the supported image files they contain
+
+    Args:
+        paths (list): File and folder paths, folders are searched non-recursively
+
+    Returns:
+        list: Image file paths, files of each folder sorted by name
+    """
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.listdir(path), key=str.lower)
+            images += [os.path.join(path, file) for file in files
+                       if os.path.isfile(os.path.join(path, file)) and file.lower().endswith(IMAGE_EXTENSIONS)]
+        elif os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+    return images
+
+
+class SourceChangedError(OSError):
+    """The file of a source image changed after its digest was taken
+    """
+
+
+def _decode_proxy(source_ref, factor:int) -> Image.Image:
+    # Loader of spilled proxies, weakly referencing the source to not keep it alive
+    return source_ref().load_proxy(factor)
+
+
+class SourceImage:
+    """Source image of a label providing proxies decoded at reduced resolution
+
+    JPEG files are decoded in the DCT domain at 1/2, 1/4 or 1/8 scale and other formats are
+    reduced by an integer factor right after decoding, so consumers never pay for a full
+    resolution decode they do not need. EXIF orientation is applied in the same pass. Proxies
+    are cached per reduction factor in the label store, which drops them beyond its memory
+    budget and decodes them again on demand. Sources opened with from_file also keep their
+    proxies in the persistent proxy cache, unless they are JPEG files.
+
+    The digest identifies the content of the file when the source was opened. Files are only
+    decoded while their size and modification time are unchanged, so renders cached under the
+    digest never show the content of a later version of the file.
+    """
+    def __init__(self, path:str=None, image:Image.Image=None, digest:str=None, proxy_cache:ProxyCache=None,
+                 identity:tuple=None):
+        if (path is None) == (image is None):
+            raise ValueError("SourceImage requires either a path or an image")
+
+        # Public class attributes
+        self.path = path
+        self.uid = next(_UIDS)
+
+        # Private class attributes, in-memory images are spilled by the label store
+        self.__image__ = get_label_store().put(image) if image is not None else None
+        self.__proxies__ = OrderedDict()
+        self.__lock__ = threading.Lock()
+        self.__digest__ = digest
+        self.__proxy_cache__ = proxy_cache
+        self.__identity__ = (identity or file_identity(path)) if path is not None else None
+
+        # Read size and orientation from the file header without decoding
+        if path is not None:
+            with Image.open(path) as header:
+                self.__raw_size__ = header.size
+                self.__orientation__ = header.getexif().get(0x0112, 1)
+                self.__format__ = header.format
+        else:
+            self.__raw_size__ = image.size
+            self.__orientation__ = 1
+            self.__format__ = None
+
+    @classmethod
+    def from_file(cls, path:str, digest:str=None):
+        """Open a source file, sharing the source image of a file with the same content which
+        is already open, so its proxies are decoded once
+
+        Args:
+            path (str): Image file
+            digest (str, optional): Known content digest of the file. Defaults to the digest
+                recorded in the proxy cache, the file is hashed if it is new or has changed.
+
+        Returns:
+            SourceImage: Source image using the proxy cache
+        """
+        proxy_cache = get_proxy_cache()
+        # Taken before the digest, a file written while it is hashed does not match later
+        identity = file_identity(path)
+        if digest is None:
+            digest = proxy_cache.file_digest(path)
+
+        with _SOURCES_LOCK:
+            source = _SOURCES.get(digest)
+            if source is not None and source.unchanged():
+                return source
+
+        source = cls(path=path, digest=digest, proxy_cache=proxy_cache, identity=identity)
+        with _SOURCES_LOCK:
+            shared = _SOURCES.get(digest)
+            if shared is not None and shared.unchanged():
+                return shared
+            _SOURCES[digest] = source
+            return source
+
+    @classmethod
+    def from_image(cls, image:Image.Image):
+        return cls(image=image)
+
+    @property
+    def size(self) -> tuple:
+        """Size of the full resolution image after applying the EXIF orientation
+        """
+        width, height = self.__raw_size__
+        if self.__orientation__ in TRANSPOSED_ORIENTATIONS:
+            return height, width
+        return width, height
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the file content, or of the pixel data for in-memory images
+
+        Computed on first access. Identifies the source content across sessions, e.g. in
+        project files and the render cache.
+        """
+        if self.__digest__ is None:
+            if self.path is not None:
+                self.check_unchanged()
+                self.__digest__ = hash_file(self.path)
+            else:
+                sha = hashlib.sha256()
+                image = self.__image__.image()
+                sha.update(f"{image.mode}:{image.size}:".encode())
+                sha.update(image.tobytes())
+                self.__digest__ = sha.hexdigest()
+        return self.__digest__
+
+    def unchanged(self) -> bool:
+        """Check whether the file still has the size and modification time it had when the
+        source was opened, in-memory images never change
+        """
+        return self.path is None or file_identity(self.path) == self.__identity__
+
+    def check_unchanged(self) -> None:
+        """Make sure the file has not changed since the source was opened
+
+        A changed source is no longer shared by from_file, which opens the new content as a new
+        source.
+
+        Raises:
+            SourceChangedError: The file changed or has been removed
+        """
+        if self.unchanged():
+            return
+
+        with _SOURCES_LOCK:
+            if self.__digest__ is not None and _SOURCES.get(self.__digest__) is self:
+                del _SOURCES[self.__digest__]
+        raise SourceChangedError(f"Image file {self.path} changed after it was opened")
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    def full(self) -> Image.Image:
+        """Get the image at full resolution
+
+        Returns:
+            Image.Image: Decoded and upright image
+        """
+        return self.proxy(1.0)
+
+    def proxy(self, scale:float) -> Image.Image:
+        """Get a proxy of at least the given scale of the full resolution image
+
+        Args:
+            scale (float): Minimum scale in both dimensions, 1.0 or more is full resolution
+
+        Returns:
+            Image.Image: Decoded and upright proxy image
+        """
+        factor = max(1, int(1 / scale)) if scale > 0 else 1
+
+        # In-memory images are stored at full resolution already
+        if factor == 1 and self.__image__ is not None:
+            return self.__image__.image()
+
+        with self.__lock__:
+            if factor in self.__proxies__:
+                self.__proxies__.move_to_end(factor)
+                return self.__proxies__[factor].image()
+
+            with span("decode", factor=factor):
+                proxy = self.load_proxy(factor)
+
+            self.__proxies__[factor] = get_label_store().put(
+                proxy, loader=functools.partial(_decode_proxy, weakref.ref(self), factor))
+            while len(self.__proxies__) > MAX_PROXIES:
+                self.__proxies__.popitem(last=False)
+            return proxy
+
+    def proxy_to_fit(self, width:int, height:int) -> Image.Image:
+        """Get a proxy large enough to be scaled down to fit into the given size
+
+        Args:
+            width (int): Target width in pixels
+            height (int): Target height in pixels
+
+        Returns:
+            Image.Image: Proxy image
+        """
+        return self.proxy(min(width / self.width, height / self.height))
+
+    def proxy_to_cover(self, width:int, height:int) -> Image.Image:
+        """Get a proxy large enough to be scaled down to cover the given size
+
+        Args:
+            width (int): Target width in pixels
+            height (int): Target height in pixels
+
+        Returns:
+            Image.Image: Proxy image
+        """
+        return self.proxy(max(width / self.width, height / self.height))
+
+    def load_proxy(self, factor:int) -> Image.Image:
+        """Load a proxy from the proxy cache or decode and cache it, formats in DRAFT_FORMATS
+        are always decoded
+
+        Args:
+            factor (int): Reduction factor
+
+        Returns:
+            Image.Image: Decoded and upright image
+        """
+        if (self.__proxy_cache__ is None or self.path is None or factor < MIN_CACHED_FACTOR
+                or self.__format__ in DRAFT_FORMATS):
+            return self.decode(factor)
+
+        proxy = self.__proxy_cache__.get_proxy(self.digest, factor)
+        if proxy is None:
+            proxy = self.decode(factor)
+            self.__proxy_cache__.put_proxy(self.digest, factor, proxy)
+        return proxy
+
+    def decode(self, factor:int) -> Image.Image:
+        """Decode the image reduced by an integer factor
+
+        Args:
+            factor (int): Reduction factor
+
+        Raises:
+            SourceChangedError: The file changed since the source was opened
+
+        Returns:
+            Image.Image: Decoded and upright image
+        """
+        if self.__image__ is not None:
+            image = self.__image__.image()
+            if factor > 1:
+                image = image.reduce(factor)
+            return image
+
+        self.check_unchanged()
+        raw_width, raw_height = self.__raw_size__
+        with Image.open(self.path) as image:
+            if factor > 1 and image.format in DRAFT_FORMATS:
+                # Let the JPEG decoder scale in the DCT domain
+                image.draft(image.mode, (math.ceil(raw_width / factor), math.ceil(raw_height / factor)))
+            image.load()
+
+            # Reduce the remaining factor not covered by the decoder
+            remaining = factor * image.width // raw_width
+            if remaining > 1:
+                image = image.reduce(remaining)
+
+            # exif_transpose returns a copy even for upright images, which detaches from the file
+            image = ImageOps.exif_transpose(image)
+
+        # The file may have been written while it was decoded
+        self.check_unchanged()
+        return image
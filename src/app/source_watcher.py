@@ -0,0 +1,117 @@
+import functools
+import os
+
+from PyQt6.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from .proxy_cache import file_identity
+
+# Quiet time after the last change of a file before it is reported, editors write files in
+# several steps and designers save repeatedly
+WATCH_DEBOUNCE_MS = 500
+
+
+class SourceWatcher(QObject):
+    """Reports changed source files once they stopped changing
+
+    Watches the files and their folders, as many editors save by replacing the file, which
+    ends the watch of the file itself. Changes are debounced per file, so a burst of saves is
+    reported once, and only reported if the size or modification time of the file differs
+    from when it was reported last.
+    """
+    # Signals
+    source_changed = pyqtSignal(str)
+
+    def __init__(self, parent:QObject=None):
+        super(SourceWatcher, self).__init__(parent)
+
+        # Private class attributes
+        self.__watcher__ = QFileSystemWatcher(self)
+        self.__watcher__.fileChanged.connect(self.schedule)
+        self.__watcher__.directoryChanged.connect(self.directory_changed)
+        self.__identities__ = {}
+        self.__timers__ = {}
+
+    @property
+    def paths(self) -> set:
+        """Absolute paths of the watched files
+        """
+        return set(self.__identities__)
+
+    def set_paths(self, paths) -> None:
+        """Watch exactly the given files, files watched already keep their state
+
+        Args:
+            paths (iterable): File paths, missing files are watched once their folder changes
+        """
+        paths = {os.path.abspath(path) for path in paths}
+
+        for path in set(self.__identities__) - paths:
+            del self.__identities__[path]
+            timer = self.__timers__.pop(path, None)
+            if timer is not None:
+                timer.stop()
+                timer.deleteLater()
+        for path in paths - set(self.__identities__):
+            self.__identities__[path] = file_identity(path)
+
+        directories = {os.path.dirname(path) for path in paths}
+        watched = set(self.__watcher__.files()) | set(self.__watcher__.directories())
+        obsolete = watched - paths - directories
+        if obsolete:
+            self.__watcher__.removePaths(list(obsolete))
+        missing = [path for path in (paths | directories) - watched if os.path.exists(path)]
+        if missing:
+            self.__watcher__.addPaths(missing)
+
+    def clear(self) -> None:
+        self.set_paths([])
+
+    def directory_changed(self, directory:str) -> None:
+        # Files replaced, created or removed in a folder of watched files
+        for path, identity in self.__identities__.items():
+            if os.path.dirname(path) == directory and file_identity(path) != identity:
+                self.schedule(path)
+
+    def schedule(self, path:str) -> None:
+        """(Re-)start the debounce timer of a watched file
+
+        Args:
+            path (str): Absolute file path
+        """
+        if path not in self.__identities__:
+            return
+
+        timer = self.__timers__.get(path)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.setInterval(WATCH_DEBOUNCE_MS)
+            timer.timeout.connect(functools.partial(self.settle, path))
+            self.__timers__[path] = timer
+        timer.start()
+
+    def settle(self, path:str) -> None:
+        """Report a file which stopped changing, unless it is unchanged or has been removed
+
+        Args:
+            path (str): Absolute file path
+        """
+        timer = self.__timers__.pop(path, None)
+        if timer is not None:
+            timer.deleteLater()
+        if path not in self.__identities__:
+            return
+
+        # A removed file keeps its last identity, its folder reports when it is written again
+        identity = file_identity(path)
+        if identity is None:
+            return
+
+        # Replacing a file ends its watch
+        if path not in self.__watcher__.files():
+            self.__watcher__.addPath(path)
+
+        if identity == self.__identities__[path]:
+            return
+        self.__identities__[path] = identity
+        self.source_changed.emit(path)
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# Assumed size of cached values which are not images
+OBJECT_SIZE = 1024
+
+
+def estimate_size(value) -> int:
+    """Estimate the memory footprint of a cached value
+
+    Args:
+        value: Cached value
+
+    Returns:
+        int: Size in bytes
+    """
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    return OBJECT_SIZE
+
+
+class StageCache:
+    """Thread-safe LRU cache bounded by the memory size of its values
+
+    Used to memoize the intermediate results of a pipeline stage.
+    """
+    def __init__(self, name:str, max_bytes:int):
+        # Public class attributes
+        self.name = name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Private class attributes
+        self.__entries__ = OrderedDict()
+        self.__size__ = 0
+        self.__lock__ = threading.Lock()
+
+    def peek(self, key):
+        """Get a cached value
+
+        Args:
+            key: Hashable key identifying all inputs of the stage
+
+        Returns:
+            Cached value or None
+        """
+        with self.__lock__:
+            if key in self.__entries__:
+                self.__entries__.move_to_end(key)
+                self.hits += 1
+                return self.__entries__[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value) -> None:
+        """Cache a value, evicting least recently used values beyond the memory budget
+
+        Args:
+            key: Hashable key identifying all inputs of the stage
+            value: Value to cache
+        """
+        size = estimate_size(value)
+
+        with self.__lock__:
+            if key in self.__entries__ or size > self.max_bytes:
+                return
+
+            self.__entries__[key] = (value, size)
+            self.__size__ += size
+            self.evict()
+
+    def evict(self) -> None:
+        # Remove least recently used values beyond the budget, called with the lock held
+        while self.__size__ > self.max_bytes:
+            _, (_, evicted_size) = self.__entries__.popitem(last=False)
+            self.__size__ -= evicted_size
+            self.evictions += 1
+
+    def resize(self, max_bytes:int) -> None:
+        """Change the memory budget, evicting values right away if it is lowered
+
+        Args:
+            max_bytes (int): Budget in bytes
+        """
+        with self.__lock__:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def get(self, key, factory):
+        """Get a cached value or create and cache it
+
+        Args:
+            key: Hashable key identifying all inputs of the stage
+            factory (callable): Creates the value on a cache miss
+
+        Returns:
+            Cached or created value
+        """
+        value = self.peek(key)
+        if value is None:
+            # Create outside of the lock so other stages and threads are not blocked
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self.__lock__:
+            self.__entries__.clear()
+            self.__size__ = 0
+
+    def stats(self) -> dict:
+        """Get usage statistics of the cache
+
+        Returns:
+            dict: hits, misses, evictions, number of entries and size in bytes
+        """
+        with self.__lock__:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.__entries__),
+                "bytes": self.__size__,
+            }
@@ -0,0 +1,238 @@
+import functools
+import glob
+import json
+import os
+import sys
+import threading
+from collections.abc import Mapping
+
+from .get_resources import get_templates
+from .label_renderer import mm_to_px
+from .sheet_geometry import SheetGeometry, PAGE_WIDTH_MM, PAGE_HEIGHT_MM
+
+# Environment variable overriding the directory of user templates
+TEMPLATE_DIR_ENV = "TONUINO_TEMPLATE_DIR"
+
+# Application directory name inside the user configuration directory
+APP_DIR = "TonuinoLabelMaker"
+
+# Numeric fields of a template in mm
+TEMPLATE_FIELDS = ["top_margin", "left_margin", "sticker_width", "sticker_height", "horizontal_margin",
+                   "vertical_margin"]
+
+
+class TemplateError(ValueError):
+    """A template definition is incomplete or has labels outside of the page
+    """
+
+
+def user_template_dir() -> str:
+    """Platform specific directory of user template files
+
+    Returns:
+        str: Directory from TEMPLATE_DIR_ENV or the templates directory in the user
+            configuration directory
+    """
+    if os.environ.get(TEMPLATE_DIR_ENV):
+        return os.environ[TEMPLATE_DIR_ENV]
+
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA", os.path.join(home, "AppData", "Roaming"))
+    elif sys.platform == "darwin":
+        base = os.path.join(home, "Library", "Application Support")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME", os.path.join(home, ".config"))
+    return os.path.join(base, APP_DIR, "templates")
+
+
+def validate_template(name:str, config:dict) -> dict:
+    """Check a template definition as found in templates.json
+
+    Args:
+        name (str): Template name
+        config (dict): Template configuration
+
+    Raises:
+        TemplateError: The template is invalid
+
+    Returns:
+        dict: Normalized copy of the configuration with the pattern as list of two ints
+    """
+    if not isinstance(config, dict):
+        raise TemplateError(f"Template '{name}' is not an object")
+
+    template = {}
+    for field in TEMPLATE_FIELDS:
+        value = config.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TemplateError(f"Template '{name}' requires a number for '{field}'")
+        if value < 0 or (field in ("sticker_width", "sticker_height") and value == 0):
+            raise TemplateError(f"Template '{name}' has an invalid '{field}' of {value}")
+        template[field] = value
+
+    pattern = config.get("sticker_pattern")
+    if (not isinstance(pattern, (list, tuple)) or len(pattern) != 2
+            or not all(isinstance(count, int) and not isinstance(count, bool) and count > 0 for count in pattern)):
+        raise TemplateError(f"Template '{name}' requires 'sticker_pattern' as [rows, columns]")
+    template["sticker_pattern"] = list(pattern)
+
+    # All labels have to start on the page, labels bleeding over the page edge are clipped
+    rows, cols = pattern
+    last_x = template["left_margin"] + (cols - 1) * (template["sticker_width"] + template["horizontal_margin"])
+    last_y = template["top_margin"] + (rows - 1) * (template["sticker_height"] + template["vertical_margin"])
+    if last_x >= PAGE_WIDTH_MM or last_y >= PAGE_HEIGHT_MM:
+        raise TemplateError(f"Template '{name}' has labels outside of the A4 page")
+    return template
+
+
+def geometry_key(template:dict) -> tuple:
+    """Hashable key of the geometry of a template configuration
+    """
+    return tuple(template[field] for field in TEMPLATE_FIELDS) + tuple(template["sticker_pattern"])
+
+
+@functools.lru_cache(maxsize=256)
+def _sheet_geometry(key:tuple) -> SheetGeometry:
+    return SheetGeometry(dict(zip(TEMPLATE_FIELDS, key), sticker_pattern=list(key[len(TEMPLATE_FIELDS):])))
+
+
+def sheet_geometry(template:dict) -> SheetGeometry:
+    """Cell geometry in mm of a template, shared by all users of the same geometry
+
+    Args:
+        template (dict): Template configuration as found in templates.json
+
+    Returns:
+        SheetGeometry: Cell geometry, not to be modified
+    """
+    return _sheet_geometry(geometry_key(template))
+
+
+@functools.lru_cache(maxsize=256)
+def _cell_rects(key:tuple, dpi:int) -> tuple:
+    geometry = _sheet_geometry(key)
+
+    # Labels are rendered at mm_to_px of their size, cells are placed at their rounded position
+    # in mm, so neither the sizes nor the positions drift across the page
+    width_px = mm_to_px(geometry.cell_width, dpi)
+    height_px = mm_to_px(geometry.cell_height, dpi)
+    rects = []
+    for row, col in geometry.cells():
+        x, y, _, _ = geometry.cell_rect(row, col)
+        rects.append(((row, col), round(x / 25.4 * dpi), round(y / 25.4 * dpi), width_px, height_px))
+    return tuple(rects)
+
+
+def cell_rects(template:dict, dpi:int) -> tuple:
+    """Pixel rectangles of all cells of a template at a resolution, computed once per geometry
+    and resolution
+
+    Args:
+        template (dict): Template configuration as found in templates.json
+        dpi (int): Resolution in dots per inch
+
+    Returns:
+        tuple: ((row, col), x, y, width, height) tuples in row-major order, the size is the
+            pixel size of labels rendered at this resolution
+    """
+    return _cell_rects(geometry_key(template), dpi)
+
+
+class TemplateCatalog(Mapping):
+    """Validated label templates by name
+
+    Combines the templates shipped in templates.json with the JSON files of the user template
+    directory, which have the same format. User templates replace shipped templates of the
+    same name. Invalid templates are skipped and reported in errors.
+    """
+    def __init__(self):
+        # Public class attributes
+        self.errors = []
+
+        # Private class attributes
+        self.__templates__ = {}
+        self.__search_keys__ = {}
+
+    def add(self, name:str, config:dict) -> None:
+        """Validate and add a template
+
+        Args:
+            name (str): Template name
+            config (dict): Template configuration
+
+        Raises:
+            TemplateError: The template is invalid
+        """
+        self.__templates__[name] = validate_template(name, config)
+        self.__search_keys__[name] = name.lower()
+
+    def add_all(self, templates:dict, origin:str) -> None:
+        """Add the templates of a template file, skipping invalid ones
+
+        Args:
+            templates (dict): Template configurations by name
+            origin (str): File the templates were read from, for error messages
+        """
+        if not isinstance(templates, dict):
+            self.errors.append(f"{origin}: expected an object of templates by name")
+            return
+        for name, config in templates.items():
+            try:
+                self.add(name, config)
+            except TemplateError as e:
+                self.errors.append(f"{origin}: {e}")
+
+    def load_directory(self, directory:str) -> None:
+        """Add the templates of all JSON files of a directory, in file name order
+
+        Args:
+            directory (str): Directory of template files, ignored if it does not exist
+        """
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    templates = json.load(file)
+            except (OSError, ValueError) as e:
+                self.errors.append(f"{path}: {e}")
+                continue
+            self.add_all(templates, path)
+
+    def search(self, text:str) -> list:
+        """Find templates whose name contains all words of a search text
+
+        Args:
+            text (str): Search text, case insensitive
+
+        Returns:
+            list: Matching template names in catalog order
+        """
+        words = text.lower().split()
+        return [name for name, key in self.__search_keys__.items() if all(word in key for word in words)]
+
+    def __getitem__(self, name:str) -> dict:
+        return self.__templates__[name]
+
+    def __iter__(self):
+        return iter(self.__templates__)
+
+    def __len__(self) -> int:
+        return len(self.__templates__)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> TemplateCatalog:
+    """Shared template catalog, loaded on first use from templates.json and the user template
+    directory
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            catalog = TemplateCatalog()
+            catalog.add_all(get_templates(), "templates.json")
+            catalog.load_directory(user_template_dir())
+            _catalog = catalog
+        return _catalog
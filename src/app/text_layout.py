@@ -0,0 +1,201 @@
+import functools
+import os
+import sys
+from collections import namedtuple
+
+from PIL import ImageFont
+
+# Environment variable with additional font directories, separated by os.pathsep
+FONT_PATH_ENV = "TONUINO_FONT_PATH"
+
+# Font files tried in order, the first one found on the search path is used
+FONT_CANDIDATES = [
+    "arial.ttf",
+    "Arial.ttf",
+    "LiberationSans-Regular.ttf",
+    "DejaVuSans.ttf",
+    "FreeSans.ttf",
+    "Helvetica.ttc",
+]
+
+# Extra space between wrapped lines relative to the font size
+LINE_SPACING = 0.1
+
+# Result of layout_text
+TextLayout = namedtuple("TextLayout", ["font", "lines", "line_widths", "width", "height", "line_height"])
+
+
+def font_search_path() -> list:
+    """Directories searched for font files
+
+    Returns:
+        list: Directories from FONT_PATH_ENV followed by the system font directories
+    """
+    paths = [p for p in os.environ.get(FONT_PATH_ENV, "").split(os.pathsep) if p]
+    home = os.path.expanduser("~")
+
+    if sys.platform == "win32":
+        paths += [
+            os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+            os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "Fonts"),
+        ]
+    elif sys.platform == "darwin":
+        paths += [
+            os.path.join(home, "Library", "Fonts"),
+            "/Library/Fonts",
+            "/System/Library/Fonts/Supplemental",
+            "/System/Library/Fonts",
+        ]
+    else:
+        paths += [
+            os.path.join(home, ".local", "share", "fonts"),
+            os.path.join(home, ".fonts"),
+            "/usr/local/share/fonts",
+            "/usr/share/fonts",
+        ]
+    return paths
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_font(candidates:tuple=tuple(FONT_CANDIDATES)) -> str:
+    """Find the first available font file, the result is cached
+
+    Args:
+        candidates (tuple, optional): Font file names or absolute paths in order of preference.
+            Defaults to FONT_CANDIDATES.
+
+    Returns:
+        str: Path to the font file or None if none was found
+    """
+    for candidate in candidates:
+        if os.path.isabs(candidate) and os.path.isfile(candidate):
+            return candidate
+
+    # Index all font files once, font directories are nested on Linux
+    available = {}
+    for directory in font_search_path():
+        for root, _, files in os.walk(directory):
+            for file in files:
+                available.setdefault(file.lower(), os.path.join(root, file))
+
+    for candidate in candidates:
+        if candidate.lower() in available:
+            return available[candidate.lower()]
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def get_font(size:int, face:str=None) -> ImageFont.FreeTypeFont:
+    """Get a font, cached per (face, size)
+
+    Args:
+        size (int): Font size in pixels
+        face (str, optional): Path to a font file. Defaults to the font found by resolve_font.
+
+    Returns:
+        ImageFont.FreeTypeFont: Font, Pillow's built-in font if no font file is available
+    """
+    path = face or resolve_font()
+    if path:
+        return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def configure_fonts(search_path:list=None, candidates:list=None) -> None:
+    """Change where fonts are looked up and drop all cached fonts
+
+    Args:
+        search_path (list, optional): Additional font directories. Defaults to None.
+        candidates (list, optional): Font file names in order of preference. Defaults to None.
+    """
+    if search_path is not None:
+        os.environ[FONT_PATH_ENV] = os.pathsep.join(search_path)
+    if candidates is not None:
+        FONT_CANDIDATES[:] = candidates
+
+    resolve_font.cache_clear()
+    get_font.cache_clear()
+    text_width.cache_clear()
+
+
+@functools.lru_cache(maxsize=8192)
+def text_width(font:ImageFont.FreeTypeFont, text:str) -> float:
+    """Advance width of a text, cached per (font, text)
+
+    Args:
+        font (ImageFont.FreeTypeFont): Font as returned by get_font
+        text (str): Single line of text
+
+    Returns:
+        float: Width in pixels
+    """
+    return font.getlength(text)
+
+
+def wrap_text(text:str, font:ImageFont.FreeTypeFont, max_width:float) -> list:
+    """Greedily wrap text at spaces so that lines fit the given width where possible
+
+    Args:
+        text (str): Text, line breaks are kept
+        font (ImageFont.FreeTypeFont): Font
+        max_width (float): Maximum line width in pixels
+
+    Returns:
+        list: Lines of text, a single word wider than max_width is kept on its own line
+    """
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(font, candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def layout_text(text:str, max_width:float, max_height:float, max_size:int, min_size:int=6,
+                wrap:bool=True, face:str=None) -> TextLayout:
+    """Find the largest font size at which the text fits the given box
+
+    Binary search over the font size using cached fonts and metrics.
+
+    Args:
+        text (str): Text
+        max_width (float): Maximum width in pixels
+        max_height (float): Maximum height in pixels
+        max_size (int): Largest font size in pixels
+        min_size (int, optional): Smallest font size in pixels, used if nothing fits. Defaults to 6.
+        wrap (bool, optional): Wrap text onto multiple lines. Defaults to True.
+        face (str, optional): Path to a font file. Defaults to the font found by resolve_font.
+
+    Returns:
+        TextLayout: Font, lines and size of the text block
+    """
+    def layout(size:int) -> TextLayout:
+        font = get_font(size, face)
+        lines = wrap_text(text, font, max_width) if wrap else text.splitlines() or [""]
+        line_widths = [text_width(font, line) for line in lines]
+        ascent, descent = font.getmetrics()
+        line_height = ascent + descent + int(size * LINE_SPACING)
+        height = ascent + descent + (len(lines) - 1) * line_height
+        return TextLayout(font, lines, line_widths, max(line_widths), height, line_height)
+
+    def fits(candidate:TextLayout) -> bool:
+        return candidate.width <= max_width and candidate.height <= max_height
+
+    min_size = max(1, min(min_size, max_size))
+    best = layout(min_size)
+    low, high = min_size + 1, max_size
+    while low <= high:
+        size = (low + high) // 2
+        candidate = layout(size)
+        if fits(candidate):
+            best = candidate
+            low = size + 1
+        else:
+            high = size - 1
+    return best
@@ -0,0 +1,259 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Environment variable enabling tracing from the start
+TRACE_ENV = "TONUINO_TRACE"
+
+# Maximum number of recorded spans, older spans are dropped from the trace but stay in the stats
+MAX_EVENTS = 200000
+
+# Stages shown in an operation summary, the remaining stages are summed up as "other"
+SUMMARY_STAGES = 5
+
+
+class _NullSpan:
+    """Span returned while tracing is disabled, does nothing
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times a block of code and records it with the tracer when the block is left
+
+    Time spent in nested spans is subtracted to get the self time, so the self times of all
+    stages of an operation add up to its duration.
+    """
+    def __init__(self, tracer, name:str, args:dict):
+        # Public class attributes
+        self.name = name
+        self.args = args
+        self.start = 0
+        self.child_time = 0
+
+        # Private class attributes
+        self.__tracer__ = tracer
+
+    def __enter__(self):
+        self.__tracer__.open_spans().append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration = time.perf_counter_ns() - self.start
+        spans = self.__tracer__.open_spans()
+        spans.pop()
+        if spans:
+            spans[-1].child_time += duration
+        self.__tracer__.record(self, duration, spans)
+
+
+class Operation(Span):
+    """Top level span collecting the self times of all stages nested in it
+    """
+    def __init__(self, tracer, name:str, args:dict):
+        super(Operation, self).__init__(tracer, name, args)
+
+        # Public class attributes
+        self.duration = 0
+        self.stages = {}
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.duration = time.perf_counter_ns() - self.start
+        super(Operation, self).__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.__tracer__.notify(self)
+
+    def summary(self) -> str:
+        """One line summary of the stages taking the most time
+
+        Returns:
+            str: Summary, e.g. "Render label: 120 ms (blur 60 ms, resize 40 ms, other 20 ms)"
+        """
+        stages = sorted(self.stages.items(), key=lambda item: item[1], reverse=True)
+        parts = [f"{name} {self_time / 1e6:.0f} ms" for name, self_time in stages[:SUMMARY_STAGES]]
+
+        # Time outside of any stage and of the stages not listed
+        other = self.duration - sum(self_time for _, self_time in stages[:SUMMARY_STAGES])
+        if other >= 5e5:
+            parts.append(f"other {other / 1e6:.0f} ms")
+        return f"{self.name}: {self.duration / 1e6:.0f} ms ({', '.join(parts)})"
+
+
+class Tracer:
+    """Records timing spans of all threads
+
+    Spans are kept as Chrome trace events and summed up per stage. While disabled, span
+    returns a shared no-op context manager, so instrumented code costs a function call.
+    """
+    def __init__(self, enabled:bool=False, max_events:int=MAX_EVENTS):
+        # Public class attributes
+        self.enabled = enabled
+
+        # Private class attributes
+        self.__lock__ = threading.Lock()
+        self.__local__ = threading.local()
+        self.__events__ = deque(maxlen=max_events)
+        self.__stats__ = {}
+        self.__threads__ = {}
+        self.__listeners__ = []
+        self.__origin__ = time.perf_counter_ns()
+
+    def span(self, name:str, **args):
+        """Context manager timing a stage
+
+        Args:
+            name (str): Stage name
+            **args: Details shown with the span in the trace viewer
+
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def operation(self, name:str, **args):
+        """Context manager timing a user visible operation, e.g. a label render or an export
+
+        Listeners are called with the Operation when it completes.
+
+        Args:
+            name (str): Operation name
+            **args: Details shown with the span in the trace viewer
+
+        Returns:
+            Context manager
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Operation(self, name, args)
+
+    def open_spans(self) -> list:
+        spans = getattr(self.__local__, "spans", None)
+        if spans is None:
+            spans = self.__local__.spans = []
+        return spans
+
+    def record(self, span:Span, duration:int, open_spans:list) -> None:
+        """Record a completed span
+
+        Args:
+            span (Span): Completed span
+            duration (int): Duration in ns
+            open_spans (list): Spans still open on the thread of the span
+        """
+        self_time = duration - span.child_time
+        for parent in open_spans:
+            if isinstance(parent, Operation):
+                parent.stages[span.name] = parent.stages.get(span.name, 0) + self_time
+
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": (span.start - self.__origin__) / 1000,
+            "dur": duration / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if span.args:
+            event["args"] = {key: str(value) for key, value in span.args.items()}
+
+        with self.__lock__:
+            self.__events__.append(event)
+            self.__threads__[thread.ident] = thread.name
+            stats = self.__stats__.setdefault(span.name, [0, 0, 0, 0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] += self_time
+            stats[3] = max(stats[3], duration)
+
+    def add_listener(self, listener) -> None:
+        """Register a function called with every completed Operation, on the thread of the
+        operation
+
+        Args:
+            listener (callable): Function taking an Operation
+        """
+        self.__listeners__.append(listener)
+
+    def notify(self, operation:Operation) -> None:
+        for listener in list(self.__listeners__):
+            listener(operation)
+
+    def stats(self) -> list:
+        """Cumulative statistics per stage, sorted by total self time
+
+        Returns:
+            list: (name, count, total ms, self ms, mean ms, max ms) tuples
+        """
+        with self.__lock__:
+            stats = [(name, count, total / 1e6, self_time / 1e6, total / count / 1e6, longest / 1e6)
+                     for name, (count, total, self_time, longest) in self.__stats__.items()]
+        return sorted(stats, key=lambda row: row[3], reverse=True)
+
+    def chrome_trace(self) -> dict:
+        """Recorded spans in the Chrome trace event format, readable by chrome://tracing and
+        the Perfetto UI
+
+        Returns:
+            dict: Trace with a traceEvents list
+        """
+        with self.__lock__:
+            events = list(self.__events__)
+            threads = dict(self.__threads__)
+
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+                    for ident, name in threads.items()]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path:str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
+    def export_stats(self, path:str) -> None:
+        """Write the cumulative statistics per stage as CSV file
+
+        Args:
+            path (str): Output path
+        """
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["stage", "count", "total_ms", "self_ms", "mean_ms", "max_ms"])
+            for name, count, total, self_time, mean, longest in self.stats():
+                writer.writerow([name, count, f"{total:.3f}", f"{self_time:.3f}", f"{mean:.3f}", f"{longest:.3f}"])
+
+    def clear(self) -> None:
+        with self.__lock__:
+            self.__events__.clear()
+            self.__stats__ = {}
+            self.__threads__ = {}
+
+
+# Tracer of the application
+tracer = Tracer(enabled=bool(os.environ.get(TRACE_ENV)))
+
+
+def span(name:str, **args):
+    """Time a stage with the application tracer, see Tracer.span
+    """
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return Span(tracer, name, args)
+
+
+def operation(name:str, **args):
+    """Time an operation with the application tracer, see Tracer.operation
+    """
+    return tracer.operation(name, **args)
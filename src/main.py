@@ -1,14 +1,67 @@
 import sys
+import time
+
+# Reference time of the startup profile, taken before the heavy imports
+START_TIME = time.perf_counter()
+
+import argparse
+import multiprocessing
+from PyQt6.QtCore import QObject, QEvent
 from PyQt6.QtWidgets import QApplication
+QT_IMPORTED_TIME = time.perf_counter()
+
 from app.main_window import MainWindow
+APP_IMPORTED_TIME = time.perf_counter()
+
+
+class StartupProfiler(QObject):
+    """Reports the startup timings once the main window has been painted for the first time
+    """
+    def __init__(self, window:MainWindow, window_created_time:float):
+        super(StartupProfiler, self).__init__(window)
+
+        # Private class attributes
+        self.__window__ = window
+        self.__timings__ = [
+            ("Qt imports", QT_IMPORTED_TIME),
+            ("Application imports", APP_IMPORTED_TIME),
+            ("Main window created", window_created_time),
+        ]
+        window.installEventFilter(self)
+
+    def eventFilter(self, watched:QObject, event:QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            self.__window__.removeEventFilter(self)
+            self.report(time.perf_counter())
+        return False
+
+    def report(self, painted_time:float) -> None:
+        lines = ["Startup profile (ms since start of main.py):"]
+        previous = START_TIME
+        for name, timestamp in self.__timings__ + [("First paint", painted_time)]:
+            lines.append(f"  {name:<22}{(timestamp - START_TIME) * 1000:8.1f} (+{(timestamp - previous) * 1000:.1f})")
+            previous = timestamp
+        print("\n".join(lines), file=sys.stderr)
+
+        self.__window__.footer.log(f"Main window painted {(painted_time - START_TIME) * 1000:.0f} ms after start")
+
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Create printable labels for Tonuino boxes")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print import and first paint timings to stderr")
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setStyle('Fusion')
     window = MainWindow()
     window.setFixedSize(800, 600)
+    if args.profile_startup:
+        StartupProfiler(window, time.perf_counter())
     window.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Render processes of frozen builds start this executable again
+    multiprocessing.freeze_support()
+    main()